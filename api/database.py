@@ -1,8 +1,11 @@
 import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.orm.session import Session
+from services.metrics import TimedQueuePool, register_engine
+from services.query_profiler import query_profiler
 
 
 # load env vars
@@ -13,7 +16,17 @@ POSTGRES_SERVER = os.getenv("POSTGRES_SERVER")
 if not POSTGRES_SERVER:
     raise ValueError("POSTGRES_SERVER is not set")
 
-engine = create_engine(POSTGRES_SERVER)
+# Connections per worker process, see serve.py
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+# PostgreSQL gets a pool that reports checkout waits; SQLite keeps its default pool
+if make_url(POSTGRES_SERVER).get_backend_name() == "postgresql":
+    engine = create_engine(POSTGRES_SERVER, poolclass=TimedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+else:
+    engine = create_engine(POSTGRES_SERVER)
+query_profiler.install(engine)
+register_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
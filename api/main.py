@@ -1,12 +1,57 @@
-from fastapi import FastAPI, Response
+import logging
+import os
+from contextlib import asynccontextmanager
+import anyio.to_thread
+from services.startup import startup_timings, warm_up
+
+with startup_timings.phase("import fastapi"):
+    from fastapi import FastAPI, Response
 from dotenv import load_dotenv
-from routers import users, posts, donations, challenges
+with startup_timings.phase("import database"):
+    from database import SessionLocal, engine, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from services.cache_bus import cache_bus
+from services.challenge_scheduler import challenge_scheduler, CHALLENGE_SCHEDULER_ENABLED
+from services.metrics import MetricsMiddleware, registry
+from services.outbox import outbox_relay, OUTBOX_RELAY_ENABLED
+from services.query_profiler import QueryRouteMiddleware
+from services.sampling_profiler import sampling_profiler, SAMPLING_PROFILER_ENABLED
+
+# Registered in this order; each import is timed for the startup breakdown
+ROUTERS = ("users", "posts", "donations", "challenges", "home", "points", "recall", "stats", "export", "debug")
 
 try:
     load_dotenv()
 except Exception as e:
     SystemExit(f"Error loading .env file: {e}")
 
+# Threads for sync routes per worker; by default one per pooled connection, more would only wait for a connection
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+# key=value messages, LOG_LEVEL=DEBUG shows the per-request details
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s level=%(levelname)s logger=%(name)s %(message)s",
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    warm_up(app, engine)
+    startup_timings.log()
+    cache_bus.start(engine)
+    if CHALLENGE_SCHEDULER_ENABLED:
+        challenge_scheduler.start(SessionLocal)
+    if OUTBOX_RELAY_ENABLED:
+        outbox_relay.start(SessionLocal)
+    if SAMPLING_PROFILER_ENABLED:
+        sampling_profiler.start()
+    yield
+    sampling_profiler.stop()
+    outbox_relay.stop()
+    challenge_scheduler.stop()
+    cache_bus.stop()
+
 
 app = FastAPI(
     title="Sanquin API",
@@ -14,12 +59,14 @@ app = FastAPI(
     version="0.1.0",
     redoc_url=None,
     docs_url="/docs",
+    lifespan=lifespan,
 )
 
-app.include_router(users.router)
-app.include_router(posts.router)
-app.include_router(donations.router)
-app.include_router(challenges.router)
+for name in ROUTERS:
+    app.include_router(startup_timings.import_module(f"routers.{name}").router)
+
+app.add_middleware(QueryRouteMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
@@ -27,3 +74,7 @@ async def root():
     return  "Welcome to the Sanquin API! \n Visit /docs for the API documentation."
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # async so the threadpool gauges are read on the event loop
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,183 @@
+"""Maintenance commands, run from the api directory.
+
+    python manage.py partitions --months-ahead 3
+    python manage.py archive --older-than 24
+    python manage.py rebuild-stats --since 2020-01-01
+    python manage.py eligibility
+    python manage.py stats --rebuild
+    python manage.py export donations --format parquet --output donations.parquet --since 2024-01-01T00:00:00
+    python manage.py import-schedule schedule.csv
+    python manage.py templates --slot-minutes 30 --capacity 8
+    python manage.py challenges
+    python manage.py outbox --prune-days 7
+    python manage.py startup --runs 5 --budget 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from statistics import median
+
+from database import SessionLocal
+from main import app  # noqa: F401 - registers every model on Base.metadata
+from services.donation_archive import ensure_donation_partitions, archive_donations, rebuild_donation_stats
+from services.eligibility import rebuild_eligibility
+from services.export import EXPORT_TABLES, EXPORT_FORMATS, export_table
+from services.schedule_import import SCHEDULE_FORMATS, import_schedule
+from services.challenge_scheduler import challenge_scheduler
+from services.outbox import outbox_relay
+from services.timeslot_template import templates_from_opening_hours
+from services.stats import refresh_stats, rebuild_stats as rebuild_all_stats
+
+# Run in a fresh interpreter per measurement, this process has already imported everything
+STARTUP_BENCHMARK = (
+    "import json, main; from services.startup import startup_timings, warm_up; "
+    "warm_up(main.app, main.engine); print(json.dumps(startup_timings.as_dict()))"
+)
+
+
+def partitions(db, args):
+    created = ensure_donation_partitions(db, months_ahead=args.months_ahead)
+    print(f"Created {created} donation partitions.")
+
+def archive(db, args):
+    archived = archive_donations(db, older_than_months=args.older_than, batch_size=args.batch_size)
+    print(f"Archived {archived} donations.")
+
+def rebuild_stats(db, args):
+    written = rebuild_donation_stats(db, since=args.since, until=args.until)
+    print(f"Wrote {written} daily statistics rows.")
+
+def eligibility(db, args):
+    written = rebuild_eligibility(db)
+    print(f"Recomputed eligibility, {written} rows.")
+
+def stats(db, args):
+    if args.rebuild:
+        result = rebuild_all_stats(db)
+        print(f"Rebuilt {result['donation_rows']} donation and {result['timeslot_rows']} timeslot rows, {result['challenges']} challenges.")
+    else:
+        result = refresh_stats(db)
+        print(f"Refreshed {result['days']} days and {result['challenges']} challenges.")
+
+def export(db, args):
+    with open(args.output or f"{args.table}.{args.format}", "wb") as out:
+        result = export_table(db, args.table, args.format, out, since=args.since)
+    print(f"Exported {result.rows} rows to {out.name}, watermark {result.watermark.isoformat() if result.watermark else 'none'}.")
+
+def import_schedule_file(db, args):
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    with open(args.path, encoding="utf-8-sig", newline="") as lines:
+        result = import_schedule(db, lines, fmt, chunk_size=args.chunk_size)
+    print(f"Imported {result.timeslots} timeslots for {result.locations} locations in {result.seconds}s ({result.timeslots_per_second} timeslots/s).")
+    if result.rejected:
+        print(f"Rejected {result.rejected} records:")
+        for error in result.errors:
+            print(f"  line {error.line}: {error.message}")
+
+def templates(db, args):
+    created = templates_from_opening_hours(db, slot_minutes=args.slot_minutes, capacity=args.capacity, weekdays=args.weekdays)
+    print(f"Created {created} timeslot templates from opening hours.")
+
+def challenges(db, args):
+    result = challenge_scheduler.run_due(db)
+    print(f"Activated {result.activated} and completed {result.completed} participants, awarded {result.points} points to {result.rewarded}.")
+
+def outbox(db, args):
+    result = outbox_relay.relay_due(db)
+    print(f"Published {result.published} outbox events, {result.failed} failed and will be retried.")
+    if args.prune_days is not None:
+        deleted = outbox_relay.prune(db, timedelta(days=args.prune_days))
+        print(f"Pruned {deleted} published events.")
+
+def startup(db, args):
+    reports = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_BENCHMARK],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+        )
+        report = json.loads(result.stdout.splitlines()[-1])
+        report["process_ms"] = (time.perf_counter() - started) * 1000
+        reports.append(report)
+
+    for name in reports[0]["phases_ms"]:
+        print(f"{name:<32} {median(report['phases_ms'][name] for report in reports):8.1f} ms")
+    timed = median(report["total_ms"] for report in reports)
+    process = median(report["process_ms"] for report in reports)
+    print(f"{'timed phases':<32} {timed:8.1f} ms")
+    print(f"{'process':<32} {process:8.1f} ms (median of {args.runs})")
+    if args.budget is not None and process > args.budget * 1000:
+        raise SystemExit(f"Startup took {process:.0f} ms, over the budget of {args.budget * 1000:.0f} ms.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sanquin API maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("partitions", help="create upcoming monthly donation partitions")
+    command.add_argument("--months-ahead", type=int, default=3)
+    command.set_defaults(handler=partitions)
+
+    command = commands.add_parser("archive", help="move old completed and cancelled donations to the archive")
+    command.add_argument("--older-than", type=int, default=24, help="age in months")
+    command.add_argument("--batch-size", type=int, default=5000)
+    command.set_defaults(handler=archive)
+
+    command = commands.add_parser("rebuild-stats", help="recompute daily donation statistics from live and archived donations")
+    command.add_argument("--since", type=date.fromisoformat)
+    command.add_argument("--until", type=date.fromisoformat)
+    command.set_defaults(handler=rebuild_stats)
+
+    command = commands.add_parser("eligibility", help="recompute the next eligible dates of all users")
+    command.set_defaults(handler=eligibility)
+
+    command = commands.add_parser("stats", help="bring the /stats rollups up to date")
+    command.add_argument("--rebuild", action="store_true", help="recompute every rollup instead of only the changed days")
+    command.set_defaults(handler=stats)
+
+    command = commands.add_parser("export", help="write a table as CSV, Parquet or Arrow IPC")
+    command.add_argument("table", choices=list(EXPORT_TABLES))
+    command.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    command.add_argument("--output", help="file to write, default <table>.<format>")
+    command.add_argument("--since", type=datetime.fromisoformat, help="only rows updated after this watermark")
+    command.set_defaults(handler=export)
+
+    command = commands.add_parser("import-schedule", help="upsert locations and timeslots from a CSV or JSON Lines schedule")
+    command.add_argument("path")
+    command.add_argument("--format", choices=SCHEDULE_FORMATS, help="default from the file extension")
+    command.add_argument("--chunk-size", type=int, default=5000)
+    command.set_defaults(handler=import_schedule_file)
+
+    command = commands.add_parser("templates", help="create weekly timeslot templates from the opening hours of locations without any")
+    command.add_argument("--slot-minutes", type=int, default=30)
+    command.add_argument("--capacity", type=int, required=True)
+    command.add_argument("--weekdays", type=int, nargs="+", default=[0, 1, 2, 3, 4], help="0 is Monday")
+    command.set_defaults(handler=templates)
+
+    command = commands.add_parser("challenges", help="apply due challenge starts and ends and pay out reached challenge rewards")
+    command.set_defaults(handler=challenges)
+
+    command = commands.add_parser("outbox", help="deliver due outbox events and optionally delete old published ones")
+    command.add_argument("--prune-days", type=int, help="delete events published more than this many days ago")
+    command.set_defaults(handler=outbox)
+
+    command = commands.add_parser("startup", help="time imports and warm-up in fresh interpreters")
+    command.add_argument("--runs", type=int, default=5)
+    command.add_argument("--budget", type=float, help="fail when the median startup exceeds this many seconds")
+    command.set_defaults(handler=startup)
+
+    args = parser.parse_args(argv)
+    db = SessionLocal()
+    try:
+        args.handler(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""hot query indexes
+
+Indexes for the lookups the services run on every request. Apart from the
+primary keys and the unique username/email constraints none of these
+columns was indexed.
+
+On PostgreSQL the indexes are built CONCURRENTLY outside the migration
+transaction, so the tables stay writable while the migration runs.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 17:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, partial index predicate or None)
+INDEXES = [
+    # get_donations_by_user_id, calculate_total_contributions
+    ("ix_donations_user_id_appointment", "donations", ["user_id", "appointment"], None),
+    ("ix_donations_appointment", "donations", ["appointment"], None),
+    # get_friends_donations
+    ("ix_donations_joinable_user_id_appointment", "donations", ["user_id", "appointment"], sa.column("enable_joining", sa.Boolean) == sa.true()),
+    # get_challenges_by_user_id
+    ("ix_challenge_users_user_id", "challenge_users", ["user_id"], None),
+    # get_friend_requests, get_friends
+    ("ix_friends_receiver_id_status", "friends", ["receiver_id", "status"], None),
+    # get_posts_by_user_id, get_friends_posts
+    ("ix_posts_user_id_created_at", "posts", ["user_id", "created_at"], None),
+    # get_kudos_by_post_id, delete_kudos
+    ("ix_kudos_post_id_user_id", "kudos", ["post_id", "user_id"], None),
+    # get_notifications
+    ("ix_notifications_user_id", "notifications", ["user_id"], None),
+    # get_new_notifications
+    ("ix_notifications_user_id_unretrieved", "notifications", ["user_id"], sa.column("retrieved", sa.Boolean) == sa.false()),
+    # get_timeslots_by_location_id
+    ("ix_timeslots_location_id_start_time", "timeslots", ["location_id", "start_time"], None),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_where=where, sqlite_where=where,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
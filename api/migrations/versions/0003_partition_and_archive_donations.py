@@ -0,0 +1,144 @@
+"""partition and archive donations
+
+Adds `donations_archive`, where the archival job moves completed and
+cancelled donations, and `donation_daily_stats`, which is rebuilt from the
+live and archived donations.
+
+On PostgreSQL `donations` becomes a table range-partitioned by appointment
+month, with a DEFAULT partition for anything outside the created months.
+`ensure_donation_partitions(from, to)` creates the missing monthly partitions
+and moves rows out of the default partition. The archival job and
+`manage.py partitions` call it, and it can also be scheduled with pg_cron.
+Partitioned tables need the partition key in the primary key, so the primary
+key becomes (id, appointment). The existing rows are copied, so run this
+revision in a maintenance window.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 19:02:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DONATION_INDEXES = [
+    ("ix_donations_id", ["id"], None),
+    ("ix_donations_user_id_appointment", ["user_id", "appointment"], None),
+    ("ix_donations_appointment", ["appointment"], None),
+    ("ix_donations_joinable_user_id_appointment", ["user_id", "appointment"], sa.column("enable_joining", sa.Boolean) == sa.true()),
+]
+
+ENSURE_PARTITIONS = """
+CREATE OR REPLACE FUNCTION ensure_donation_partitions(from_month date, to_month date) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', from_month);
+    month_end timestamp;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= to_month LOOP
+        month_end := month_start + interval '1 month';
+        partition_name := 'donations_' || to_char(month_start, '"y"YYYY"m"MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE donations INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+            -- rows for this month that landed in the default partition would block the ATTACH
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM donations_default WHERE appointment >= %L AND appointment < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved',
+                month_start, month_end, partition_name
+            );
+            EXECUTE format('ALTER TABLE donations ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', partition_name, month_start, month_end);
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END
+$$
+"""
+
+
+def create_donation_constraints_and_indexes() -> None:
+    op.create_foreign_key('donations_user_id_fkey', 'donations', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('donations_location_id_fkey', 'donations', 'location_info', ['location_id'], ['id'], ondelete='SET NULL')
+    for name, columns, where in DONATION_INDEXES:
+        op.create_index(name, 'donations', columns, unique=False, postgresql_where=where)
+
+
+def upgrade() -> None:
+    op.create_table('donations_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('location_id', sa.Integer(), nullable=True),
+    sa.Column('donation_type', postgresql.ENUM('BLOOD', 'PLASMA', name='donationtype', create_type=False), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('appointment', sa.DateTime(), nullable=False),
+    sa.Column('status', postgresql.ENUM('PENDING', 'COMPLETED', 'CANCELLED', name='donationstatus', create_type=False), nullable=False),
+    sa.ForeignKeyConstraint(['location_id'], ['location_info.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_donations_archive_appointment', 'donations_archive', ['appointment'], unique=False, postgresql_using='brin')
+    op.create_index(op.f('ix_donations_archive_user_id'), 'donations_archive', ['user_id'], unique=False)
+    op.create_table('donation_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('location_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('donation_type', postgresql.ENUM('BLOOD', 'PLASMA', name='donationtype', create_type=False), nullable=False),
+    sa.Column('status', postgresql.ENUM('PENDING', 'COMPLETED', 'CANCELLED', name='donationstatus', create_type=False), nullable=False),
+    sa.Column('donations', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'location_id', 'donation_type', 'status')
+    )
+
+    if op.get_context().dialect.name != 'postgresql':
+        return
+
+    # The sequence would be dropped with the old table otherwise
+    op.execute("ALTER SEQUENCE donations_id_seq OWNED BY NONE")
+    op.execute("CREATE TABLE donations_partitioned (LIKE donations INCLUDING DEFAULTS) PARTITION BY RANGE (appointment)")
+    op.execute("ALTER TABLE donations_partitioned ADD CONSTRAINT donations_partitioned_pkey PRIMARY KEY (id, appointment)")
+    op.execute("CREATE TABLE donations_default PARTITION OF donations_partitioned DEFAULT")
+    op.execute("INSERT INTO donations_partitioned SELECT * FROM donations")
+    op.execute("DROP TABLE donations")
+    op.execute("ALTER TABLE donations_partitioned RENAME TO donations")
+    op.execute("ALTER TABLE donations RENAME CONSTRAINT donations_partitioned_pkey TO donations_pkey")
+    op.execute("ALTER SEQUENCE donations_id_seq OWNED BY donations.id")
+    create_donation_constraints_and_indexes()
+
+    op.execute(ENSURE_PARTITIONS)
+    # Monthly partitions for the existing history and the next three months
+    op.execute(
+        "SELECT ensure_donation_partitions("
+        "(SELECT coalesce(min(appointment), now()) FROM donations)::date, "
+        "(now() + interval '3 months')::date)"
+    )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == 'postgresql':
+        op.execute("DROP FUNCTION ensure_donation_partitions(date, date)")
+        op.execute("ALTER SEQUENCE donations_id_seq OWNED BY NONE")
+        op.execute("CREATE TABLE donations_plain (LIKE donations INCLUDING DEFAULTS)")
+        op.execute("INSERT INTO donations_plain SELECT * FROM donations")
+        # Dropping the partitioned table drops every partition with it
+        op.execute("DROP TABLE donations")
+        op.execute("ALTER TABLE donations_plain RENAME TO donations")
+        op.execute("ALTER TABLE donations ADD CONSTRAINT donations_pkey PRIMARY KEY (id)")
+        op.execute("ALTER SEQUENCE donations_id_seq OWNED BY donations.id")
+        create_donation_constraints_and_indexes()
+
+    op.drop_table('donation_daily_stats')
+    op.drop_index(op.f('ix_donations_archive_user_id'), table_name='donations_archive')
+    op.drop_index('ix_donations_archive_appointment', table_name='donations_archive', postgresql_using='brin')
+    op.drop_table('donations_archive')
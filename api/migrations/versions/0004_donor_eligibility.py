@@ -0,0 +1,40 @@
+"""donor eligibility
+
+Next eligible date per user and donation type, kept current by the donation
+services. Fill it for existing donations after upgrading with
+`python manage.py eligibility`.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 20:14:09.527966
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('donor_eligibility',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('donation_type', postgresql.ENUM('BLOOD', 'PLASMA', name='donationtype', create_type=False), nullable=False),
+    sa.Column('last_donation_at', sa.DateTime(), nullable=False),
+    sa.Column('next_eligible_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'donation_type')
+    )
+    op.create_index('ix_donor_eligibility_donation_type_next_eligible_at', 'donor_eligibility', ['donation_type', 'next_eligible_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_donor_eligibility_donation_type_next_eligible_at', table_name='donor_eligibility')
+    op.drop_table('donor_eligibility')
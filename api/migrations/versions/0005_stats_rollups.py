@@ -0,0 +1,50 @@
+"""stats rollups
+
+Daily timeslot rollups, per-challenge contributions and the queue of days
+whose rollups are out of date, behind the /stats endpoints. Fill them for
+existing data after upgrading with `python manage.py stats --rebuild`.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 21:02:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('timeslot_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('location_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('timeslots', sa.Integer(), nullable=False),
+    sa.Column('capacity', sa.Integer(), nullable=False),
+    sa.Column('booked', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'location_id')
+    )
+    op.create_table('challenge_stats',
+    sa.Column('challenge_id', sa.Integer(), nullable=False),
+    sa.Column('contributed', sa.Float(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['challenge_id'], ['challenges.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('challenge_id')
+    )
+    op.create_table('stats_dirty_days',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stats_dirty_days')
+    op.drop_table('challenge_stats')
+    op.drop_table('timeslot_daily_stats')
@@ -0,0 +1,43 @@
+"""export watermarks
+
+`updated_at` on the tables partners export, so an incremental export can
+select the rows changed since the previous one. Existing rows get the
+upgrade time.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 21:40:12.604351
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ['donations', 'timeslots', 'challenge_users']
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        column = sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False)
+        if op.get_context().dialect.name == 'postgresql':
+            op.add_column(table, column)
+        else:
+            # SQLite cannot add a column with a non-constant default in place
+            with op.batch_alter_table(table, recreate='always') as batch_op:
+                batch_op.add_column(column)
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,42 @@
+"""schedule import keys
+
+Unique location names and a unique (location_id, start_time) per timeslot,
+the conflict targets of the bulk schedule import. Duplicate timeslots keep
+their oldest row, and duplicate location names get the location id
+appended, since donations still point at them.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 22:05:37.912044
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "DELETE FROM timeslots WHERE id NOT IN "
+        "(SELECT min(id) FROM timeslots GROUP BY location_id, start_time)"
+    )
+    op.execute(
+        "UPDATE location_info SET name = name || ' (' || id || ')' WHERE id NOT IN "
+        "(SELECT min(id) FROM location_info GROUP BY name)"
+    )
+    op.drop_index('ix_timeslots_location_id_start_time', table_name='timeslots')
+    op.create_index('ix_timeslots_location_id_start_time', 'timeslots', ['location_id', 'start_time'], unique=True)
+    op.create_index('ix_location_info_name', 'location_info', ['name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_location_info_name', table_name='location_info')
+    op.drop_index('ix_timeslots_location_id_start_time', table_name='timeslots')
+    op.create_index('ix_timeslots_location_id_start_time', 'timeslots', ['location_id', 'start_time'], unique=False)
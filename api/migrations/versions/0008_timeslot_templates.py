@@ -0,0 +1,46 @@
+"""timeslot templates
+
+Weekly recurring timeslot blocks per location. Their slots are expanded
+when a window is listed and only stored in `timeslots` once booked.
+Create templates for existing locations from their opening hours with
+`python manage.py templates --capacity N`.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 22:41:18.220517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('timeslot_templates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('slot_minutes', sa.Integer(), nullable=False),
+    sa.Column('capacity', sa.Integer(), nullable=False),
+    sa.Column('valid_from', sa.Date(), nullable=True),
+    sa.Column('valid_until', sa.Date(), nullable=True),
+    sa.CheckConstraint('weekday BETWEEN 0 AND 6', name='ck_timeslot_templates_weekday'),
+    sa.ForeignKeyConstraint(['location_id'], ['location_info.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_timeslot_templates_location_id_weekday', 'timeslot_templates', ['location_id', 'weekday'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timeslot_templates_location_id_weekday', table_name='timeslot_templates')
+    op.drop_table('timeslot_templates')
@@ -0,0 +1,36 @@
+"""challenge reward ledger
+
+Links reward rows in the points ledger to their challenge, with a unique
+index so a challenge pays each user at most once, also after leaving and
+rejoining it.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-20 09:12:41.208813
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('points_transactions') as batch_op:
+        batch_op.add_column(sa.Column('challenge_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_points_transactions_challenge_id', 'challenges', ['challenge_id'], ['id'], ondelete='SET NULL')
+        batch_op.create_index('ix_points_transactions_challenge_id_user_id', ['challenge_id', 'user_id'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('points_transactions') as batch_op:
+        batch_op.drop_index('ix_points_transactions_challenge_id_user_id')
+        batch_op.drop_constraint('fk_points_transactions_challenge_id', type_='foreignkey')
+        batch_op.drop_column('challenge_id')
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, ForeignKey, Enum, func, between
+from datetime import datetime
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Enum, Index, func, between
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship, Session
 from .donation import Donation
@@ -12,7 +13,15 @@ class ChallengeUser(Base):
     challenge_id = Column(Integer, ForeignKey("challenges.id", ondelete="CASCADE"), primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     status = Column(Enum(ChallengeStatus), nullable=False)  
+    # watermark for incremental exports
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now, server_default=func.now())
 
     challenge = relationship("Challenge", back_populates="participants")
     user = relationship("User", back_populates="challenges")
 
+    # challenge_id lookups use the primary key, user_id lookups need their own index
+    __table_args__ = (
+        Index("ix_challenge_users_user_id", "user_id"),
+        Index("ix_challenge_users_updated_at", "updated_at"),
+    )
+
@@ -1,10 +1,12 @@
-from sqlalchemy import Column, Integer, Boolean, ForeignKey, Float, DateTime, Enum
+from sqlalchemy import Column, Integer, Boolean, ForeignKey, Float, Date, DateTime, Enum, Index, func
 from sqlalchemy.orm import relationship
 from datetime import datetime, UTC
 from .enums import DonationType, DonationStatus
 from database import Base
 
 class Donation(Base):
+    # On PostgreSQL this table is range-partitioned by appointment month (migration 0003),
+    # there the primary key is (id, appointment) and ids stay unique through the shared sequence.
     __tablename__ = "donations"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -15,6 +17,56 @@ class Donation(Base):
     appointment = Column(DateTime, nullable=False, default=datetime.now(UTC))
     status = Column(Enum(DonationStatus), nullable=False)
     enable_joining = Column(Boolean, nullable=False, default=False)
+    # watermark for incremental exports
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now, server_default=func.now())
 
     user = relationship("User", back_populates="donations")
     location = relationship("LocationInfo", back_populates="donations")
+
+    __table_args__ = (
+        # donation history per user and contribution sums over an appointment window
+        Index("ix_donations_user_id_appointment", "user_id", "appointment"),
+        Index("ix_donations_appointment", "appointment"),
+        Index("ix_donations_updated_at", "updated_at"),
+        # upcoming donations friends can join
+        Index(
+            "ix_donations_joinable_user_id_appointment", "user_id", "appointment",
+            postgresql_where=enable_joining == True,
+            sqlite_where=enable_joining == True,
+        ),
+    )
+
+
+class DonationArchive(Base):
+    """Completed and cancelled donations moved out of `donations` by the archival job."""
+    __tablename__ = "donations_archive"
+
+    # the original donation id
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), index=True)
+    location_id = Column(Integer, ForeignKey("location_info.id", ondelete="SET NULL"))
+    donation_type = Column(Enum(DonationType), nullable=False)
+    amount = Column(Float, nullable=True)
+    appointment = Column(DateTime, nullable=False)
+    status = Column(Enum(DonationStatus), nullable=False)
+
+    __table_args__ = (
+        # rows arrive in appointment order, so a BRIN index stays a few pages in size
+        Index("ix_donations_archive_appointment", "appointment", postgresql_using="brin"),
+    )
+
+
+class DonationDailyStats(Base):
+    """Donation counts and amounts per day, location, type and status.
+
+    Rebuilt from `donations` and `donations_archive` by `rebuild_donation_stats`.
+    `location_id` is 0 for donations whose location has been deleted.
+    """
+    __tablename__ = "donation_daily_stats"
+
+    day = Column(Date, primary_key=True)
+    location_id = Column(Integer, primary_key=True, autoincrement=False)
+    donation_type = Column(Enum(DonationType), primary_key=True)
+    status = Column(Enum(DonationStatus), primary_key=True)
+    donations = Column(Integer, nullable=False, default=0)
+    amount = Column(Float, nullable=False, default=0.0)
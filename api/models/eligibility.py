@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Enum, Index
+from sqlalchemy.orm import relationship
+from .enums import DonationType
+from database import Base
+
+class DonorEligibility(Base):
+    __tablename__ = "donor_eligibility"
+
+    # Derived from the user's completed donations by services.eligibility, never edited directly.
+    # Users without a row for a donation type have never made that donation and are eligible.
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    donation_type = Column(Enum(DonationType), primary_key=True)
+    last_donation_at = Column(DateTime, nullable=False)
+    next_eligible_at = Column(DateTime, nullable=False)
+
+    user = relationship("User", back_populates="eligibility")
+
+    __table_args__ = (
+        # users still waiting for a donation type, ordered by when they become eligible
+        Index("ix_donor_eligibility_donation_type_next_eligible_at", "donation_type", "next_eligible_at"),
+    )
+
+    def __repr__(self):
+        return f"<DonorEligibility(user_id={self.user_id}, donation_type={self.donation_type}, next_eligible_at={self.next_eligible_at})>"
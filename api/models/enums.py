@@ -22,4 +22,9 @@ class ChallengeStatus(str, Enum):
     PENDING = "pending"
     ACTIVE = "active"
     COMPLETED = "completed"
-    CANCELLED = "cancelled"
\ No newline at end of file
+    CANCELLED = "cancelled"
+
+class LeaderboardScope(str, Enum):
+    GLOBAL = "global"
+    CITY = "city"
+    FRIENDS = "friends"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .enums import FriendshipStatus
@@ -14,3 +14,8 @@ class Friend(Base):
 
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_requests")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_requests")
+
+    # sender_id lookups use the primary key, received requests need their own index
+    __table_args__ = (
+        Index("ix_friends_receiver_id_status", "receiver_id", "status"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -15,5 +15,9 @@ class Kudos(Base):
     post = relationship("Post", back_populates="kudos_list")
     user = relationship("User", back_populates="liked_posts")
 
+    __table_args__ = (
+        Index("ix_kudos_post_id_user_id", "post_id", "user_id"),
+    )
+
     def __repr__(self):
         return f"<Kudos(id={self.id}, user_id={self.user_id}, post_id={self.post_id}, created_at={self.created_at})>"
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, Text, Date, DateTime, Time, ForeignKey, Index, CheckConstraint, func
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -13,8 +14,14 @@ class LocationInfo(Base):
     longitude = Column(Text, nullable=False)
 
     timeslots = relationship("Timeslot", back_populates="location", cascade="all, delete-orphan")
+    templates = relationship("TimeslotTemplate", back_populates="location", cascade="all, delete-orphan")
     donations = relationship("Donation", back_populates="location")
 
+    # the name identifies a location in schedule imports
+    __table_args__ = (
+        Index("ix_location_info_name", "name", unique=True),
+    )
+
     def __repr__(self):
         return f"<LocationInfo(id={self.id}, name={self.name}, address={self.address}, opening_hours={self.opening_hours}, latitude={self.latitude}, longitude={self.longitude})>"
 
@@ -27,8 +34,46 @@ class Timeslot(Base):
     end_time = Column(DateTime, nullable=False)
     total_capacity = Column(Integer, nullable=False)
     remaining_capacity = Column(Integer, nullable=False)
+    # watermark for incremental exports
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now, server_default=func.now())
 
     location = relationship("LocationInfo", back_populates="timeslots")
 
+    __table_args__ = (
+        # unique so schedule imports can upsert on it
+        Index("ix_timeslots_location_id_start_time", "location_id", "start_time", unique=True),
+        Index("ix_timeslots_updated_at", "updated_at"),
+    )
+
+    def __repr__(self):
+        return f"<Timeslot(id={self.id}, location_id={self.location_id}, start_time={self.start_time}, end_time={self.end_time}, total_capacity={self.total_capacity}, remaining_capacity={self.remaining_capacity})>"
+
+
+class TimeslotTemplate(Base):
+    """A weekly recurring block of timeslots at a location.
+
+    Slots from a template are expanded on read for the requested window and
+    only stored as `Timeslot` rows once they are booked.
+    """
+    __tablename__ = "timeslot_templates"
+
+    id = Column(Integer, primary_key=True)
+    location_id = Column(Integer, ForeignKey("location_info.id", ondelete="CASCADE"), nullable=False)
+    # 0 is Monday, as date.weekday()
+    weekday = Column(Integer, nullable=False)
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+    slot_minutes = Column(Integer, nullable=False)
+    capacity = Column(Integer, nullable=False)
+    valid_from = Column(Date, nullable=True)
+    valid_until = Column(Date, nullable=True)
+
+    location = relationship("LocationInfo", back_populates="templates")
+
+    __table_args__ = (
+        Index("ix_timeslot_templates_location_id_weekday", "location_id", "weekday"),
+        CheckConstraint("weekday BETWEEN 0 AND 6", name="ck_timeslot_templates_weekday"),
+    )
+
     def __repr__(self):
-        return f"<Timeslot(id={self.id}, location_id={self.location_id}, start_time={self.start_time}, end_time={self.end_time}, total_capacity={self.total_capacity}, remaining_capacity={self.remaining_capacity})>"
\ No newline at end of file
+        return f"<TimeslotTemplate(id={self.id}, location_id={self.location_id}, weekday={self.weekday}, start_time={self.start_time}, end_time={self.end_time}, slot_minutes={self.slot_minutes}, capacity={self.capacity})>"
@@ -1,5 +1,5 @@
 from database import Base 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from datetime import datetime
 
 
@@ -12,3 +12,13 @@ class Notification(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.now)
     retrieved = Column(Boolean, default=False)
+
+    __table_args__ = (
+        Index("ix_notifications_user_id", "user_id"),
+        # polled by the app for new notifications
+        Index(
+            "ix_notifications_user_id_unretrieved", "user_id",
+            postgresql_where=retrieved == False,
+            sqlite_where=retrieved == False,
+        ),
+    )
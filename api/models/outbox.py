@@ -0,0 +1,28 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, JSON, Index
+from datetime import datetime
+from database import Base
+
+# Domain events written in the same transaction as the change they describe,
+# delivered by services.outbox.OutboxRelay
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    # not handed out again before this moment: the claim lease, or the retry backoff after a failure
+    available_at = Column(DateTime, default=datetime.now, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String, nullable=True)
+    published_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # the relay only reads undelivered events
+        Index(
+            "ix_outbox_events_unpublished", "available_at",
+            postgresql_where=published_at.is_(None),
+            sqlite_where=published_at.is_(None),
+        ),
+    )
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from database import Base
+
+class PointsTransaction(Base):
+    __tablename__ = "points_transactions"
+
+    # Append-only: balances on users are only changed together with a new row here
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    amount = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    # Set on challenge rewards, so a challenge pays each user at most once
+    challenge_id = Column(Integer, ForeignKey("challenges.id", ondelete="SET NULL"), nullable=True)
+
+    user = relationship("User", back_populates="points_transactions")
+
+    __table_args__ = (
+        Index("ix_points_transactions_challenge_id_user_id", "challenge_id", "user_id", unique=True),
+    )
+
+    def __repr__(self):
+        return f"<PointsTransaction(id={self.id}, user_id={self.user_id}, amount={self.amount}, reason={self.reason}, created_at={self.created_at})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -16,5 +16,9 @@ class Post(Base):
     user = relationship("User", back_populates="created_posts")
     kudos_list = relationship("Kudos", back_populates="post", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_posts_user_id_created_at", "user_id", "created_at"),
+    )
+
     def __repr__(self):
         return f"<Post(id={self.id}, user_id={self.user_id}, title={self.title}, content={self.content}, created_at={self.created_at})>"
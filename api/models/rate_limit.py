@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, Float, Boolean, DateTime
+from database import Base
+
+# Token buckets shared by every worker when RATE_LIMIT_BACKEND=postgres, see services.rate_limit
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # whether the last take found a token
+    allowed = Column(Boolean, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
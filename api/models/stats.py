@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+from datetime import datetime
+from database import Base
+
+# Rollups behind the /stats endpoints, maintained by services.stats. Donation
+# counts per day live in DonationDailyStats next to the donation models.
+
+class TimeslotDailyStats(Base):
+    __tablename__ = "timeslot_daily_stats"
+
+    day = Column(Date, primary_key=True)
+    location_id = Column(Integer, primary_key=True, autoincrement=False)
+    timeslots = Column(Integer, nullable=False, default=0)
+    capacity = Column(Integer, nullable=False, default=0)
+    booked = Column(Integer, nullable=False, default=0)
+
+
+class ChallengeStats(Base):
+    __tablename__ = "challenge_stats"
+
+    # a missing row means the challenge has to be recomputed
+    challenge_id = Column(Integer, ForeignKey("challenges.id", ondelete="CASCADE"), primary_key=True)
+    contributed = Column(Float, nullable=False, default=0.0)
+    refreshed_at = Column(DateTime, default=datetime.now, nullable=False)
+
+
+class StatsDirtyDay(Base):
+    """Days whose donation or timeslot rollups are out of date."""
+    __tablename__ = "stats_dirty_days"
+
+    day = Column(Date, primary_key=True)
@@ -38,6 +38,12 @@ class User(Base):
     created_posts = relationship("Post", back_populates="user", cascade="all, delete-orphan")
     liked_posts = relationship("Kudos", back_populates="user", cascade="all, delete-orphan")
 
+    # Relationship to the points ledger
+    points_transactions = relationship("PointsTransaction", back_populates="user", cascade="all, delete-orphan")
+
+    # Relationship to the precomputed next eligible dates per donation type
+    eligibility = relationship("DonorEligibility", back_populates="user", cascade="all, delete-orphan")
+
     def model_dump(self):
         return {
             "id": self.id,
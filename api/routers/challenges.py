@@ -1,23 +1,30 @@
-from fastapi import HTTPException, APIRouter, Depends
+from typing import Optional
+from fastapi import HTTPException, APIRouter, Depends, Query
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 from database import get_db
+from models.challenge import Challenge
+from models.user import User
 from schemas.response import ResponseModel
-from schemas.challenge import ChallengeCreate, ChallengeUpdate, ChallengeResponse
+from schemas.challenge import ChallengeCreate, ChallengeUpdate, ChallengeResponse, ChallengeLeaderboardResponse
 from schemas.user import UserResponse
 from services.challenge import (
     create_challenge,
     get_challenges,
+    get_challenges_page,
     get_challenges_by_user_id,
     delete_challenge,
     update_challenge,
     get_challenge_by_id,
     add_user_to_challenge,
     get_users_by_challenge_id,
+    get_challenge_participants,
     delete_user_from_challenge,
     get_friends_by_challenge_id
 )
-from services.user import check_user_exists
+from services.challenge_leaderboard import get_challenge_leaderboard
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_data, check_cursor
+from services.repository import get_or_404
 
 router = APIRouter(
     prefix="/challenges",
@@ -33,10 +40,22 @@ def create_new_challenge_route(challenge: ChallengeCreate, db: Session = Depends
         raise HTTPException(status_code=500, detail=f"An error occurred while creating the challenge: {e}") from e
 
 @router.get("/", response_model=ResponseModel)
-def read_challenges_route(db: Session = Depends(get_db)):
+def read_challenges_route(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    check_cursor(cursor)
     try:
-        challenges = get_challenges(db=db)
-        return ResponseModel(status=200, data=[ChallengeResponse.model_validate(challenge) for challenge in challenges], message="Challenges retrieved successfully")
+        # Without limit or cursor every challenge is returned as a plain list, as before
+        if limit is None and cursor is None:
+            challenges = get_challenges(db=db)
+            return ResponseModel(status=200, data=[ChallengeResponse.model_validate(challenge) for challenge in challenges], message="Challenges retrieved successfully")
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        challenges, next_cursor = get_challenges_page(db=db, limit=limit, cursor=cursor)
+        page = page_data([ChallengeResponse.model_validate(challenge) for challenge in challenges], limit, next_cursor)
+        return ResponseModel(status=200, data=page, message="Challenges retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the challenges: {e}") from e
 
@@ -66,8 +85,7 @@ def remove_challenge_route(challenge_id: int, db: Session = Depends(get_db)):
 
 @router.post("/{challenge_id}/user/{user_id}", response_model=ResponseModel)
 def add_user_to_challenge_route(challenge_id: int, user_id: int, db: Session = Depends(get_db)):
-    if not check_user_exists(db, user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+    get_or_404(db, User, user_id)
     try:
         add_user_to_challenge(db, challenge_id, user_id)
         return ResponseModel(status=200, message="User added to challenge successfully")
@@ -76,8 +94,7 @@ def add_user_to_challenge_route(challenge_id: int, user_id: int, db: Session = D
 
 @router.get("/user/{user_id}", response_model=ResponseModel)
 def read_challenges_by_user_id_route(user_id: int, db: Session = Depends(get_db)):
-    if not check_user_exists(db, user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+    get_or_404(db, User, user_id)
     try:
         challenges = get_challenges_by_user_id(db=db, user_id=user_id)
         return ResponseModel(status=200, data=[ChallengeResponse.model_validate(challenge) for challenge in challenges], message="Challenges retrieved successfully")
@@ -86,27 +103,67 @@ def read_challenges_by_user_id_route(user_id: int, db: Session = Depends(get_db)
     
 
 @router.get("/{challenge_id}/users/{user_id}/friends", response_model=ResponseModel)
-def get_friends_by_challenge_id_route(challenge_id: int, user_id: int, db: Session = Depends(get_db)):
-    if not check_user_exists(db, user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+def get_friends_by_challenge_id_route(
+    challenge_id: int,
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    get_or_404(db, User, user_id)
+    check_cursor(cursor)
     try:
-        users = get_friends_by_challenge_id(db, challenge_id, user_id)
-        return ResponseModel(status=200, data=[UserResponse.model_validate(friend) for friend in users], message="Friends retrieved successfully")
+        # Without limit or cursor every friend is returned as a plain list, as before
+        if limit is None and cursor is None:
+            users = get_friends_by_challenge_id(db, challenge_id, user_id)
+            return ResponseModel(status=200, data=[UserResponse.model_validate(friend) for friend in users], message="Friends retrieved successfully")
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        users, next_cursor = get_challenge_participants(db, challenge_id, limit=limit, cursor=cursor, friends_of=user_id)
+        page = page_data([UserResponse.model_validate(friend) for friend in users], limit, next_cursor)
+        return ResponseModel(status=200, data=page, message="Friends retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the friends: {e}") from e
 
+@router.get("/{challenge_id}/leaderboard", response_model=ResponseModel)
+def get_challenge_leaderboard_route(
+    challenge_id: int,
+    top: int = Query(10, ge=1, le=100),
+    around_user: Optional[int] = None,
+    radius: int = Query(2, ge=0, le=50),
+    db: Session = Depends(get_db),
+):
+    get_or_404(db, Challenge, challenge_id)
+    try:
+        leaderboard = get_challenge_leaderboard(db, challenge_id, top=top, around_user=around_user, radius=radius)
+        return ResponseModel(status=200, data=ChallengeLeaderboardResponse(**leaderboard).model_dump(), message="Leaderboard retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the leaderboard: {e}") from e
+
 @router.get("/{challenge_id}/users", response_model=ResponseModel)
-def get_users_by_challenge_id_route(challenge_id: int, db: Session = Depends(get_db)):
+def get_users_by_challenge_id_route(
+    challenge_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    check_cursor(cursor)
     try:
-        users = get_users_by_challenge_id(db, challenge_id)
-        return ResponseModel(status=200, data=[UserResponse.model_validate(user) for user in users], message="Users retrieved successfully")
+        # Without limit or cursor every participant is returned as a plain list, as before
+        if limit is None and cursor is None:
+            users = get_users_by_challenge_id(db, challenge_id)
+            return ResponseModel(status=200, data=[UserResponse.model_validate(user) for user in users], message="Users retrieved successfully")
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        users, next_cursor = get_challenge_participants(db, challenge_id, limit=limit, cursor=cursor)
+        page = page_data([UserResponse.model_validate(user) for user in users], limit, next_cursor)
+        return ResponseModel(status=200, data=page, message="Users retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the users: {e}") from e
 
 @router.delete("/{challenge_id}/user/{user_id}", response_model=ResponseModel)
 def delete_user_from_challenge_route(challenge_id: int, user_id: int, db: Session = Depends(get_db)):
-    if not check_user_exists(db, user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+    get_or_404(db, User, user_id)
     try:
         delete_user_from_challenge(db, challenge_id, user_id)
         return ResponseModel(status=200, message="User deleted from challenge successfully")
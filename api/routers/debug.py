@@ -0,0 +1,56 @@
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from schemas.response import ResponseModel
+from services.admin_auth import require_admin_token
+from services.query_profiler import query_profiler
+from services.sampling_profiler import sampling_profiler
+from services.startup import startup_timings
+
+QUERY_SORTS = ("total_ms", "mean_ms", "max_ms", "calls", "slow")
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["debug"],
+    dependencies=[Depends(require_admin_token)],
+)
+
+@router.get("/queries", response_model=ResponseModel)
+def read_query_report(limit: int = Query(20, ge=1, le=500), sort: str = Query("total_ms", pattern=f"^({'|'.join(QUERY_SORTS)})$")):
+    try:
+        report = query_profiler.report(limit=limit, sort=sort)
+        return ResponseModel(status=200, data=report, message="Query report retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the query report: {e}") from e
+
+@router.delete("/queries", response_model=ResponseModel)
+def reset_query_report():
+    query_profiler.reset()
+    return ResponseModel(status=200, message="Query report reset successfully")
+
+@router.get("/startup", response_model=ResponseModel)
+def read_startup_timings():
+    return ResponseModel(status=200, data=startup_timings.as_dict(), message="Startup timings retrieved successfully")
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def read_profile(seconds: float = Query(10.0, gt=0, le=60)):
+    # the capture is awaited on the event loop, it does not hold a worker thread
+    capture = sampling_profiler.begin()
+    try:
+        await anyio.sleep(seconds)
+    finally:
+        profile = sampling_profiler.end(capture)
+    return PlainTextResponse(profile.collapsed(), headers={"X-Profile-Samples": str(profile.samples)})
+
+@router.get("/profile/recent", response_model=ResponseModel)
+def read_recent_profiles(top: int = Query(10, ge=1, le=100)):
+    profiles = [profile.summary(top) for profile in sampling_profiler.recent()]
+    return ResponseModel(status=200, data={"running": sampling_profiler.running, "profiles": profiles}, message="Profiles retrieved successfully")
+
+@router.get("/profile/recent/{index}", response_class=PlainTextResponse)
+def read_recent_profile(index: int):
+    profiles = sampling_profiler.recent()
+    if not 0 <= index < len(profiles):
+        raise HTTPException(status_code=404, detail=f"No recent profile at index {index}")
+    return PlainTextResponse(profiles[index].collapsed())
@@ -1,13 +1,23 @@
-from fastapi import HTTPException, APIRouter, Depends
+import io
+from datetime import datetime
+from typing import List, Optional
+from fastapi import HTTPException, APIRouter, Depends, Query, UploadFile
 from sqlalchemy.orm import Session
 
 from database import get_db
+from models.donation import Donation
+from models.location_info import LocationInfo
+from models.user import User
 from schemas.response import ResponseModel
-from schemas.donation import DonationCreate, DonationBase, LocationInfoCreate, LocationInfoBase, LocationInfoResponse, Timeslot, DonationResponse, TimeslotResponse
+from schemas.donation import DonationCreate, DonationBase, LocationInfoCreate, LocationInfoBase, LocationInfoResponse, LocationInfoSummary, Timeslot, DonationResponse, TimeslotResponse, TimeslotTemplateCreate, TimeslotTemplateResponse
 from services.donation import (
     get_location_info_by_id,
     create_donation,
+    create_donations,
+    get_donations_by_ids,
     get_donations_by_user_id,
+    get_donation_history,
+    get_donation_summary,
     delete_donation,
     update_donation,
     get_donation_by_id,
@@ -16,21 +26,38 @@ from services.donation import (
     delete_location_info,
     get_location_info_by_city,
     get_timeslots_by_location_id,
+    create_timeslots,
     get_all_location_info,
     get_friends_donations
     
 )
-from services.user import check_user_exists
+from services.eligibility import get_eligibility
+from services.schedule_import import SCHEDULE_FORMATS, import_schedule
+from services.timeslot_template import (
+    create_timeslot_templates,
+    get_timeslot_templates,
+    delete_timeslot_template,
+    get_scheduled_timeslots,
+    book_timeslot,
+)
+from services.repository import get_or_404
+from services.fieldsets import Fieldset
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_data, check_cursor
 
 router = APIRouter(
     prefix="/donations",
     tags=["donations"],
 )
 
+def donation_fieldset(fields: Optional[str], expand: Optional[str]) -> Fieldset:
+    return Fieldset(Donation, DonationResponse, fields, expand, relationships={"location": LocationInfoSummary})
+
+def location_fieldset(fields: Optional[str], expand: Optional[str]) -> Fieldset:
+    return Fieldset(LocationInfo, LocationInfoResponse, fields, expand, relationships={"timeslots": Timeslot}, default_expand=["timeslots"])
+
 @router.post("/", response_model=ResponseModel)
 def create_new_donation(donation: DonationCreate, db: Session = Depends(get_db)):
-    if not check_user_exists(db, donation.user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {donation.user_id}")
+    get_or_404(db, User, donation.user_id)
     
     try:
         new_donation = create_donation(db=db, donation=donation)
@@ -38,21 +65,71 @@ def create_new_donation(donation: DonationCreate, db: Session = Depends(get_db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while creating the donation: {e}") from e
 
-@router.get("/user/{user_id}", response_model=ResponseModel)
-def read_donations_by_user_id(user_id: int, db: Session = Depends(get_db)):
-    if not check_user_exists(db, user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+@router.post("/batch", response_model=ResponseModel)
+def create_new_donations(donations: List[DonationCreate], db: Session = Depends(get_db)):
+    try:
+        results = create_donations(db=db, donations=donations)
+        return ResponseModel(status=200, data=results, message="Donations processed successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while creating the donations: {e}") from e
+
+@router.get("/", response_model=ResponseModel)
+def read_donations_by_ids(ids: List[int] = Query(...), fields: Optional[str] = None, expand: Optional[str] = None, db: Session = Depends(get_db)):
+    fieldset = donation_fieldset(fields, expand)
     try:
-        donations = get_donations_by_user_id(db=db, user_id=user_id)
-        donations_list = [DonationResponse.model_validate(donation) for donation in donations]
+        donations = get_donations_by_ids(db=db, donation_ids=ids, options=fieldset.options())
+        donations_list = [fieldset.serialize(donation) for donation in donations]
         return ResponseModel(status=200, data=donations_list, message="Donations retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving donations: {e}") from e
+
+@router.get("/user/{user_id}", response_model=ResponseModel)
+def read_donations_by_user_id(
+    user_id: int,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    get_or_404(db, User, user_id)
+    fieldset = donation_fieldset(fields, expand)
+    check_cursor(cursor)
+    try:
+        # Without limit or cursor the full history is returned as a plain list, as before
+        if limit is None and cursor is None:
+            donations = get_donations_by_user_id(db=db, user_id=user_id, options=fieldset.options())
+            donations_list = [fieldset.serialize(donation) for donation in donations]
+            return ResponseModel(status=200, data=donations_list, message="Donations retrieved successfully")
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        donations, next_cursor = get_donation_history(db=db, user_id=user_id, limit=limit, cursor=cursor, options=fieldset.options())
+        page = page_data([fieldset.serialize(donation) for donation in donations], limit, next_cursor)
+        return ResponseModel(status=200, data=page, message="Donations retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving donations: {e}") from e
+
+@router.get("/user/{user_id}/summary", response_model=ResponseModel)
+def read_donation_summary(user_id: int, db: Session = Depends(get_db)):
+    get_or_404(db, User, user_id)
+    try:
+        summary = get_donation_summary(db, user_id)
+        return ResponseModel(status=200, data=summary.model_dump(), message="Donation summary retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the donation summary: {e}") from e
     
+@router.get("/user/{user_id}/eligibility", response_model=ResponseModel)
+def read_eligibility(user_id: int, db: Session = Depends(get_db)):
+    get_or_404(db, User, user_id)
+    try:
+        eligibility = get_eligibility(db, user_id)
+        return ResponseModel(status=200, data=eligibility, message="Eligibility retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving eligibility: {e}") from e
+
 @router.get("/user/{user_id}/friends", response_model=ResponseModel)
 def read_friends_donations(user_id: int, db: Session = Depends(get_db)):
-    if not check_user_exists(db, user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+    get_or_404(db, User, user_id)
     try:
         friends_donations = get_friends_donations(db, user_id)
         friends_donations_list = [DonationResponse.model_validate(donation) for donation in friends_donations]
@@ -78,58 +155,121 @@ def update_donation_route(donation_id: int, donation: DonationBase, db: Session
         raise HTTPException(status_code=500, detail=f"An error occurred while updating the donation: {e}") from e
 
 @router.get("/{donation_id}", response_model=ResponseModel)
-def get_donation_route(donation_id: int, db: Session = Depends(get_db)):
+def get_donation_route(donation_id: int, fields: Optional[str] = None, expand: Optional[str] = None, db: Session = Depends(get_db)):
+    fieldset = donation_fieldset(fields, expand)
     try:
-        donation = get_donation_by_id(db, donation_id)
-        donation_dict = DonationResponse.model_validate(donation)
+        donation = get_donation_by_id(db, donation_id, options=fieldset.options())
+        donation_dict = fieldset.serialize(donation)
         return ResponseModel(status=200, data=donation_dict, message="Donation retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the donation: {e}") from e
 
 @router.get("/location/all", response_model=ResponseModel)
-def get_all_location_info_route(db: Session = Depends(get_db)):
+def get_all_location_info_route(fields: Optional[str] = None, expand: Optional[str] = None, db: Session = Depends(get_db)):
+    fieldset = location_fieldset(fields, expand)
     try:
-        locations = get_all_location_info(db)
-        output = [LocationInfoResponse.model_validate(location) for location in locations]
+        locations = get_all_location_info(db, options=fieldset.options())
+        output = [fieldset.serialize(location) for location in locations]
         return ResponseModel(status=200, data=output, message="Location(s) retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving location information: {e}") from e
 
 @router.get("/location/{city}", response_model=ResponseModel)
-def get_location_info_by_city_route(city: str, db: Session = Depends(get_db)):
+def get_location_info_by_city_route(city: str, fields: Optional[str] = None, expand: Optional[str] = None, db: Session = Depends(get_db)):
+    fieldset = location_fieldset(fields, expand)
     try:
-        locations = get_location_info_by_city(db, city)
-        output = [LocationInfoResponse.model_validate(location) for location in locations]   
+        locations = get_location_info_by_city(db, city, options=fieldset.options())
+        output = [fieldset.serialize(location) for location in locations]   
         return ResponseModel(status=200, data=output, message="Location(s) retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving location information: {e}") from e
 
 @router.get("/location/{location_id}/info", response_model=ResponseModel)
-def get_location_info_by_id_route(location_id: int, db: Session = Depends(get_db)):
+def get_location_info_by_id_route(location_id: int, fields: Optional[str] = None, expand: Optional[str] = None, db: Session = Depends(get_db)):
+    fieldset = location_fieldset(fields, expand)
     try:
-        location = get_location_info_by_id(db, location_id)
-        return ResponseModel(status=200, data=LocationInfoResponse.model_validate(location), message="Location retrieved successfully")
+        location = get_location_info_by_id(db, location_id, options=fieldset.options())
+        return ResponseModel(status=200, data=fieldset.serialize(location), message="Location retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving location information: {e}") from e
 
 @router.get("/location/{location_id}/timeslots", response_model=ResponseModel)
-def get_timeslots_by_location_route(location_id: str, db: Session = Depends(get_db)):
+def get_timeslots_by_location_route(location_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None, db: Session = Depends(get_db)):
     try:
-        timeslots = get_timeslots_by_location_id(db, location_id)
-        output = [TimeslotResponse.model_validate(timeslot) for timeslot in timeslots]
+        if since is not None and until is not None:
+            # stored slots plus the ones the location's templates produce in the window
+            output = get_scheduled_timeslots(db, location_id, since, until)
+        else:
+            timeslots = get_timeslots_by_location_id(db, location_id)
+            output = [TimeslotResponse.model_validate(timeslot) for timeslot in timeslots]
         
         return ResponseModel(status=200, data=output, message="Timeslots retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving timeslots: {e}") from e
 
+@router.post("/location/{location_id}/timeslots", response_model=ResponseModel)
+def create_timeslots_route(location_id: int, timeslots: List[Timeslot], db: Session = Depends(get_db)):
+    try:
+        results = create_timeslots(db, location_id, timeslots)
+        return ResponseModel(status=200, data=results, message="Timeslots processed successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while creating timeslots: {e}") from e
+
+@router.post("/location/{location_id}/timeslots/book", response_model=ResponseModel)
+def book_timeslot_route(location_id: int, start_time: datetime, db: Session = Depends(get_db)):
+    try:
+        timeslot = book_timeslot(db, location_id, start_time)
+        return ResponseModel(status=200, data=TimeslotResponse.model_validate(timeslot).model_dump(), message="Timeslot booked successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while booking the timeslot: {e}") from e
+
+@router.get("/location/{location_id}/templates", response_model=ResponseModel)
+def get_timeslot_templates_route(location_id: int, db: Session = Depends(get_db)):
+    get_or_404(db, LocationInfo, location_id)
+
+    try:
+        templates = get_timeslot_templates(db, location_id)
+        output = [TimeslotTemplateResponse.model_validate(template) for template in templates]
+        return ResponseModel(status=200, data=output, message="Timeslot templates retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving timeslot templates: {e}") from e
+
+@router.post("/location/{location_id}/templates", response_model=ResponseModel)
+def create_timeslot_templates_route(location_id: int, templates: List[TimeslotTemplateCreate], db: Session = Depends(get_db)):
+    try:
+        results = create_timeslot_templates(db, location_id, templates)
+        return ResponseModel(status=200, data=results, message="Timeslot templates processed successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while creating timeslot templates: {e}") from e
+
+@router.delete("/location/{location_id}/templates/{template_id}", response_model=ResponseModel)
+def delete_timeslot_template_route(location_id: int, template_id: int, db: Session = Depends(get_db)):
+    try:
+        delete_timeslot_template(db, location_id, template_id)
+        return ResponseModel(status=200, message="Timeslot template deleted successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while deleting the timeslot template: {e}") from e
+
 @router.post("/location", response_model=ResponseModel)
 def create_location_info_route(location: LocationInfoCreate, db: Session = Depends(get_db)):
     try:
         new_location = create_location_info(db, location)
         return ResponseModel(status=200, data=LocationInfoResponse.model_validate(new_location), message="Location created successfully")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while creating the location: {e}") from e
 
+@router.post("/location/import", response_model=ResponseModel)
+def import_schedule_route(file: UploadFile, format: Optional[str] = Query(None, pattern=f"^({'|'.join(SCHEDULE_FORMATS)})$"), db: Session = Depends(get_db)):
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "jsonl")
+    try:
+        lines = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        result = import_schedule(db, lines, fmt)
+        return ResponseModel(status=200, data=result.model_dump(), message="Schedule imported successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while importing the schedule: {e}") from e
+
 @router.put("/location/{location_id}", response_model=ResponseModel)
 def update_location_info_route(location_id: int, location: LocationInfoBase, db: Session = Depends(get_db)):
     try:
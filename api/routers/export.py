@@ -0,0 +1,51 @@
+import tempfile
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from database import get_db
+from services.admin_auth import require_admin_token
+from services.export import EXPORT_TABLES, EXPORT_FORMATS, export_table
+
+# exports are spooled to disk beyond this size, then streamed back
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+router = APIRouter(
+    prefix="/admin/export",
+    tags=["export"],
+    dependencies=[Depends(require_admin_token)],
+)
+
+def _read_chunks(spool):
+    with spool:
+        while chunk := spool.read(READ_CHUNK_SIZE):
+            yield chunk
+
+@router.get("/{table_name}")
+def export_table_route(
+    table_name: str,
+    format: str = Query("csv", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    if table_name not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Export table not found: {table_name}")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        result = export_table(db, table_name, format, spool, since=since)
+        spool.seek(0)
+    except Exception as e:
+        spool.close()
+        raise HTTPException(status_code=500, detail=f"An error occurred while exporting {table_name}: {e}") from e
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{table_name}.{format}"',
+        "X-Export-Rows": str(result.rows),
+    }
+    if result.watermark is not None:
+        headers["X-Export-Watermark"] = result.watermark.isoformat()
+    return StreamingResponse(_read_chunks(spool), media_type=EXPORT_FORMATS[format], headers=headers)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models.user import User
+from schemas.response import ResponseModel
+from schemas.user import UserResponse
+from services.home import load_home_sections, mark_home_notifications_retrieved
+from services.rate_limit import rate_limit
+from services.repository import get_or_404
+
+router = APIRouter(
+    prefix="/home",
+    tags=["home"],
+)
+
+@router.get("/{user_id}", response_model=ResponseModel, dependencies=[Depends(rate_limit("notifications"))])
+def get_home_screen_route(user_id: int, db: Session = Depends(get_db)):
+    user = get_or_404(db, User, user_id)
+    try:
+        profile = UserResponse.model_validate(user)
+        sections = load_home_sections(user_id)
+        mark_home_notifications_retrieved(db, sections)
+        return ResponseModel(status=200, data={"profile": profile, **sections}, message="Home screen retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the home screen: {e}") from e
@@ -0,0 +1,57 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models.enums import LeaderboardScope
+from models.user import User
+from schemas.response import ResponseModel
+from schemas.points import PointsAward, PointsTransactionResponse, LeaderboardResponse
+from services.admin_auth import require_admin_token
+from services.points import award_points, get_points_history
+from services.leaderboard import get_leaderboard
+from services.repository import get_or_404
+
+router = APIRouter(
+    prefix="/points",
+    tags=["points"],
+)
+
+# Points are earned through donations, kudos and challenges; awarding them directly is an admin action
+@router.post("/{user_id}", response_model=ResponseModel, dependencies=[Depends(require_admin_token)])
+def award_points_route(user_id: int, award: PointsAward, db: Session = Depends(get_db)):
+    try:
+        balance = award_points(db, user_id, award.amount, award.reason)
+        return ResponseModel(status=200, data=balance.model_dump(), message="Points awarded successfully")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while awarding points: {e}") from e
+
+@router.get("/{user_id}/history", response_model=ResponseModel)
+def get_points_history_route(user_id: int, db: Session = Depends(get_db)):
+    get_or_404(db, User, user_id)
+    try:
+        transactions = get_points_history(db, user_id)
+        output = [PointsTransactionResponse.model_validate(transaction) for transaction in transactions]
+        return ResponseModel(status=200, data=output, message="Points history retrieved successfully")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the points history: {e}") from e
+
+@router.get("/leaderboard", response_model=ResponseModel)
+def get_leaderboard_route(
+    scope: LeaderboardScope = LeaderboardScope.GLOBAL,
+    top: int = Query(10, ge=1, le=100),
+    city: Optional[str] = None,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    try:
+        leaderboard = get_leaderboard(db, scope, top=top, city=city, user_id=user_id)
+        return ResponseModel(status=200, data=LeaderboardResponse(**leaderboard).model_dump(), message="Leaderboard retrieved successfully")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the leaderboard: {e}") from e
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from database import get_db
 from models.post import Post as PostModel
+from models.user import User
 from models.kudos import Kudos as KudosModel
 from schemas.response import ResponseModel
 from schemas.post import PostCreate, PostResponse, KudosCreate, KudosResponse
-from services.post import create_post, get_posts_by_user_id, delete_post, add_kudos, get_kudos_by_post_id, delete_kudos, get_friends_posts, check_post_exists, check_kudos_exists
-from services.user import check_user_exists
+from services.post import create_post, get_posts_by_user_id, get_posts_page, delete_post, add_kudos, add_kudos_batch, get_kudos_by_post_id, get_kudos_page, delete_kudos, get_friends_posts, check_post_exists, check_kudos_exists
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_data, check_cursor
+from services.rate_limit import rate_limit
+from services.repository import get_or_404
 
 
 router = APIRouter(
@@ -19,8 +22,7 @@ router = APIRouter(
 @router.post("/", response_model=ResponseModel)
 def create_new_post(post: PostCreate, db: Session = Depends(get_db)):
     if post.user_id:
-        if not check_user_exists(db, post.user_id):
-            raise HTTPException(status_code=404, detail=f"User not found with ID {post.user_id}")
+        get_or_404(db, User, post.user_id)
     try:
         new_post = create_post(db=db, post=post)
         return ResponseModel(status=200, data=PostResponse.model_validate(new_post), message="Post created successfully")
@@ -28,13 +30,25 @@ def create_new_post(post: PostCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"An error occurred while creating the post: {e}") from e
 
 @router.get("/user/{user_id}", response_model=ResponseModel)
-def read_posts_by_user_id(user_id: int, db: Session = Depends(get_db)):
-    if not check_user_exists(db, user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+def read_posts_by_user_id(
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    get_or_404(db, User, user_id)
+    check_cursor(cursor)
     try:
-        posts = get_posts_by_user_id(db=db, user_id=user_id)
-        output = [PostResponse.model_validate(post) for post in posts]
-        return ResponseModel(status=200, data=output, message="Posts retrieved successfully")
+        # Without limit or cursor every post is returned as a plain list, as before
+        if limit is None and cursor is None:
+            posts = get_posts_by_user_id(db=db, user_id=user_id)
+            output = [PostResponse.model_validate(post) for post in posts]
+            return ResponseModel(status=200, data=output, message="Posts retrieved successfully")
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        posts, next_cursor = get_posts_page(db=db, user_id=user_id, limit=limit, cursor=cursor)
+        page = page_data([PostResponse.model_validate(post) for post in posts], limit, next_cursor)
+        return ResponseModel(status=200, data=page, message="Posts retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the posts: {e}") from e
     
@@ -49,40 +63,71 @@ def remove_post(post_id: int, db: Session = Depends(get_db)):
 @router.post("/{post_id}/kudos", response_model=ResponseModel)
 def add_kudos_to_post(post_id: int, kudos: KudosCreate, db: Session = Depends(get_db)):
     kudos.post_id = post_id
-    if not check_user_exists(db, kudos.user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {kudos.user_id}")
+    get_or_404(db, User, kudos.user_id)
     try:
         add_kudos(db=db, kudos=kudos)
         return ResponseModel(status=200, message="Kudos added successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while adding kudos: {e}") from e
     
+@router.post("/kudos/batch", response_model=ResponseModel)
+def add_kudos_batch_route(kudos: List[KudosCreate], db: Session = Depends(get_db)):
+    try:
+        results = add_kudos_batch(db=db, kudos_list=kudos)
+        return ResponseModel(status=200, data=results, message="Kudos processed successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while adding kudos: {e}") from e
+
 @router.get("/{post_id}/kudos", response_model=ResponseModel)
-def read_kudos_by_post_id(post_id: int, db: Session = Depends(get_db)):
+def read_kudos_by_post_id(
+    post_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    check_cursor(cursor)
     try:
-        kudos = get_kudos_by_post_id(db=db, post_id=post_id)
-        output = [KudosResponse.model_validate(kudo) for kudo in kudos]
-        return ResponseModel(status=200, data=output, message="Kudos retrieved successfully")
+        # Without limit or cursor every kudos is returned as a plain list, as before
+        if limit is None and cursor is None:
+            kudos = get_kudos_by_post_id(db=db, post_id=post_id)
+            output = [KudosResponse.model_validate(kudo) for kudo in kudos]
+            return ResponseModel(status=200, data=output, message="Kudos retrieved successfully")
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        kudos, next_cursor = get_kudos_page(db=db, post_id=post_id, limit=limit, cursor=cursor)
+        page = page_data([KudosResponse.model_validate(kudo) for kudo in kudos], limit, next_cursor)
+        return ResponseModel(status=200, data=page, message="Kudos retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the kudos: {e}") from e
     
 @router.delete("/{post_id}/kudos/{user_id}", response_model=ResponseModel)
 def remove_kudos(post_id: int, user_id: int, db: Session = Depends(get_db)):
-    if not check_user_exists(db, user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+    get_or_404(db, User, user_id)
     try:
         delete_kudos(db=db, post_id=post_id, user_id=user_id)
         return ResponseModel(status=200, message="Kudos deleted successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while deleting the kudos: {e}") from e
     
-@router.get("/friends/{user_id}", response_model=ResponseModel)
-def read_friends_posts(user_id: int, db: Session = Depends(get_db)):
-    if not check_user_exists(db, user_id):
-        raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+@router.get("/friends/{user_id}", response_model=ResponseModel, dependencies=[Depends(rate_limit("friends_posts"))])
+def read_friends_posts(
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    get_or_404(db, User, user_id)
+    check_cursor(cursor)
     try:
-        posts = get_friends_posts(db=db, user_id=user_id)
-        output = [PostResponse.model_validate(post) for post in posts]
-        return ResponseModel(status=200, data=output, message="Friends' posts retrieved successfully")
+        # Without limit or cursor the latest posts are returned as a plain list, as before
+        if limit is None and cursor is None:
+            posts = get_friends_posts(db=db, user_id=user_id)
+            output = [PostResponse.model_validate(post) for post in posts]
+            return ResponseModel(status=200, data=output, message="Friends' posts retrieved successfully")
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        posts, next_cursor = get_posts_page(db=db, user_id=user_id, limit=limit, cursor=cursor)
+        page = page_data([PostResponse.model_validate(post) for post in posts], limit, next_cursor)
+        return ResponseModel(status=200, data=page, message="Friends' posts retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the friends' posts: {e}") from e
\ No newline at end of file
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from database import get_db
+from schemas.recall import RecallRequest
+from schemas.response import ResponseModel
+from services.admin_auth import require_admin_token
+from services.recall import send_recall
+
+router = APIRouter(
+    prefix="/recall",
+    tags=["recall"],
+    dependencies=[Depends(require_admin_token)],
+)
+
+@router.post("/", response_model=ResponseModel)
+def send_recall_route(recall: RecallRequest, db: Session = Depends(get_db)):
+    try:
+        result = send_recall(db, recall)
+        message = "Recall previewed successfully" if recall.dry_run else "Recall sent successfully"
+        return ResponseModel(status=200, data=result.model_dump(), message=message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while sending the recall: {e}") from e
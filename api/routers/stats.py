@@ -0,0 +1,57 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from database import get_db
+from schemas.response import ResponseModel
+from services.admin_auth import require_admin_token
+from services.stats import (
+    refresh_stale_stats,
+    donations_per_location_per_day,
+    timeslot_fill_rates,
+    cancellation_rates,
+    challenge_goal_attainment,
+)
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+    dependencies=[Depends(require_admin_token)],
+)
+
+@router.get("/donations/daily", response_model=ResponseModel)
+def read_donations_per_day(since: Optional[date] = None, until: Optional[date] = None, location_id: Optional[int] = None, db: Session = Depends(get_db)):
+    try:
+        refresh_stale_stats(db)
+        stats = donations_per_location_per_day(db, since=since, until=until, location_id=location_id)
+        return ResponseModel(status=200, data=stats, message="Donation statistics retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving donation statistics: {e}") from e
+
+@router.get("/timeslots/fill-rate", response_model=ResponseModel)
+def read_timeslot_fill_rates(since: Optional[date] = None, until: Optional[date] = None, location_id: Optional[int] = None, db: Session = Depends(get_db)):
+    try:
+        refresh_stale_stats(db)
+        stats = timeslot_fill_rates(db, since=since, until=until, location_id=location_id)
+        return ResponseModel(status=200, data=stats, message="Timeslot fill rates retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving timeslot fill rates: {e}") from e
+
+@router.get("/donations/cancellation-rate", response_model=ResponseModel)
+def read_cancellation_rates(since: Optional[date] = None, until: Optional[date] = None, db: Session = Depends(get_db)):
+    try:
+        refresh_stale_stats(db)
+        stats = cancellation_rates(db, since=since, until=until)
+        return ResponseModel(status=200, data=stats, message="Cancellation rates retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving cancellation rates: {e}") from e
+
+@router.get("/challenges/goal-attainment", response_model=ResponseModel)
+def read_challenge_goal_attainment(db: Session = Depends(get_db)):
+    try:
+        refresh_stale_stats(db)
+        stats = challenge_goal_attainment(db)
+        return ResponseModel(status=200, data=stats, message="Challenge goal attainment retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving challenge goal attainment: {e}") from e
@@ -1,27 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from models.enums import FriendshipStatus
+from models.user import User
 from schemas.response import ResponseModel
 from schemas.user import UserCreate, UserUpdate, UserResponse
 from schemas.friend import FriendRequestModel
 from services.user import (
     create_user,
     get_user_by_id,
+    get_users_by_ids,
     get_users_by_partial_username,
     update_user,
     delete_user,
     send_friend_request,
     edit_friend_request,
     get_friends,
+    get_friends_page,
     get_friend_requests,
     get_sent_requests,
     delete_friend,
     get_user_by_email_and_password,
     create_notification,
     get_notifications,
+    get_notifications_page,
     get_new_notifications
 )
 from database import get_db
+from services.fieldsets import Fieldset
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_data, check_cursor
+from services.rate_limit import rate_limit
 from schemas.notification import NotificationCreate, NotificationResponse
 
 
@@ -38,15 +46,25 @@ def create_user_route(user: UserCreate, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while creating the user: {e}.") from e
 
+@router.get("/", response_model=ResponseModel)
+def get_users_by_ids_route(ids: List[int] = Query(...), fields: Optional[str] = None, db: Session = Depends(get_db)):
+    fieldset = Fieldset(User, UserResponse, fields)
+    try:
+        users = get_users_by_ids(db, ids, options=fieldset.options())
+        return ResponseModel(status=200, data=[fieldset.serialize(user) for user in users], message="Users retrieved successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred while retrieving users: {e}") from e
+
 @router.get("/id/{user_id}", response_model=ResponseModel)
-def get_user_by_id_route(user_id: int, db: Session = Depends(get_db)):
+def get_user_by_id_route(user_id: int, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    fieldset = Fieldset(User, UserResponse, fields)
     try:
-        user = get_user_by_id(db, user_id)
-        return ResponseModel(status=200, data=UserResponse.model_validate(user), message="User retrieved successfully")
+        user = get_user_by_id(db, user_id, options=fieldset.options())
+        return ResponseModel(status=200, data=fieldset.serialize(user), message="User retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the user: {e}") from e
 
-@router.get("/email/{email}", response_model=ResponseModel)
+@router.get("/email/{email}", response_model=ResponseModel, dependencies=[Depends(rate_limit("login", key_param="email"))])
 def get_user_by_email_and_password_route(email: str, password: str, db: Session = Depends(get_db)):
     try:
         user = get_user_by_email_and_password(db, email, password)
@@ -55,10 +73,11 @@ def get_user_by_email_and_password_route(email: str, password: str, db: Session
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving the user: {e}") from e
 
 @router.get("/username/{username}", response_model=ResponseModel)
-def get_users_by_partial_username_route(username: str, db: Session = Depends(get_db)):
+def get_users_by_partial_username_route(username: str, fields: Optional[str] = None, db: Session = Depends(get_db)):
+    fieldset = Fieldset(User, UserResponse, fields)
     try:
-        users = get_users_by_partial_username(db, username)
-        return ResponseModel(status=200, data=[UserResponse.model_validate(user) for user in users], message="Users retrieved successfully")
+        users = get_users_by_partial_username(db, username, options=fieldset.options())
+        return ResponseModel(status=200, data=[fieldset.serialize(user) for user in users], message="Users retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving users: {e}") from e
 
@@ -95,11 +114,24 @@ def edit_friend_request_route(user_id: int, friend_id: int, status: FriendshipSt
         raise HTTPException(status_code=500, detail=f"An error occurred while updating the friend request: {e}") from e
 
 @router.get("/{user_id}/friends", response_model=ResponseModel)
-def get_friends_route(user_id: int, db: Session = Depends(get_db)):
+def get_friends_route(
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    check_cursor(cursor)
     try:
-        friends = get_friends(db, user_id)
-        output = [UserResponse.model_validate(friend) for friend in friends]
-        return ResponseModel(status=200, data=output, message="Friends retrieved successfully")
+        # Without limit or cursor every friend is returned as a plain list, as before
+        if limit is None and cursor is None:
+            friends = get_friends(db, user_id)
+            output = [UserResponse.model_validate(friend) for friend in friends]
+            return ResponseModel(status=200, data=output, message="Friends retrieved successfully")
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        friends, next_cursor = get_friends_page(db, user_id, limit=limit, cursor=cursor)
+        page = page_data([UserResponse.model_validate(friend) for friend in friends], limit, next_cursor)
+        return ResponseModel(status=200, data=page, message="Friends retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving friends: {e}") from e
 
@@ -138,15 +170,28 @@ def create_notification_route(notification: NotificationCreate, db: Session = De
         raise HTTPException(status_code=500, detail=f"An error occurred while creating the notification: {e}") from e
     
 @router.get("/{user_id}/notifications", response_model=ResponseModel)
-def get_notifications_route(user_id: int, db: Session = Depends(get_db)):
+def get_notifications_route(
+    user_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    check_cursor(cursor)
     try:
-        notifications = get_notifications(db, user_id)
-        output = [NotificationResponse.model_validate(notification) for notification in notifications]
-        return ResponseModel(status=200, data=output, message="Notifications retrieved successfully")
+        # Without limit or cursor every notification is returned as a plain list, as before
+        if limit is None and cursor is None:
+            notifications = get_notifications(db, user_id)
+            output = [NotificationResponse.model_validate(notification) for notification in notifications]
+            return ResponseModel(status=200, data=output, message="Notifications retrieved successfully")
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        notifications, next_cursor = get_notifications_page(db, user_id, limit=limit, cursor=cursor)
+        page = page_data([NotificationResponse.model_validate(notification) for notification in notifications], limit, next_cursor)
+        return ResponseModel(status=200, data=page, message="Notifications retrieved successfully")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred while retrieving notifications: {e}") from e
     
-@router.get("/{user_id}/new-notifications", response_model=ResponseModel)
+@router.get("/{user_id}/new-notifications", response_model=ResponseModel, dependencies=[Depends(rate_limit("notifications"))])
 def get_new_notifications_route(user_id: int, db: Session = Depends(get_db)):
     try:
         notifications = get_new_notifications(db, user_id)
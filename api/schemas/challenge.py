@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class ChallengeBase(BaseModel):
     title: str = Field(...)
@@ -57,4 +57,15 @@ class ChallengeUserResponse(ChallengeUserBase):
             "challenge_id": self.challenge_id,
             "user_id": self.user_id,
             "status": self.status
-        }
\ No newline at end of file
+        }
+
+
+class ChallengeLeaderboardEntry(BaseModel):
+    rank: int = Field(...)
+    user_id: int = Field(...)
+    contributed: float = Field(...)
+
+class ChallengeLeaderboardResponse(BaseModel):
+    top: List[ChallengeLeaderboardEntry] = Field(...)
+    around: Optional[List[ChallengeLeaderboardEntry]] = Field(None)
+    size: int = Field(...)
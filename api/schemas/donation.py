@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime, time
+from typing import Dict, List, Optional
 from models.enums import DonationType, DonationStatus
 
 
@@ -65,6 +65,62 @@ class LocationInfoResponse(LocationInfoBase):
             "timeslots": self.timeslots
         }
 
+class ScheduledTimeslot(Timeslot):
+    # None until the slot is booked and stored
+    id: Optional[int] = None
+    template_id: Optional[int] = None
+
+    def model_dump(self):
+        return {
+            "id": self.id,
+            "template_id": self.template_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "total_capacity": self.total_capacity,
+            "remaining_capacity": self.remaining_capacity
+        }
+
+class TimeslotTemplateBase(BaseModel):
+    weekday: int = Field(..., ge=0, le=6)
+    start_time: time = Field(...)
+    end_time: time = Field(...)
+    slot_minutes: int = Field(..., gt=0)
+    capacity: int = Field(..., gt=0)
+    valid_from: Optional[date] = None
+    valid_until: Optional[date] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class TimeslotTemplateCreate(TimeslotTemplateBase):
+    pass
+
+class TimeslotTemplateResponse(TimeslotTemplateBase):
+    id: int = Field(...)
+    location_id: int = Field(...)
+
+class ScheduleImportError(BaseModel):
+    line: int = Field(...)
+    message: str = Field(...)
+
+class ScheduleImportResult(BaseModel):
+    locations: int = Field(...)
+    timeslots: int = Field(...)
+    rejected: int = Field(...)
+    # the first rejected records, up to MAX_REPORTED_ERRORS
+    errors: List[ScheduleImportError] = Field(...)
+    seconds: float = Field(...)
+    timeslots_per_second: float = Field(...)
+
+class LocationInfoSummary(BaseModel):
+    id: int = Field(...)
+    name: str = Field(...)
+    address: str = Field(...)
+    opening_hours: str = Field(...)
+    latitude: str = Field(...)
+    longitude: str = Field(...)
+
+    model_config = ConfigDict(from_attributes=True)
+
 class DonationBase(BaseModel):
     amount: Optional[float] = Field(...)
     user_id: int = Field(...)
@@ -98,3 +154,20 @@ class DonationResponse(DonationBase):
             "enable_joining": self.enable_joining
         }
     
+
+class DonationTotals(BaseModel):
+    donation_type: DonationType = Field(...)
+    status: DonationStatus = Field(...)
+    count: int = Field(...)
+    amount: float = Field(...)
+
+class DonationSummary(BaseModel):
+    user_id: int = Field(...)
+    totals: List[DonationTotals] = Field(...)
+    total_count: int = Field(...)
+    # amount of completed donations only
+    total_amount: float = Field(...)
+    last_donation_at: Optional[datetime] = None
+    # earliest date any donation is allowed again, None if the user never donated
+    next_eligible_at: Optional[datetime] = None
+    next_eligible_by_type: Dict[DonationType, datetime] = Field(default_factory=dict)
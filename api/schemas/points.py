@@ -0,0 +1,44 @@
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from datetime import datetime
+from typing import List, Optional
+
+
+# largest single award or spend through the points route
+MAX_POINTS_AWARD = 10000
+
+
+class PointsAward(BaseModel):
+    amount: int = Field(..., ge=-MAX_POINTS_AWARD, le=MAX_POINTS_AWARD)
+    reason: str = Field(..., min_length=1)
+
+    @field_validator("amount")
+    @classmethod
+    def amount_not_zero(cls, amount: int) -> int:
+        if amount == 0:
+            raise ValueError("amount must not be zero")
+        return amount
+
+class PointsTransactionResponse(BaseModel):
+    id: int = Field(...)
+    user_id: int = Field(...)
+    amount: int = Field(...)
+    reason: str = Field(...)
+    created_at: datetime = Field(...)
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PointsBalance(BaseModel):
+    user_id: int = Field(...)
+    current_points: int = Field(...)
+    total_points: int = Field(...)
+    transaction: PointsTransactionResponse = Field(...)
+
+class LeaderboardEntry(BaseModel):
+    rank: int = Field(...)
+    user_id: int = Field(...)
+    points: int = Field(...)
+
+class LeaderboardResponse(BaseModel):
+    top: List[LeaderboardEntry] = Field(...)
+    me: Optional[LeaderboardEntry] = Field(None)
+    size: int = Field(...)
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from models.enums import DonationType
+
+
+class RecallRequest(BaseModel):
+    blood_types: List[str] = Field(..., min_length=1)
+    donation_type: DonationType = DonationType.BLOOD
+    # restrict to a city, to the cities near a location, or both
+    city: Optional[str] = None
+    location_id: Optional[int] = None
+    radius_km: float = Field(25.0, gt=0)
+    # only donors whose last donation is at most this many days ago
+    donated_within_days: Optional[int] = Field(None, ge=1)
+    title: str = Field(...)
+    content: str = Field(...)
+    limit: Optional[int] = Field(None, ge=1)
+    dry_run: bool = False
+
+class RecallResult(BaseModel):
+    matched: int
+    notified: int
+    selection_ms: float
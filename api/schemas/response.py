@@ -5,3 +5,10 @@ class ResponseModel(BaseModel):
     status: int
     data: dict | list | None = None
     message: str | None = None
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: int
+    id: int | None = None
+    message: str | None = None
@@ -28,8 +28,7 @@ class UserUpdate(BaseModel):
     password: Optional[str] = Field(None)
     birthdate: Optional[datetime] = Field(None)
     city: Optional[str] = Field(None)
-    current_points: Optional[int] = Field(None)
-    total_points: Optional[int] = Field(None)
+    # points are only changed through services.points, which writes the ledger
     role: Optional[UserRole] = Field(None)
     
     model_config = ConfigDict(from_attributes=True)
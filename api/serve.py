@@ -0,0 +1,45 @@
+"""Production entry point, run from the api directory.
+
+    python serve.py
+
+Starts WEB_CONCURRENCY uvicorn worker processes on PORT. Every worker has its
+own threadpool for the sync routes (THREADPOOL_SIZE, see main.py) and its own
+connection pool (DB_POOL_SIZE + DB_MAX_OVERFLOW, see database.py), so the
+database sees up to WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+connections plus one cache bus listener per worker.
+
+The in-process caches are per worker as well; each worker broadcasts its
+cache changes to the others over the cache bus (services/cache_bus.py).
+"""
+import os
+
+import uvicorn
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# Restart a worker after this many requests, 0 never; bounds the growth of a leaking worker
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))
+KEEP_ALIVE = int(os.getenv("KEEP_ALIVE", "5"))
+# Addresses of the proxies whose X-Forwarded-For is trusted, comma separated.
+# The client address it gives keys the per-IP rate limits, so it must not be
+# "*" unless only the proxy can reach the workers.
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def main():
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        limit_max_requests=MAX_REQUESTS or None,
+        timeout_keep_alive=KEEP_ALIVE,
+        timeout_graceful_shutdown=30,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+# Operational endpoints (debug, export, recall) stay off until a token is set;
+# DEBUG_TOKEN is still read for deployments that set it for the debug routes
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or os.getenv("DEBUG_TOKEN")
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+from uuid import uuid4
+
+from sqlalchemy import text
+
+# PostgreSQL channel the worker processes exchange cache invalidations on
+CACHE_BUS_CHANNEL = os.getenv("CACHE_BUS_CHANNEL", "sanquin_cache")
+# NOTIFY payloads must stay below 8000 bytes
+MAX_PAYLOAD = 7900
+RECONNECT_DELAY = 1.0
+# A payload that cannot be sent is tried again this many times before giving up on it
+SEND_RETRIES = 2
+RETRY_DELAY = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Subscription:
+    handler: Callable[..., None]
+    reset: Callable[[], None]
+
+
+class CacheBus:
+    """Broadcasts cache changes to the other worker processes.
+
+    Every in-process cache subscribes a handler per kind of change together
+    with a `reset` that drops the whole cache. The process making a change
+    updates its own cache directly and `publish`es the change. The others
+    run the subscribed handler with the published arguments.
+
+    With PostgreSQL the changes travel over LISTEN/NOTIFY. Published changes
+    are queued and sent in batches from a background thread, so a write never
+    waits for the broadcast. None of the caches expire, so a lost change is
+    never caught up on its own: a payload that still fails after retrying is
+    replaced by a reset of the caches it touched, which is sent with the next
+    batch. A listener that loses its connection may have missed changes, so
+    it resets every cache when it reconnects. Without `start` nothing is
+    sent, which is what a single process needs.
+    """
+
+    def __init__(self, channel: str = CACHE_BUS_CHANNEL):
+        self.channel = channel
+        self.origin = uuid4().hex
+        self._subscriptions: dict[str, _Subscription] = {}
+        self._queue: queue.SimpleQueue | None = None
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def subscribe(self, name: str, handler: Callable[..., None], reset: Callable[[], None]) -> None:
+        self._subscriptions[name] = _Subscription(handler, reset)
+
+    def publish(self, name: str, *args) -> None:
+        """Send a change to the other processes; `args` must be JSON serializable."""
+        if self._queue is not None:
+            self._queue.put({"cache": name, "args": list(args)})
+
+    def receive(self, payload: str) -> None:
+        """Apply a batch of changes sent by another process."""
+        batch = json.loads(payload)
+        if batch["origin"] == self.origin:
+            return
+        for message in batch["messages"]:
+            subscription = self._subscriptions.get(message["cache"])
+            if subscription is None:
+                continue
+            if message.get("reset"):
+                subscription.reset()
+            else:
+                subscription.handler(*message["args"])
+
+    def reset_all(self) -> None:
+        for subscription in self._subscriptions.values():
+            subscription.reset()
+
+    def _payloads(self, messages: list[dict]) -> list[str]:
+        """Pack `messages` into as few payloads as fit; a change too large to send resets its cache instead."""
+        payloads = []
+        batch: list[str] = []
+        size = 0
+        for message in messages:
+            encoded = json.dumps(message, separators=(",", ":"))
+            if len(encoded.encode()) > MAX_PAYLOAD - 100:
+                encoded = json.dumps({"cache": message["cache"], "reset": True})
+            if batch and size + len(encoded.encode()) > MAX_PAYLOAD - 100:
+                payloads.append(self._envelope(batch))
+                batch, size = [], 0
+            batch.append(encoded)
+            size += len(encoded.encode()) + 1
+        if batch:
+            payloads.append(self._envelope(batch))
+        return payloads
+
+    def _envelope(self, encoded: list[str]) -> str:
+        return f'{{"origin":"{self.origin}","messages":[{",".join(encoded)}]}}'
+
+    def start_sending(self, send: Callable[[str], None]) -> None:
+        """Send published changes with `send` from a background thread until `stop`."""
+        if self._queue is not None:
+            return
+        self._stop.clear()
+        self._queue = queue.SimpleQueue()
+        self._spawn(self._send_loop, (self._queue, send), "cache-bus-sender")
+
+    def start(self, engine) -> None:
+        """Exchange changes with the other processes over `engine`'s database, PostgreSQL only."""
+        if engine.dialect.name != "postgresql" or self._threads:
+            return
+
+        def notify(payload: str) -> None:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+                connection.commit()
+
+        self.start_sending(notify)
+        self._spawn(self._listen_loop, (engine,), "cache-bus-listener")
+
+    def stop(self) -> None:
+        """Send what is still queued and stop the background threads."""
+        if self._queue is not None:
+            self._queue.put(None)
+            self._queue = None
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _spawn(self, target, args, name: str) -> None:
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _send_loop(self, messages: queue.SimpleQueue, send: Callable[[str], None]) -> None:
+        unsent: set[str] = set()
+        stopping = False
+        while not stopping:
+            try:
+                # Caches whose changes were lost are reset without waiting for the next change
+                batch = [messages.get(timeout=RETRY_DELAY if unsent else None)]
+            except queue.Empty:
+                batch = []
+            while not messages.empty():
+                batch.append(messages.get())
+            if None in batch:
+                stopping = True
+                batch = [message for message in batch if message is not None]
+            batch = [{"cache": name, "reset": True} for name in sorted(unsent)] + batch
+            unsent = set()
+            for payload in self._payloads(batch):
+                if not self._send(send, payload):
+                    unsent.update(message["cache"] for message in json.loads(payload)["messages"])
+        if unsent:
+            logger.error("cache bus stopped with unsent changes channel=%s caches=%s", self.channel, ",".join(sorted(unsent)))
+
+    def _send(self, send: Callable[[str], None], payload: str) -> bool:
+        for attempt in range(SEND_RETRIES + 1):
+            try:
+                send(payload)
+                return True
+            except Exception:
+                logger.exception("cache bus send failed channel=%s attempt=%d", self.channel, attempt + 1)
+                if attempt < SEND_RETRIES:
+                    time.sleep(RETRY_DELAY)
+        return False
+
+    def _listen_loop(self, engine) -> None:
+        reconnect = False
+        while not self._stop.is_set():
+            try:
+                raw = engine.raw_connection()
+                raw.detach()
+                connection = raw.driver_connection
+                connection.autocommit = True
+                try:
+                    connection.cursor().execute(f'LISTEN "{self.channel}"')
+                    if reconnect:
+                        self.reset_all()
+                    reconnect = True
+                    while not self._stop.is_set():
+                        if select.select([connection], [], [], 1.0)[0]:
+                            connection.poll()
+                            while connection.notifies:
+                                self.receive(connection.notifies.pop(0).payload)
+                finally:
+                    raw.close()
+            except Exception:
+                logger.exception("cache bus listener failed channel=%s", self.channel)
+                reconnect = True
+                self._stop.wait(RECONNECT_DELAY)
+
+
+cache_bus = CacheBus()
@@ -1,19 +1,26 @@
+import logging
 from datetime import datetime, timezone
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from models.challenge import Challenge
 from models.challenge_user import ChallengeUser
-from models.enums import FriendshipStatus
-from models.friend import Friend
-from models.donation import Donation
+from models.user import User
 from schemas.challenge import ChallengeCreate, ChallengeUpdate
+from services.challenge_leaderboard import all_donations, challenge_leaderboards
+from services.challenge_scheduler import challenge_scheduler, initial_status
+from services.pagination import paginate
+from services.repository import get_or_404
+from services.stats import invalidate_challenge_stats
+from services.user import accepted_friend_ids
+
+logger = logging.getLogger(__name__)
 
 
 def check_challenge_exists(db: Session, challenge_id: int) -> bool:
-    result = db.execute(select(Challenge).filter(Challenge.id == challenge_id))
-    return result.scalars().first() is not None
+    return db.get(Challenge, challenge_id) is not None
 
 def create_challenge(db: Session, challenge: ChallengeCreate) -> Challenge:
     try:
@@ -29,6 +36,7 @@ def create_challenge(db: Session, challenge: ChallengeCreate) -> Challenge:
         db.add(new_challenge)
         db.commit()
         db.refresh(new_challenge)
+        challenge_scheduler.schedule(new_challenge)
         if not new_challenge:
             raise HTTPException(
                 status_code=400, detail="Challenge could not be created"
@@ -56,43 +64,45 @@ def get_challenges(db: Session):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+def get_challenges_page(db: Session, limit: int, cursor: str | None = None):
+    """One page of challenges in ID order, with the cursor of the next page.
+
+    Contributions are only totalled for the challenges on the page.
+    """
+    try:
+        challenges, next_cursor = paginate(db, select(Challenge), (Challenge.id,), limit, cursor)
+        for challenge in challenges:
+            challenge.total_contributions = calculate_total_contributions(db, challenge.id, challenge.start, challenge.end)
+        return challenges, next_cursor
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 def get_challenge_by_id(db: Session, challenge_id: int):
     try:
-        if not check_challenge_exists(db, challenge_id):
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
-        result = db.execute(select(Challenge).filter(Challenge.id == challenge_id))
-        challenge = result.scalars().first()
-        if not challenge:
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
-        
+        challenge = get_or_404(db, Challenge, challenge_id)
+
         # Calculate total contributions for the challenge
         total_contributions = calculate_total_contributions(db, challenge.id, challenge.start, challenge.end)
         challenge.total_contributions = total_contributions
-        print(challenge.total_contributions)
+        logger.debug("challenge contributions challenge_id=%s total_contributions=%s", challenge.id, total_contributions)
         return challenge
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 def update_challenge(db: Session, challenge_id: int, challenge_partial: ChallengeUpdate):
     try:
-        if not check_challenge_exists(db, challenge_id):
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
-        challenge = get_challenge_by_id(db, challenge_id)
-        if not challenge:
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
+        challenge = get_or_404(db, Challenge, challenge_id)
         challenge_data = challenge_partial.dict(exclude_unset=True)
         for key, value in challenge_data.items():
             setattr(challenge, key, value)
+        invalidate_challenge_stats(db, challenge_id)
         db.commit()
-        db.refresh(challenge)
+        challenge_leaderboards.invalidate(challenge_id)
+        if "start" in challenge_data or "end" in challenge_data:
+            challenge_scheduler.schedule(challenge)
+
+        # Reading the expired attributes reloads the row once, no separate refresh needed
+        challenge.total_contributions = calculate_total_contributions(db, challenge.id, challenge.start, challenge.end)
         return challenge
     except Exception as e:
         db.rollback()
@@ -100,18 +110,10 @@ def update_challenge(db: Session, challenge_id: int, challenge_partial: Challeng
 
 def delete_challenge(db: Session, challenge_id: int):
     try:
-        if not check_challenge_exists(db, challenge_id):
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
-        result = db.execute(select(Challenge).filter(Challenge.id == challenge_id))
-        challenge = result.scalars().first()
-        if not challenge:
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
+        challenge = get_or_404(db, Challenge, challenge_id)
         db.delete(challenge)
         db.commit()
+        challenge_leaderboards.invalidate(challenge_id)
         return challenge
     except Exception as e:
         db.rollback()
@@ -119,17 +121,16 @@ def delete_challenge(db: Session, challenge_id: int):
 
 def add_user_to_challenge(db: Session, challenge_id: int, user_id: int):
     try:
-        if not check_challenge_exists(db, challenge_id):
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
+        challenge = get_or_404(db, Challenge, challenge_id)
         new_challenge_user = ChallengeUser(
             challenge_id=challenge_id,
             user_id=user_id,
-            status="active",
+            status=initial_status(challenge),
         )
         db.add(new_challenge_user)
+        invalidate_challenge_stats(db, challenge_id)
         db.commit()
+        challenge_leaderboards.invalidate(challenge_id)
         db.refresh(new_challenge_user)
         if not new_challenge_user:
             raise HTTPException(
@@ -140,28 +141,49 @@ def add_user_to_challenge(db: Session, challenge_id: int, user_id: int):
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+def participants_query(challenge_id: int, friends_of: int | None = None):
+    """The users taking part in a challenge, with one join, in user ID order.
+
+    `friends_of` narrows them down to the accepted friends of that user.
+    """
+    query = (
+        select(User)
+        .join(ChallengeUser, ChallengeUser.user_id == User.id)
+        .where(ChallengeUser.challenge_id == challenge_id)
+        .order_by(ChallengeUser.user_id)
+    )
+    if friends_of is not None:
+        query = query.where(ChallengeUser.user_id.in_(accepted_friend_ids(friends_of)))
+    return query
+
 def get_users_by_challenge_id(db: Session, challenge_id: int):
     try:
-        if not check_challenge_exists(db, challenge_id):
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
-        result = db.execute(select(ChallengeUser).filter(ChallengeUser.challenge_id == challenge_id))
-        challenge_users = result.scalars().all()
-        if not challenge_users:
+        get_or_404(db, Challenge, challenge_id)
+        users = db.scalars(participants_query(challenge_id)).all()
+        if not users:
             raise HTTPException(
                 status_code=404, detail=f"No users found for challenge with ID {challenge_id}"
             )
-        return [challenge_user.user for challenge_user in challenge_users]
+        return users
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+def get_challenge_participants(db: Session, challenge_id: int, limit: int, cursor: str | None = None, friends_of: int | None = None):
+    """One page of a challenge's participants, or of `friends_of`'s friends among them.
+
+    Returns the users and the cursor of the next page, which is None on the
+    last page.
+    """
+    try:
+        get_or_404(db, Challenge, challenge_id)
+        query = participants_query(challenge_id, friends_of)
+        return paginate(db, query, (ChallengeUser.user_id,), limit, cursor, key_of=lambda user: (user.id,))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 def delete_user_from_challenge(db: Session, challenge_id: int, user_id: int):
     try:
-        if not check_challenge_exists(db, challenge_id):
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
+        get_or_404(db, Challenge, challenge_id)
         result = db.execute(select(ChallengeUser).filter(ChallengeUser.challenge_id == challenge_id, ChallengeUser.user_id == user_id))
         challenge_user = result.scalars().first()
         if not challenge_user:
@@ -169,7 +191,9 @@ def delete_user_from_challenge(db: Session, challenge_id: int, user_id: int):
                 status_code=404, detail=f"User not found for challenge with ID {challenge_id}"
             )
         db.delete(challenge_user)
+        invalidate_challenge_stats(db, challenge_id)
         db.commit()
+        challenge_leaderboards.remove_participant(challenge_id, user_id)
         return challenge_user
     except Exception as e:
         db.rollback()
@@ -196,41 +220,26 @@ def get_challenges_by_user_id(db: Session, user_id: int):
     
 def get_friends_by_challenge_id(db: Session, challenge_id: int, user_id: int):
     try:
-        if not check_challenge_exists(db, challenge_id):
-            raise HTTPException(
-                status_code=404, detail=f"Challenge not found with ID {challenge_id}"
-            )
-        # Get the list of users participating in the challenge
-        result = db.execute(select(ChallengeUser).filter(ChallengeUser.challenge_id == challenge_id))
-        challenge_users = result.scalars().all()
-        if not challenge_users:
+        get_or_404(db, Challenge, challenge_id)
+        # Participants who are accepted friends of the user, in one query
+        friends_participating = db.scalars(participants_query(challenge_id, friends_of=user_id)).all()
+        if not friends_participating and not db.scalar(select(ChallengeUser.user_id).where(ChallengeUser.challenge_id == challenge_id).limit(1)):
             raise HTTPException(
                 status_code=404, detail=f"No users found for challenge with ID {challenge_id}"
             )
-        
-        # Get the list of friends for the specified user
-        friends = db.query(Friend).filter(
-            or_(Friend.sender_id == user_id, Friend.receiver_id == user_id),
-            Friend.status == FriendshipStatus.ACCEPTED
-        ).all()
-        
-        friend_ids = {friend.sender_id if friend.sender_id != user_id else friend.receiver_id for friend in friends}
-        
-        # Filter the list of challenge participants to include only those who are friends with the specified user
-        friends_participating = [challenge_user.user for challenge_user in challenge_users if challenge_user.user_id in friend_ids]
-        
         return friends_participating
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 def calculate_total_contributions(db: Session, challenge_id: int, start: datetime, end: datetime) -> float:
+    donations = all_donations()
     result = db.execute(
-        select(func.sum(Donation.amount))
-        .join(ChallengeUser, Donation.user_id == ChallengeUser.user_id)
+        select(func.sum(donations.c.amount))
+        .join(ChallengeUser, donations.c.user_id == ChallengeUser.user_id)
         .filter(
             ChallengeUser.challenge_id == challenge_id,
-            Donation.appointment >= start,
-            Donation.appointment <= end
+            donations.c.appointment >= start,
+            donations.c.appointment <= end
         )
     )
     total_contributions = result.scalar()
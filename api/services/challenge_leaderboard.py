@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from fastapi import HTTPException
+from sqlalchemy import select, func, union_all, and_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models.challenge import Challenge
+from models.challenge_user import ChallengeUser
+from models.donation import Donation, DonationArchive
+from schemas.challenge import ChallengeLeaderboardEntry
+from services.cache_bus import cache_bus
+from services.leaderboard import Leaderboard
+from services.metrics import record_cache
+from services.repository import get_or_404
+
+# (user_id, appointment, signed amount) of a donation write
+DonationChange = tuple[int, datetime, float]
+
+logger = logging.getLogger(__name__)
+
+
+class ContributionBoard(Leaderboard):
+    """Challenge participants ranked by the amount they donated in the challenge window."""
+
+    def _entry(self, rank: int, user_id: int, contributed) -> ChallengeLeaderboardEntry:
+        return ChallengeLeaderboardEntry(rank=rank, user_id=user_id, contributed=contributed)
+
+
+@dataclass
+class _LoadedBoard:
+    board: ContributionBoard
+    start: datetime
+    end: datetime
+    loaded_at: float
+
+
+def all_donations():
+    """Live and archived donations as one (user_id, appointment, amount) subquery."""
+    return union_all(*[
+        select(model.user_id.label("user_id"), model.appointment.label("appointment"), model.amount.label("amount"))
+        for model in (Donation, DonationArchive)
+    ]).subquery()
+
+
+def load_contributions(db: Session, challenge: Challenge) -> list[tuple[int, float]]:
+    """Every participant with their donated amount in the challenge window, in one grouped query.
+
+    The same rule as `calculate_total_contributions`.
+    """
+    donations = all_donations()
+    return db.execute(
+        select(ChallengeUser.user_id, func.coalesce(func.sum(donations.c.amount), 0.0))
+        .outerjoin(donations, and_(
+            donations.c.user_id == ChallengeUser.user_id,
+            donations.c.appointment >= challenge.start,
+            donations.c.appointment <= challenge.end,
+        ))
+        .where(ChallengeUser.challenge_id == challenge.id)
+        .group_by(ChallengeUser.user_id)
+    ).all()
+
+
+class ChallengeLeaderboards:
+    """Per-challenge contribution boards, built on first read and then updated in place.
+
+    Donation writes shift the affected participants on every loaded board in
+    O(log n). Membership and window changes drop the board, the next read
+    rebuilds it. Boards are also rebuilt once they are `max_age` old, which
+    bounds the drift from writes racing a rebuild.
+    """
+
+    def __init__(self, max_age: timedelta = timedelta(minutes=30)):
+        self.max_age = max_age
+        self._boards: dict[int, _LoadedBoard] = {}
+        self._lock = threading.Lock()
+
+    def board(self, db: Session, challenge: Challenge) -> ContributionBoard:
+        loaded = self._boards.get(challenge.id)
+        stale = loaded is None or time.monotonic() - loaded.loaded_at > self.max_age.total_seconds()
+        record_cache("challenge_leaderboard", not stale)
+        if stale:
+            board = ContributionBoard()
+            for user_id, contributed in load_contributions(db, challenge):
+                board.set(user_id, contributed)
+            loaded = _LoadedBoard(board, challenge.start, challenge.end, time.monotonic())
+            with self._lock:
+                self._boards[challenge.id] = loaded
+        return loaded.board
+
+    def record_donations(self, changes: Iterable[DonationChange]) -> None:
+        """Apply committed donation writes to the loaded boards.
+
+        Runs after the commit, so it never fails the request: boards it
+        cannot update are dropped and reload on their next read.
+        """
+        # the columns are naive, an offset sent by the client is dropped when stored
+        changes = [(user_id, appointment.replace(tzinfo=None), amount) for user_id, appointment, amount in changes if amount]
+        if not changes:
+            return
+        try:
+            self._apply_donations(changes)
+        except Exception:
+            logger.exception("Challenge leaderboard update failed, dropping the boards")
+            self._drop()
+        cache_bus.publish("challenge_leaderboard.donations", [[user_id, appointment.isoformat(), amount] for user_id, appointment, amount in changes])
+
+    def _apply_donations(self, changes: list[DonationChange]) -> None:
+        with self._lock:
+            loaded_boards = list(self._boards.values())
+        for loaded in loaded_boards:
+            for user_id, appointment, amount in changes:
+                if user_id in loaded.board and loaded.start <= appointment <= loaded.end:
+                    loaded.board.add(user_id, amount)
+
+    def _apply_published_donations(self, changes: list) -> None:
+        self._apply_donations([(user_id, datetime.fromisoformat(appointment), amount) for user_id, appointment, amount in changes])
+
+    def remove_participant(self, challenge_id: int, user_id: int) -> None:
+        self._discard_participant(challenge_id, user_id)
+        cache_bus.publish("challenge_leaderboard.participant", challenge_id, user_id)
+
+    def _discard_participant(self, challenge_id: int, user_id: int) -> None:
+        loaded = self._boards.get(challenge_id)
+        if loaded is not None:
+            loaded.board.discard(user_id)
+
+    def invalidate(self, challenge_id: int | None = None) -> None:
+        self._drop(challenge_id)
+        cache_bus.publish("challenge_leaderboard", challenge_id)
+
+    def _drop(self, challenge_id: int | None = None) -> None:
+        with self._lock:
+            if challenge_id is None:
+                self._boards.clear()
+            else:
+                self._boards.pop(challenge_id, None)
+
+
+challenge_leaderboards = ChallengeLeaderboards()
+cache_bus.subscribe("challenge_leaderboard", challenge_leaderboards._drop, reset=challenge_leaderboards._drop)
+cache_bus.subscribe("challenge_leaderboard.donations", challenge_leaderboards._apply_published_donations, reset=challenge_leaderboards._drop)
+cache_bus.subscribe("challenge_leaderboard.participant", challenge_leaderboards._discard_participant, reset=challenge_leaderboards._drop)
+
+
+def get_challenge_leaderboard(db: Session, challenge_id: int, top: int = 10, around_user: int | None = None, radius: int = 2) -> dict:
+    try:
+        challenge = get_or_404(db, Challenge, challenge_id)
+        board = challenge_leaderboards.board(db, challenge)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    return {
+        "top": board.top(top),
+        "around": board.around(around_user, radius) if around_user is not None else None,
+        "size": len(board),
+    }
@@ -0,0 +1,213 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import select, update, or_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+
+from models.challenge import Challenge
+from models.challenge_user import ChallengeUser
+from models.enums import ChallengeStatus
+from models.stats import ChallengeStats
+from services.leaderboard import leaderboards
+from services.points import award_points_to_users
+from services.stats import refresh_stats
+
+# Longest the scheduler sleeps, which bounds how late a reached goal is noticed
+CHALLENGE_SCHEDULER_INTERVAL = float(os.getenv("CHALLENGE_SCHEDULER_INTERVAL", "300"))
+CHALLENGE_SCHEDULER_ENABLED = os.getenv("CHALLENGE_SCHEDULER_ENABLED", "true").lower() == "true"
+
+# The boundaries a challenge has on the heap
+START = "start"
+END = "end"
+
+UNFINISHED = (ChallengeStatus.PENDING, ChallengeStatus.ACTIVE)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChallengeTransitions:
+    activated: int = 0
+    completed: int = 0
+    rewarded: int = 0
+    points: int = 0
+
+
+def initial_status(challenge: Challenge, now: datetime | None = None) -> ChallengeStatus:
+    """The status a participant joining `challenge` at `now` starts in."""
+    now = now or datetime.now()
+    if now < challenge.start:
+        return ChallengeStatus.PENDING
+    if now < challenge.end:
+        return ChallengeStatus.ACTIVE
+    return ChallengeStatus.COMPLETED
+
+
+def _unfinished_participants():
+    return select(ChallengeUser.challenge_id).where(
+        ChallengeUser.challenge_id == Challenge.id, ChallengeUser.status.in_(UNFINISHED),
+    ).exists()
+
+
+class ChallengeScheduler:
+    """Moves challenge participants from pending to active to completed.
+
+    Challenge starts and ends sit on a heap ordered by time. At each boundary
+    every participant of the challenge changes status with one UPDATE, and
+    the reward of a challenge whose goal was reached is paid with one batched
+    award. Challenges that reach their goal early are picked up from the
+    /stats rollup on every run.
+
+    Transitions only touch participants still in the status they leave, so
+    runs are idempotent: an entry left behind by a moved deadline, a second
+    process or a retry changes nothing. Rewards are recorded per challenge
+    in the points ledger, so a user who leaves and rejoins a completed
+    challenge is not paid again. The heap is
+    reloaded from the database once it is `max_age` old, which picks up
+    challenges created by other processes.
+    """
+
+    def __init__(self, max_age: timedelta = timedelta(seconds=CHALLENGE_SCHEDULER_INTERVAL)):
+        self.max_age = max_age
+        self._heap: list[tuple[datetime, int, str]] = []
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def load(self, db: Session, now: datetime | None = None) -> int:
+        """Rebuild the heap from every challenge that can still change a participant."""
+        now = now or datetime.now()
+        rows = db.execute(
+            select(Challenge.id, Challenge.start, Challenge.end)
+            .where(or_(Challenge.end > now, _unfinished_participants()))
+        ).all()
+        heap = [(moment, challenge_id, kind) for challenge_id, start, end in rows for moment, kind in ((start, START), (end, END))]
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap = heap
+            self._loaded_at = time.monotonic()
+        return len(rows)
+
+    def schedule(self, challenge: Challenge) -> None:
+        """Put the boundaries of a created or moved challenge on the heap.
+
+        Entries for the old boundaries stay and are skipped when they come up.
+        Before the first load there is nothing to do, loading reads committed state.
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            heapq.heappush(self._heap, (challenge.start, challenge.id, START))
+            heapq.heappush(self._heap, (challenge.end, challenge.id, END))
+        self._wake.set()
+
+    def next_deadline(self) -> datetime | None:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now: datetime) -> dict[str, set[int]]:
+        due = defaultdict(set)
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, challenge_id, kind = heapq.heappop(self._heap)
+                due[kind].add(challenge_id)
+        return due
+
+    def run_due(self, db: Session, now: datetime | None = None) -> ChallengeTransitions:
+        """Apply every boundary up to `now` and complete challenges that reached their goal."""
+        now = now or datetime.now()
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age.total_seconds():
+            self.load(db, now)
+        # contributions come from the /stats rollup, brought up to date first
+        refresh_stats(db)
+        due = self._pop_due(now)
+        transitions = ChallengeTransitions()
+        awarded = []
+        try:
+            if due[START]:
+                transitions.activated = db.execute(
+                    update(ChallengeUser)
+                    .where(
+                        ChallengeUser.challenge_id.in_(select(Challenge.id).where(Challenge.id.in_(due[START]), Challenge.start <= now)),
+                        ChallengeUser.status == ChallengeStatus.PENDING,
+                    )
+                    .values(status=ChallengeStatus.ACTIVE)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+
+            # a moved deadline leaves an entry that no longer matches the challenge
+            ended = Challenge.id.in_(due[END]) & (Challenge.end <= now)
+            finishing = db.execute(
+                select(Challenge.id, Challenge.title, Challenge.reward_points, ChallengeStats.contributed >= Challenge.goal)
+                .outerjoin(ChallengeStats, ChallengeStats.challenge_id == Challenge.id)
+                .where(Challenge.start <= now, or_(ended, ChallengeStats.contributed >= Challenge.goal), _unfinished_participants())
+                .order_by(Challenge.id)
+            ).all()
+            for challenge_id, title, reward_points, reached in finishing:
+                user_ids = db.scalars(
+                    update(ChallengeUser)
+                    .where(ChallengeUser.challenge_id == challenge_id, ChallengeUser.status.in_(UNFINISHED))
+                    .values(status=ChallengeStatus.COMPLETED)
+                    .returning(ChallengeUser.user_id)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                transitions.completed += len(user_ids)
+                if reached and reward_points:
+                    rows = award_points_to_users(db, user_ids, reward_points, f"Completed challenge {title}", challenge_id=challenge_id)
+                    awarded.extend(rows)
+                    transitions.rewarded += len(rows)
+                    transitions.points += reward_points * len(rows)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            # the boundaries are tried again on the next run
+            self._loaded_at = None
+            raise HTTPException(status_code=500, detail=str(e)) from e
+
+        for row in awarded:
+            leaderboards.update(row.id, row.city, row.total_points)
+        return transitions
+
+    def start(self, session_factory: sessionmaker) -> None:
+        """Run the scheduler in a daemon thread until `stop`."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(session_factory,), name="challenge-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, session_factory: sessionmaker) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                with session_factory() as db:
+                    self.run_due(db)
+            except Exception:
+                logger.exception("Challenge scheduler run failed")
+            # sleep until the next boundary, but never longer than the reload interval
+            timeout = self.max_age.total_seconds()
+            deadline = self.next_deadline()
+            if deadline is not None:
+                timeout = min(timeout, max((deadline - datetime.now()).total_seconds(), 0.0))
+            self._wake.wait(timeout)
+
+
+challenge_scheduler = ChallengeScheduler()
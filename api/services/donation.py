@@ -1,17 +1,104 @@
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 
 from fastapi import HTTPException
-from fastapi_cache.decorator import cache
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import desc, or_, exists, and_, delete
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy import or_, exists, and_, delete, insert, select, union_all
 from sqlalchemy.sql import func
 
 
-from models.donation import Donation
+from models.donation import Donation, DonationArchive
+from models.enums import DonationStatus
 from models.friend import Friend
 from models.location_info import LocationInfo, Timeslot
-from schemas.donation import LocationInfoCreate, DonationCreate, DonationUpdate
+from models.user import User
+from schemas.donation import LocationInfoCreate, DonationCreate, DonationUpdate, DonationSummary, DonationTotals, Timeslot as TimeslotCreate
+from schemas.response import BatchItemResult
+from services.cache_bus import cache_bus
+from services.challenge_leaderboard import challenge_leaderboards
+from services.eligibility import DONATION_INTERVALS, refresh_eligibility
+from services.metrics import record_cache
+from services.outbox import add_event
+from services.pagination import paginate
+from services.recall import donor_index
+from services.repository import get_or_404, get_many, upsert
+from services.stats import mark_stats_dirty
+
+DONATION_SUMMARY_CACHE_SIZE = int(os.getenv("DONATION_SUMMARY_CACHE_SIZE", "10000"))
+
+
+class SummaryCache:
+    """Donation summaries by user ID, dropped whenever one of the user's donations is written.
+
+    A summary computed while a write was committing could otherwise be stored
+    after the write dropped it, and stay stale. Every drop is stamped from a
+    counter, a load takes the counter with `begin` before it queries, and
+    `put` only stores when the user has not been dropped since. Beyond
+    `max_size` users the least recently used entry is evicted; evicting a
+    drop raises the stamp every older load is checked against.
+    """
+
+    def __init__(self, max_size: int = DONATION_SUMMARY_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: OrderedDict[int, tuple[int, DonationSummary | None]] = OrderedDict()
+        self._clock = 0
+        self._evicted = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> DonationSummary | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def begin(self) -> int:
+        with self._lock:
+            return self._clock
+
+    def put(self, user_id: int, summary: DonationSummary, started: int) -> None:
+        with self._lock:
+            dropped, _ = self._entries.get(user_id, (self._evicted, None))
+            if dropped > started:
+                return
+            self._entries[user_id] = (dropped, summary)
+            self._entries.move_to_end(user_id)
+            self._evict()
+
+    def drop(self, *user_ids: int) -> None:
+        with self._lock:
+            self._clock += 1
+            for user_id in user_ids:
+                self._entries[user_id] = (self._clock, None)
+                self._entries.move_to_end(user_id)
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clock += 1
+            self._evicted = self._clock
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_size:
+            _, (dropped, _) = self._entries.popitem(last=False)
+            self._evicted = max(self._evicted, dropped)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_summary_cache = SummaryCache()
+
+def invalidate_donation_summary(*user_ids: int):
+    _summary_cache.drop(*user_ids)
+    cache_bus.publish("donation_summary", *user_ids)
+
+cache_bus.subscribe("donation_summary", _summary_cache.drop, reset=_summary_cache.clear)
 
 def check_donation_exists(db, donation_id):
     return db.query(exists().where(Donation.id == donation_id)).scalar()
@@ -19,6 +106,17 @@ def check_donation_exists(db, donation_id):
 def check_location_exists(db, location_id):
     return db.query(exists().where(LocationInfo.id == location_id)).scalar()
     
+def _donation_created(donation_id: int, row: dict) -> dict:
+    """Payload of a `donation.created` outbox event."""
+    return {
+        "donation_id": donation_id,
+        "user_id": row["user_id"],
+        "location_id": row["location_id"],
+        "amount": row["amount"],
+        "appointment": row["appointment"].isoformat(),
+        "status": row["status"],
+    }
+
 def create_donation(db: Session, donation: DonationCreate):
     try: 
         new_donation = Donation(
@@ -31,16 +129,74 @@ def create_donation(db: Session, donation: DonationCreate):
             enable_joining=donation.enable_joining,
         )
         db.add(new_donation)
+        db.flush()
+        refresh_eligibility(db, [new_donation.user_id])
+        mark_stats_dirty(db, [new_donation.appointment])
+        add_event(db, "donation.created", _donation_created(new_donation.id, {
+            "user_id": new_donation.user_id,
+            "location_id": new_donation.location_id,
+            "amount": new_donation.amount,
+            "appointment": new_donation.appointment,
+            "status": new_donation.status,
+        }))
         db.commit()
         db.refresh(new_donation)
+        invalidate_donation_summary(new_donation.user_id)
+        donor_index.invalidate()
+        challenge_leaderboards.record_donations([(new_donation.user_id, new_donation.appointment, new_donation.amount)])
         return new_donation
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=e) from e
 
-def get_donations_by_user_id(db: Session, user_id: int):
+def create_donations(db: Session, donations: list[DonationCreate]) -> list[BatchItemResult]:
     try:
-        donations = db.query(Donation).filter(Donation.user_id == user_id).all()
+        user_ids = {user.id for user in get_many(db, User, [donation.user_id for donation in donations])}
+        location_ids = {location.id for location in get_many(db, LocationInfo, [donation.location_id for donation in donations])}
+
+        results = []
+        rows = []
+        row_indexes = []
+        for index, donation in enumerate(donations):
+            if donation.user_id not in user_ids:
+                results.append(BatchItemResult(index=index, status=404, message=f"User not found with ID {donation.user_id}"))
+            elif donation.location_id not in location_ids:
+                results.append(BatchItemResult(index=index, status=404, message=f"Location not found with ID {donation.location_id}"))
+            else:
+                rows.append(dict(
+                    user_id=donation.user_id,
+                    location_id=donation.location_id,
+                    donation_type=donation.donation_type,
+                    amount=donation.amount,
+                    appointment=donation.appointment,
+                    status=donation.status,
+                    enable_joining=donation.enable_joining,
+                ))
+                row_indexes.append(index)
+
+        if rows:
+            # executemany with RETURNING is batched into multi-row INSERTs by SQLAlchemy
+            new_ids = db.execute(insert(Donation).returning(Donation.id, sort_by_parameter_order=True), rows).scalars().all()
+            user_ids = {row["user_id"] for row in rows}
+            refresh_eligibility(db, user_ids)
+            mark_stats_dirty(db, [row["appointment"] for row in rows])
+            for new_id, row in zip(new_ids, rows):
+                add_event(db, "donation.created", _donation_created(new_id, row))
+            db.commit()
+            invalidate_donation_summary(*user_ids)
+            donor_index.invalidate()
+            challenge_leaderboards.record_donations((row["user_id"], row["appointment"], row["amount"]) for row in rows)
+            results.extend(
+                BatchItemResult(index=index, status=200, id=new_id) for index, new_id in zip(row_indexes, new_ids)
+            )
+        return sorted(results, key=lambda result: result.index)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def get_donations_by_user_id(db: Session, user_id: int, options=()):
+    try:
+        donations = db.query(Donation).options(*options).filter(Donation.user_id == user_id).all()
         if not donations:
             raise HTTPException(
                 status_code=404, detail=f"No donations found for user with ID {user_id}"
@@ -48,7 +204,71 @@ def get_donations_by_user_id(db: Session, user_id: int):
         return donations
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
-    
+
+def get_donation_history(db: Session, user_id: int, limit: int, cursor: str | None = None, options=()):
+    """One page of a user's donations, newest appointment first.
+
+    Returns the donations and the cursor of the next page, which is None on
+    the last page.
+    """
+    try:
+        query = select(Donation).options(*options).where(Donation.user_id == user_id)
+        return paginate(db, query, (Donation.appointment, Donation.id), limit, cursor, descending=True)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def get_donation_summary(db: Session, user_id: int) -> DonationSummary:
+    """Counts and amounts per donation type and status, including archived donations.
+
+    Computed with one grouped query and cached until the user's donations change.
+    """
+    summary = _summary_cache.get(user_id)
+    record_cache("donation_summary", summary is not None)
+    if summary is not None:
+        return summary
+
+    started = _summary_cache.begin()
+    try:
+        donations = union_all(
+            select(Donation.donation_type, Donation.status, Donation.amount, Donation.appointment).where(Donation.user_id == user_id),
+            select(DonationArchive.donation_type, DonationArchive.status, DonationArchive.amount, DonationArchive.appointment).where(DonationArchive.user_id == user_id),
+        ).subquery()
+        rows = db.execute(
+            select(
+                donations.c.donation_type,
+                donations.c.status,
+                func.count(),
+                func.coalesce(func.sum(donations.c.amount), 0.0),
+                func.max(donations.c.appointment),
+            ).group_by(donations.c.donation_type, donations.c.status)
+        ).all()
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    last_completed = {
+        donation_type: last_appointment
+        for donation_type, status, _, _, last_appointment in rows
+        if status == DonationStatus.COMPLETED
+    }
+    next_eligible_by_type = {
+        donation_type: last_appointment + DONATION_INTERVALS[donation_type]
+        for donation_type, last_appointment in last_completed.items()
+    }
+    summary = DonationSummary(
+        user_id=user_id,
+        totals=[
+            DonationTotals(donation_type=donation_type, status=status, count=count, amount=amount)
+            for donation_type, status, count, amount, _ in rows
+        ],
+        total_count=sum(row[2] for row in rows),
+        total_amount=sum(row[3] for row in rows if row[1] == DonationStatus.COMPLETED),
+        last_donation_at=max(last_completed.values(), default=None),
+        next_eligible_at=min(next_eligible_by_type.values(), default=None),
+        next_eligible_by_type=next_eligible_by_type,
+    )
+    _summary_cache.put(user_id, summary, started)
+    return summary
+
 
 def get_friends_donations(db: Session, user_id: int):
     try:
@@ -70,55 +290,65 @@ def get_friends_donations(db: Session, user_id: int):
 
 def delete_donation(db: Session, donation_id: int):
     try:
-        result = db.execute(delete(Donation).where(Donation.id == donation_id))
-        if result.rowcount == 0:
+        deleted = db.execute(delete(Donation).where(Donation.id == donation_id).returning(Donation.user_id, Donation.appointment, Donation.amount)).first()
+        if deleted is None:
             raise HTTPException(status_code=404, detail=f"Donation not found with ID {donation_id}")
+        refresh_eligibility(db, [deleted.user_id])
+        mark_stats_dirty(db, [deleted.appointment])
         db.commit()
+        invalidate_donation_summary(deleted.user_id)
+        donor_index.invalidate()
+        challenge_leaderboards.record_donations([(deleted.user_id, deleted.appointment, -(deleted.amount or 0.0))])
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 def update_donation(db: Session, donation_id: int, donation_partial: DonationUpdate):
     try:
-        if not check_donation_exists(db, donation_id):
-            raise HTTPException(
-                status_code=404, detail=f"Donation not found with ID {donation_id}"
-            )
-        donation = db.query(Donation).filter(Donation.id == donation_id).first()
-        if not donation:
-            raise HTTPException(
-                status_code=404, detail=f"Donation not found with ID {donation_id}"
-            )
+        donation = get_or_404(db, Donation, donation_id)
+        previous_user_id = donation.user_id
+        previous_appointment = donation.appointment
+        previous_amount = donation.amount
         donation_data = donation_partial.dict(exclude_unset=True)
         for key, value in donation_data.items():
             setattr(donation, key, value)
-        donation.updated_at = datetime.now(timezone.utc)
+        donation.updated_at = datetime.now()
+        db.flush()
+        refresh_eligibility(db, [previous_user_id, donation.user_id])
+        mark_stats_dirty(db, [previous_appointment, donation.appointment])
         db.commit()
         db.refresh(donation)
+        invalidate_donation_summary(previous_user_id, donation.user_id)
+        donor_index.invalidate()
+        challenge_leaderboards.record_donations([
+            (previous_user_id, previous_appointment, -(previous_amount or 0.0)),
+            (donation.user_id, donation.appointment, donation.amount),
+        ])
         return donation
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=e) from e
 
-def get_donation_by_id(db: Session, donation_id: int):
+def get_donation_by_id(db: Session, donation_id: int, options=()):
     try:
-        if not check_donation_exists(db, donation_id):
-            raise HTTPException(
-                status_code=404, detail=f"Donation not found with ID {donation_id}"
-            )
-        donation = db.query(Donation).filter(Donation.id == donation_id).first()
-        if not donation:
+        return get_or_404(db, Donation, donation_id, options=options)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=e) from e
+
+def get_donations_by_ids(db: Session, donation_ids: list[int], options=()):
+    try:
+        donations = get_many(db, Donation, donation_ids, options=options)
+        if not donations:
             raise HTTPException(
-                status_code=404, detail=f"Donation not found with ID {donation_id}"
+                status_code=404, detail=f"No donations found with IDs {donation_ids}"
             )
-        return donation
+        return donations
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
 
-@cache(600)
-def get_all_location_info(db: Session):
+def get_all_location_info(db: Session, options=()):
     try:
-        locations = db.query(LocationInfo).all()
+        locations = db.query(LocationInfo).options(*options).all()
         if not locations:
             raise HTTPException(
                 status_code=404, detail=f"No locations found"
@@ -127,9 +357,9 @@ def get_all_location_info(db: Session):
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
 
-def get_location_info_by_city(db: Session, city: str):
+def get_location_info_by_city(db: Session, city: str, options=()):
     try:
-        locations = db.query(LocationInfo).filter(LocationInfo.address.contains(city)).all()
+        locations = db.query(LocationInfo).options(*options).filter(LocationInfo.address.contains(city)).all()
         if not locations:
             raise HTTPException(
                 status_code=404, detail=f"Location not found in city {city}"
@@ -138,14 +368,9 @@ def get_location_info_by_city(db: Session, city: str):
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
     
-def get_location_info_by_id(db: Session, location_id: int):
+def get_location_info_by_id(db: Session, location_id: int, options=()):
     try:
-        if not check_location_exists(db, location_id):
-            raise HTTPException(
-                status_code=404, detail=f"Location not found with ID {location_id}"
-            )
-        location = db.query(LocationInfo).filter(LocationInfo.id == location_id).first()
-        return location
+        return get_or_404(db, LocationInfo, location_id, detail=f"Location not found with ID {location_id}", options=options)
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
 
@@ -160,6 +385,48 @@ def get_timeslots_by_location_id(db: Session, location_id: int):
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
 
+def create_timeslots(db: Session, location_id: int, timeslots: list[TimeslotCreate]) -> list[BatchItemResult]:
+    try:
+        get_or_404(db, LocationInfo, location_id, detail=f"Location not found with ID {location_id}")
+
+        results = []
+        rows = []
+        row_indexes = []
+        start_times = set()
+        for index, timeslot in enumerate(timeslots):
+            # stored as naive times like every other column, so a start time maps back to its item
+            start_time = timeslot.start_time.replace(tzinfo=None)
+            if timeslot.end_time <= timeslot.start_time:
+                results.append(BatchItemResult(index=index, status=400, message="Timeslot must end after it starts"))
+            elif not 0 <= timeslot.remaining_capacity <= timeslot.total_capacity:
+                results.append(BatchItemResult(index=index, status=400, message="Remaining capacity must be between 0 and total capacity"))
+            elif start_time in start_times:
+                results.append(BatchItemResult(index=index, status=409, message=f"Another timeslot in this batch starts at {start_time}"))
+            else:
+                start_times.add(start_time)
+                rows.append({**timeslot.model_dump(), "location_id": location_id, "start_time": start_time, "end_time": timeslot.end_time.replace(tzinfo=None)})
+                row_indexes.append(index)
+
+        if rows:
+            # a start time the location already has is skipped and reported, not a key violation
+            statement = upsert(db, Timeslot)
+            timeslots_table = statement.table
+            statement = statement.on_conflict_do_nothing(
+                index_elements=[timeslots_table.c.location_id, timeslots_table.c.start_time],
+            ).returning(timeslots_table.c.id, timeslots_table.c.start_time)
+            new_ids = {start_time: new_id for new_id, start_time in db.execute(statement, rows)}
+            mark_stats_dirty(db, new_ids.keys())
+            db.commit()
+            results.extend(
+                BatchItemResult(index=index, status=200, id=new_ids[row["start_time"]]) if row["start_time"] in new_ids
+                else BatchItemResult(index=index, status=409, message=f"Location already has a timeslot starting at {row['start_time']}")
+                for index, row in zip(row_indexes, rows)
+            )
+        return sorted(results, key=lambda result: result.index)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 def create_location_info(db: Session, location_info: LocationInfoCreate):
     try:
         new_location = LocationInfo(
@@ -179,17 +446,16 @@ def create_location_info(db: Session, location_info: LocationInfoCreate):
             )
         return new_location
     
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"A location named {location_info.name} already exists, or two of its timeslots start at the same time") from e
     except SQLAlchemyError as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=e) from e
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
 def update_location_info(db: Session, location_id: int, location_info_partial):
     try:
-        if not check_location_exists(db, location_id):
-            raise HTTPException(
-                status_code=404, detail=f"Location not found with ID {location_id}"
-            )
-        location = db.query(LocationInfo).filter(LocationInfo.id == location_id).first()
+        location = get_or_404(db, LocationInfo, location_id, detail=f"Location not found with ID {location_id}")
         location_data = location_info_partial.dict(exclude_unset=True)
         for key, value in location_data.items():
             setattr(location, key, value)
@@ -203,11 +469,8 @@ def update_location_info(db: Session, location_id: int, location_info_partial):
 
 def delete_location_info(db: Session, location_id: int):
     try:
-        if not check_location_exists(db, location_id):
-            raise HTTPException(
-                status_code=404, detail=f"Location not found with ID {location_id}"
-            )
-        location = db.query(LocationInfo).filter(LocationInfo.id == location_id).first()
+        location = get_or_404(db, LocationInfo, location_id, detail=f"Location not found with ID {location_id}")
+        mark_stats_dirty(db, [timeslot.start_time for timeslot in location.timeslots])
         db.delete(location)
         db.commit()
         return location
@@ -0,0 +1,111 @@
+from datetime import date, datetime
+
+from fastapi import HTTPException
+from sqlalchemy import select, insert, delete, text
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from models.donation import Donation, DonationArchive
+from models.enums import DonationStatus
+from services.stats import start_of, write_donation_stats
+
+ARCHIVED_STATUSES = (DonationStatus.COMPLETED, DonationStatus.CANCELLED)
+ARCHIVE_COLUMNS = ("id", "user_id", "location_id", "donation_type", "amount", "appointment", "status")
+
+
+def add_months(day: date, months: int) -> date:
+    """First day of the month `months` months after the month of `day`."""
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def is_partitioned(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def ensure_donation_partitions(db: Session, months_ahead: int = 3) -> int:
+    """Create the monthly `donations` partitions up to `months_ahead` months from now.
+
+    Returns the number of partitions created. Does nothing on databases
+    without partitioning.
+    """
+    if not is_partitioned(db):
+        return 0
+    try:
+        today = date.today()
+        created = db.execute(
+            text("SELECT ensure_donation_partitions(:from_month, :to_month)"),
+            {"from_month": today.replace(day=1), "to_month": add_months(today, months_ahead)},
+        ).scalar()
+        db.commit()
+        return created
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def drop_empty_partitions(db: Session, before: date) -> list[str]:
+    """Detach and drop monthly partitions that end on or before `before` and hold no rows."""
+    if not is_partitioned(db):
+        return []
+    try:
+        partitions = db.execute(text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = 'donations'::regclass AND child.relname LIKE 'donations\\_y%'"
+        )).all()
+        dropped = []
+        for name, bound in partitions:
+            # bound looks like: FOR VALUES FROM ('2024-01-01 00:00:00') TO ('2024-02-01 00:00:00')
+            upper = datetime.fromisoformat(bound.split("TO ('")[1].split("'")[0]).date()
+            if upper > before or db.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{name}")')).scalar():
+                continue
+            db.execute(text(f'ALTER TABLE donations DETACH PARTITION "{name}"'))
+            db.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+        db.commit()
+        return dropped
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def archive_donations(db: Session, older_than_months: int = 24, batch_size: int = 5000) -> int:
+    """Move completed and cancelled donations older than `older_than_months` into `donations_archive`.
+
+    The cutoff is the start of a month, so whole partitions empty out and are
+    dropped afterwards. Each batch is moved in its own transaction; returns
+    the number of donations archived.
+    """
+    cutoff = add_months(date.today(), -older_than_months)
+    archived = 0
+    try:
+        while True:
+            ids = db.scalars(
+                select(Donation.id)
+                .where(Donation.appointment < start_of(cutoff), Donation.status.in_(ARCHIVED_STATUSES))
+                .limit(batch_size)
+            ).all()
+            if not ids:
+                break
+            columns = [getattr(Donation, column) for column in ARCHIVE_COLUMNS]
+            db.execute(insert(DonationArchive).from_select(ARCHIVE_COLUMNS, select(*columns).where(Donation.id.in_(ids))))
+            db.execute(delete(Donation).where(Donation.id.in_(ids)).execution_options(synchronize_session=False))
+            db.commit()
+            archived += len(ids)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    drop_empty_partitions(db, cutoff)
+    ensure_donation_partitions(db)
+    return archived
+
+def rebuild_donation_stats(db: Session, since: date | None = None, until: date | None = None) -> int:
+    """Recompute `donation_daily_stats` for the days in [since, until) from live and archived donations.
+
+    Without bounds every day is rebuilt. Returns the number of stats rows written.
+    """
+    try:
+        written = write_donation_stats(db, since, until)
+        db.commit()
+        return written
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
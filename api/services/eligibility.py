@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from fastapi import HTTPException
+from sqlalchemy import select, insert, delete, exists, case, union_all, func, DateTime
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+
+from models.donation import Donation, DonationArchive
+from models.eligibility import DonorEligibility
+from models.enums import DonationStatus, DonationType
+from models.user import User
+
+# Minimum time between two donations of the same type
+DONATION_INTERVALS = {
+    DonationType.BLOOD: timedelta(days=56),
+    DonationType.PLASMA: timedelta(days=14),
+}
+
+
+class add_days(FunctionElement):
+    """`timestamp + days` for a day count that is itself a SQL expression."""
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(add_days)
+def _add_days(element, compiler, **kw):
+    timestamp, days = list(element.clauses)
+    return f"({compiler.process(timestamp, **kw)} + make_interval(days => {compiler.process(days, **kw)}))"
+
+@compiles(add_days, "sqlite")
+def _add_days_sqlite(element, compiler, **kw):
+    timestamp, days = list(element.clauses)
+    return f"datetime({compiler.process(timestamp, **kw)}, '+' || {compiler.process(days, **kw)} || ' days')"
+
+
+def refresh_eligibility(db: Session, user_ids: Iterable[int] | None = None) -> None:
+    """Recompute `donor_eligibility` for `user_ids`, or for every user when None.
+
+    The last completed donation per user and type, live or archived, and the
+    resulting next eligible date are computed by one INSERT ... SELECT, so a
+    full rebuild is a single pass over the donations in the database. Runs in
+    the caller's transaction; the caller commits.
+    """
+    if user_ids is not None:
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+
+    sources = []
+    for model in (Donation, DonationArchive):
+        source = select(model.user_id, model.donation_type, model.appointment).where(
+            model.status == DonationStatus.COMPLETED, model.user_id.is_not(None)
+        )
+        if user_ids is not None:
+            source = source.where(model.user_id.in_(user_ids))
+        sources.append(source)
+    completed = union_all(*sources).subquery()
+    last_donations = (
+        select(completed.c.user_id, completed.c.donation_type, func.max(completed.c.appointment).label("last_donation_at"))
+        .group_by(completed.c.user_id, completed.c.donation_type)
+        .subquery()
+    )
+    # keyed by the stored enum names: the union column no longer carries the Enum type
+    interval_days = case(
+        {donation_type.name: interval.days for donation_type, interval in DONATION_INTERVALS.items()},
+        value=last_donations.c.donation_type,
+    )
+
+    stale = delete(DonorEligibility)
+    if user_ids is not None:
+        stale = stale.where(DonorEligibility.user_id.in_(user_ids))
+    db.execute(stale)
+    db.execute(
+        insert(DonorEligibility).from_select(
+            ["user_id", "donation_type", "last_donation_at", "next_eligible_at"],
+            select(
+                last_donations.c.user_id,
+                last_donations.c.donation_type,
+                last_donations.c.last_donation_at,
+                add_days(last_donations.c.last_donation_at, interval_days),
+            ),
+        )
+    )
+
+def rebuild_eligibility(db: Session) -> int:
+    """Recompute eligibility for all users; returns the number of rows written."""
+    try:
+        refresh_eligibility(db)
+        db.commit()
+        return db.query(DonorEligibility).count()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def get_eligibility(db: Session, user_id: int) -> dict[DonationType, datetime | None]:
+    """Next eligible date per donation type for one user, None when eligible now."""
+    try:
+        rows = db.query(DonorEligibility).filter(DonorEligibility.user_id == user_id).all()
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    now = datetime.now()
+    next_dates = {row.donation_type: row.next_eligible_at for row in rows}
+    return {
+        donation_type: next_dates[donation_type] if next_dates.get(donation_type, now) > now else None
+        for donation_type in DonationType
+    }
+
+def eligible_users(donation_type: DonationType, at: datetime | None = None):
+    """Filter on `User` for users allowed to make a `donation_type` donation at `at` (default now).
+
+    An anti-join on the eligibility primary key, so it composes with other
+    user filters without scanning donations.
+    """
+    return ~exists().where(
+        DonorEligibility.user_id == User.id,
+        DonorEligibility.donation_type == donation_type,
+        DonorEligibility.next_eligible_at > (at or datetime.now()),
+    )
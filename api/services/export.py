@@ -0,0 +1,156 @@
+import csv
+import io
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import BinaryIO
+
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from fastapi import HTTPException
+from sqlalchemy import Table, select, func, Boolean, DateTime, Float, Integer
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models.challenge_user import ChallengeUser
+from models.donation import Donation
+from models.location_info import Timeslot
+
+EXPORT_CHUNK_SIZE = 10000
+# `updated_at` comes from the app clock when a write starts, so a transaction
+# can commit after an export with an earlier value. Rows younger than the lag
+# are left to the next export, which gives such transactions time to commit.
+EXPORT_WATERMARK_LAG = timedelta(seconds=float(os.getenv("EXPORT_WATERMARK_LAG_SECONDS", "300")))
+
+# Tables partners can extract, each with an `updated_at` watermark column
+EXPORT_TABLES: dict[str, Table] = {
+    "donations": Donation.__table__,
+    "timeslots": Timeslot.__table__,
+    "challenge_users": ChallengeUser.__table__,
+}
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+@dataclass
+class ExportResult:
+    rows: int
+    # pass as `since` to the next export to get only the rows changed after this one
+    watermark: datetime | None
+
+
+def _arrow_type(column) -> pa.DataType:
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+def _plain(value):
+    # enums are exported by name, as they are stored and as COPY writes them
+    return value.name if isinstance(value, Enum) else value
+
+def export_statement(table: Table, since: datetime | None, until: datetime | None):
+    statement = select(table)
+    if since is not None:
+        statement = statement.where(table.c.updated_at > since)
+    if until is not None:
+        statement = statement.where(table.c.updated_at <= until)
+    return statement.order_by(table.c.updated_at, *table.primary_key.columns)
+
+
+def _supports_copy(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+def _copy_csv(db: Session, statement, out: BinaryIO) -> int:
+    """Let PostgreSQL write the CSV with COPY TO STDOUT, straight into `out`; returns the rows written.
+
+    Uses psycopg2's `mogrify` and `copy_expert`, see `_supports_copy`.
+    """
+    compiled = statement.compile(dialect=db.get_bind().dialect)
+    cursor = db.connection().connection.driver_connection.cursor()
+    try:
+        query = cursor.mogrify(str(compiled), compiled.params).decode()
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", out)
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def _write_chunks(db: Session, table: Table, statement, fmt: str, out: BinaryIO, chunk_size: int) -> int:
+    """Stream rows from a server-side cursor, `chunk_size` at a time, into `out`; returns the rows written."""
+    names = [column.name for column in table.columns]
+    result = db.execute(statement.execution_options(stream_results=True, yield_per=chunk_size))
+    rows = 0
+
+    if fmt == "csv":
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+        writer = csv.writer(text)
+        writer.writerow(names)
+        for partition in result.partitions():
+            writer.writerows([_plain(value) for value in row] for row in partition)
+            rows += len(partition)
+        text.detach()
+        return rows
+
+    schema = pa.schema([(column.name, _arrow_type(column)) for column in table.columns])
+    writer = pq.ParquetWriter(out, schema) if fmt == "parquet" else pa.ipc.new_file(out, schema)
+    with writer:
+        for partition in result.partitions():
+            columns = [[_plain(value) for value in values] for values in zip(*partition)]
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            rows += len(partition)
+    return rows
+
+def export_table(
+    db: Session, table_name: str, fmt: str, out: BinaryIO,
+    since: datetime | None = None, chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> ExportResult:
+    """Write `table_name` as CSV, Parquet or Arrow IPC into the binary file `out`.
+
+    With `since`, only rows updated after that watermark are written. The
+    export is bounded by the newest `updated_at` at its start that is older
+    than EXPORT_WATERMARK_LAG, which is the watermark it returns, so rows
+    changed while it runs or shortly before go to the next one. Without such
+    a row nothing is written and `since` is returned. Deleted rows are not
+    tracked and only disappear from a full export.
+
+    CSV on PostgreSQL with psycopg2 is produced by COPY; everything else is
+    streamed from a server-side cursor in chunks, so memory stays constant in
+    the table size.
+    """
+    table = EXPORT_TABLES.get(table_name)
+    if table is None:
+        raise HTTPException(status_code=400, detail=f"Unknown export table {table_name}, expected one of {', '.join(EXPORT_TABLES)}")
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format {fmt}, expected one of {', '.join(EXPORT_FORMATS)}")
+
+    try:
+        cutoff = datetime.now() - EXPORT_WATERMARK_LAG
+        bounds = select(func.max(table.c.updated_at)).where(table.c.updated_at <= cutoff)
+        if since is not None:
+            bounds = bounds.where(table.c.updated_at > since)
+        watermark = db.scalar(bounds)
+        # without a row old enough, the cutoff bounds an export that finds nothing
+        statement = export_statement(table, since, watermark if watermark is not None else cutoff)
+
+        if fmt == "csv" and _supports_copy(db):
+            rows = _copy_csv(db, statement, out)
+        else:
+            rows = _write_chunks(db, table, statement, fmt, out, chunk_size)
+        return ExportResult(rows=rows, watermark=watermark or since)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    finally:
+        # close the read transaction the export ran in
+        db.rollback()
@@ -0,0 +1,84 @@
+from typing import Iterable
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+
+
+def _split(value: str | None) -> list[str] | None:
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class Fieldset:
+    """Column and relationship selection parsed from `fields=` / `expand=` query parameters.
+
+    `fields` restricts both the SQL column list (`load_only`) and the serialized
+    output, `expand` picks the relationships that are eager loaded with
+    `selectinload` and embedded in the output. Relationships that are not
+    expanded are never loaded. With `fields` but no `expand` only the
+    relationships named in `fields` are expanded, and a `fields` naming only
+    relationships keeps just the primary key. Without either parameter the
+    response schema is used as-is, with `default_expand` eager loaded.
+    """
+
+    def __init__(
+        self,
+        model,
+        schema: type[BaseModel],
+        fields: str | None = None,
+        expand: str | None = None,
+        relationships: dict[str, type[BaseModel]] | None = None,
+        default_expand: Iterable[str] = (),
+    ):
+        self.model = model
+        self.schema = schema
+        self.relationships = relationships or {}
+
+        mapper = inspect(model)
+        self.columns = [name for name in schema.model_fields if name in mapper.column_attrs]
+        self.is_default = fields is None and expand is None
+
+        requested = _split(fields) or []
+        unknown = [name for name in requested if name not in self.columns and name not in self.relationships]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s) {', '.join(unknown)}; allowed: {', '.join([*self.columns, *self.relationships])}")
+        if requested:
+            # a list naming only relationships still identifies each row by its primary key
+            primary_key = [mapper.get_property_by_column(column).key for column in mapper.primary_key]
+            self.fields = [name for name in requested if name in self.columns] or primary_key
+        else:
+            self.fields = self.columns
+        named_relationships = [name for name in requested if name in self.relationships]
+
+        if expand is None:
+            self.expand = list(default_expand) if fields is None else []
+        else:
+            self.expand = _split(expand)
+        self.expand += [name for name in named_relationships if name not in self.expand]
+        unknown = [name for name in self.expand if name not in self.relationships]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown expansion(s) {', '.join(unknown)}; allowed: {', '.join(self.relationships) or 'none'}")
+
+    def options(self) -> list:
+        options = []
+        if self.fields != self.columns:
+            options.append(load_only(*[getattr(self.model, name) for name in self.fields]))
+        options.extend(selectinload(getattr(self.model, name)) for name in self.expand)
+        return options
+
+    def serialize(self, instance):
+        if self.is_default:
+            return self.schema.model_validate(instance)
+
+        data = {name: getattr(instance, name) for name in self.fields}
+        for name in self.expand:
+            nested_schema = self.relationships[name]
+            value = getattr(instance, name)
+            if isinstance(value, list):
+                data[name] = [nested_schema.model_validate(item) for item in value]
+            else:
+                data[name] = nested_schema.model_validate(value) if value is not None else None
+        return data
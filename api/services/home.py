@@ -0,0 +1,110 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from schemas.challenge import ChallengeResponse
+from schemas.donation import DonationResponse
+from schemas.notification import NotificationResponse
+from schemas.post import PostResponse
+from schemas.response import ResponseModel
+from services.challenge import get_challenges_by_user_id
+from services.donation import get_friends_donations
+from services.post import get_friends_posts
+from services.user import find_new_notifications, mark_notifications_retrieved
+
+# Sections run concurrently, so a home screen request holds up to one
+# connection per section on top of the request's own session.
+HOME_SECTION_WORKERS = int(os.getenv("HOME_SECTION_WORKERS", "16"))
+HOME_SECTION_TIMEOUT = float(os.getenv("HOME_SECTION_TIMEOUT", "2.0"))
+
+_executor = ThreadPoolExecutor(max_workers=HOME_SECTION_WORKERS, thread_name_prefix="home-section")
+
+
+def _new_notifications(db: Session, user_id: int) -> list:
+    # Read only: a section that times out must not consume notifications the response never shows
+    return [NotificationResponse.model_validate(notification) for notification in find_new_notifications(db, user_id)]
+
+def _friends_posts(db: Session, user_id: int) -> list:
+    return [PostResponse.model_validate(post) for post in get_friends_posts(db, user_id)]
+
+def _friends_donations(db: Session, user_id: int) -> list:
+    return [DonationResponse.model_validate(donation) for donation in get_friends_donations(db, user_id)]
+
+def _challenges(db: Session, user_id: int) -> list:
+    return [ChallengeResponse.model_validate(challenge) for challenge in get_challenges_by_user_id(db, user_id)]
+
+
+# section name -> (loader, timeout in seconds)
+HOME_SECTIONS: dict[str, tuple[Callable[[Session, int], list], float]] = {
+    "new_notifications": (_new_notifications, HOME_SECTION_TIMEOUT),
+    "friends_posts": (_friends_posts, HOME_SECTION_TIMEOUT),
+    "friends_donations": (_friends_donations, HOME_SECTION_TIMEOUT),
+    "challenges": (_challenges, HOME_SECTION_TIMEOUT),
+}
+
+
+def _innermost(error: HTTPException) -> HTTPException:
+    # Services wrap their own 404s in a 500, raised from the original
+    while isinstance(error.__cause__, HTTPException):
+        error = error.__cause__
+    return error
+
+def _timed_out(name: str, timeout: float) -> ResponseModel:
+    return ResponseModel(status=504, data=[], message=f"Section '{name}' timed out after {timeout}s")
+
+def _run_section(name: str, loader: Callable[[Session, int], list], user_id: int, timeout: float, started: float) -> ResponseModel:
+    remaining = started + timeout - time.monotonic()
+    if remaining <= 0:
+        return _timed_out(name, timeout)
+    # Every section gets its own session: a Session must not be shared between threads.
+    # Results are serialized here, while the session is still open for lazy loads.
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            # A section past its deadline is no longer waited for, so its queries must not outlive it either
+            db.execute(text(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}"))
+        return ResponseModel(status=200, data=loader(db, user_id))
+    except HTTPException as e:
+        e = _innermost(e)
+        return ResponseModel(status=e.status_code, data=[], message=str(e.detail))
+    except Exception as e:
+        return ResponseModel(status=500, data=[], message=str(e))
+    finally:
+        db.close()
+
+
+def load_home_sections(user_id: int) -> dict[str, ResponseModel]:
+    """Run every home screen section in parallel and collect the results.
+
+    A section that misses its deadline is reported with status 504 instead of
+    holding back the other sections. If it has not started yet it is
+    cancelled; if it is running, its queries are stopped by a statement
+    timeout on PostgreSQL.
+    """
+    started = time.monotonic()
+    futures = {
+        name: (_executor.submit(_run_section, name, loader, user_id, timeout, started), timeout)
+        for name, (loader, timeout) in HOME_SECTIONS.items()
+    }
+
+    sections = {}
+    for name, (future, timeout) in futures.items():
+        remaining = max(0.0, started + timeout - time.monotonic())
+        try:
+            sections[name] = future.result(timeout=remaining)
+        except TimeoutError:
+            future.cancel()
+            sections[name] = _timed_out(name, timeout)
+    return sections
+
+def mark_home_notifications_retrieved(db: Session, sections: dict[str, ResponseModel]) -> None:
+    """Mark the notifications the home screen response shows as retrieved."""
+    section = sections.get("new_notifications")
+    if section is not None and section.status == 200 and section.data:
+        mark_notifications_retrieved(db, [notification.id for notification in section.data])
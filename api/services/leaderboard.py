@@ -0,0 +1,342 @@
+import random
+import threading
+from typing import Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import select, or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models.enums import FriendshipStatus, LeaderboardScope
+from models.friend import Friend
+from models.user import User
+from schemas.points import LeaderboardEntry
+from services.cache_bus import cache_bus
+from services.metrics import record_cache
+
+
+class _End:
+    """Sentinel key that sorts after every real key."""
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return False
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next = [None] * levels
+        # width[level] = number of level-0 steps from this node to next[level]
+        self.width = [1] * levels
+
+
+class RankedSet:
+    """Sorted set with positional access (an indexable skip list).
+
+    `add`, `remove`, `index` and `__getitem__` run in O(log n) expected time,
+    iterating the first k keys costs O(log n + k).
+    """
+
+    MAX_LEVELS = 24
+
+    def __init__(self):
+        self._end = _Node(_End(), self.MAX_LEVELS)
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._head.next = [self._end] * self.MAX_LEVELS
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < self.MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def add(self, key) -> None:
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_levels()
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key) -> None:
+        chain = [None] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is self._end or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key) -> int:
+        """Return the 0-based position of `key`."""
+        position = 0
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0] is self._end or node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    def __getitem__(self, position: int):
+        if not 0 <= position < self._size:
+            raise IndexError(position)
+        remaining = position + 1
+        node = self._head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node.key
+
+    def iter_from(self, position: int) -> Iterator:
+        if position >= self._size:
+            return
+        node = self._head
+        remaining = position + 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        while node is not self._end:
+            yield node.key
+            node = node.next[0]
+
+
+class Leaderboard:
+    """Users ranked by points, highest first, ties broken by user ID."""
+
+    def __init__(self):
+        self._points: dict[int, int] = {}
+        self._ranking = RankedSet()
+        self._lock = threading.Lock()
+
+    def _entry(self, rank: int, user_id: int, points) -> LeaderboardEntry:
+        return LeaderboardEntry(rank=rank, user_id=user_id, points=points)
+
+    def _set(self, user_id: int, points) -> None:
+        current = self._points.get(user_id)
+        if current == points:
+            return
+        if current is not None:
+            self._ranking.remove((-current, user_id))
+        self._ranking.add((-points, user_id))
+        self._points[user_id] = points
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._points
+
+    def set(self, user_id: int, points: int) -> None:
+        with self._lock:
+            self._set(user_id, points)
+
+    def add(self, user_id: int, delta) -> None:
+        """Add `delta` to the score of a user already on the board."""
+        with self._lock:
+            current = self._points.get(user_id)
+            if current is not None:
+                self._set(user_id, current + delta)
+
+    def discard(self, user_id: int) -> None:
+        with self._lock:
+            current = self._points.pop(user_id, None)
+            if current is not None:
+                self._ranking.remove((-current, user_id))
+
+    def points(self, user_id: int) -> int | None:
+        return self._points.get(user_id)
+
+    def top(self, count: int, offset: int = 0) -> list[LeaderboardEntry]:
+        with self._lock:
+            entries = []
+            for position, (negative_points, user_id) in enumerate(self._ranking.iter_from(offset), start=offset):
+                if len(entries) == count:
+                    break
+                entries.append(self._entry(position + 1, user_id, -negative_points))
+            return entries
+
+    def rank(self, user_id: int) -> LeaderboardEntry | None:
+        with self._lock:
+            points = self._points.get(user_id)
+            if points is None:
+                return None
+            return self._entry(self._ranking.index((-points, user_id)) + 1, user_id, points)
+
+    def around(self, user_id: int, radius: int) -> list[LeaderboardEntry] | None:
+        """The user's entry with up to `radius` entries above and below, None when not on the board."""
+        with self._lock:
+            points = self._points.get(user_id)
+            if points is None:
+                return None
+            position = self._ranking.index((-points, user_id))
+        offset = max(position - radius, 0)
+        return self.top(position + radius + 1 - offset, offset=offset)
+
+
+class LeaderboardRegistry:
+    """Process-wide global and per-city leaderboards on `User.total_points`.
+
+    The boards are built from one query on first use and then kept current by
+    the services that change points, cities or users. Other processes are
+    only told which users changed and read their current row themselves, so
+    changes that arrive out of order still leave the latest totals.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._global: Leaderboard | None = None
+        self._cities: dict[str, Leaderboard] = {}
+        self._user_cities: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self, db: Session) -> Leaderboard:
+        record_cache("points_leaderboard", self._global is not None)
+        if self._global is not None:
+            return self._global
+        with self._lock:
+            if self._global is None:
+                board = Leaderboard()
+                for user_id, city, points in db.execute(select(User.id, User.city, User.total_points)):
+                    board.set(user_id, points or 0)
+                    self._user_cities[user_id] = city
+                    self._cities.setdefault(city, Leaderboard()).set(user_id, points or 0)
+                self._global = board
+        return self._global
+
+    def update(self, user_id: int, city: str, points: int) -> None:
+        self._set(user_id, city, points)
+        cache_bus.publish("points_leaderboard.update", user_id)
+
+    def _set(self, user_id: int, city: str, points: int) -> None:
+        # Before the first read there is nothing to keep current: loading reads committed state
+        if self._global is None:
+            return
+        with self._lock:
+            previous_city = self._user_cities.get(user_id)
+            if previous_city is not None and previous_city != city:
+                self._cities[previous_city].discard(user_id)
+            self._user_cities[user_id] = city
+            self._global.set(user_id, points or 0)
+            self._cities.setdefault(city, Leaderboard()).set(user_id, points or 0)
+
+    def remove(self, user_id: int) -> None:
+        self._discard(user_id)
+        cache_bus.publish("points_leaderboard.remove", user_id)
+
+    def _discard(self, user_id: int) -> None:
+        if self._global is None:
+            return
+        with self._lock:
+            city = self._user_cities.pop(user_id, None)
+            if city is not None:
+                self._cities[city].discard(user_id)
+            self._global.discard(user_id)
+
+    def _reload_users(self, *user_ids: int) -> None:
+        """Set `user_ids` to their committed rows, dropping users that no longer exist."""
+        if self._global is None:
+            return
+        db = self._session_factory()
+        try:
+            rows = {row.id: row for row in db.execute(select(User.id, User.city, User.total_points).where(User.id.in_(user_ids)))}
+        finally:
+            db.close()
+        for user_id in user_ids:
+            row = rows.get(user_id)
+            if row is None:
+                self._discard(user_id)
+            else:
+                self._set(user_id, row.city, row.total_points)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._global = None
+            self._cities = {}
+            self._user_cities = {}
+
+    def global_board(self, db: Session) -> Leaderboard:
+        return self._ensure_loaded(db)
+
+    def city_board(self, db: Session, city: str) -> Leaderboard:
+        self._ensure_loaded(db)
+        return self._cities.get(city) or Leaderboard()
+
+
+leaderboards = LeaderboardRegistry()
+cache_bus.subscribe("points_leaderboard.update", leaderboards._reload_users, reset=leaderboards.reset)
+cache_bus.subscribe("points_leaderboard.remove", leaderboards._reload_users, reset=leaderboards.reset)
+
+
+def _friends_board(db: Session, user_id: int) -> Leaderboard:
+    # Friend circles are small, so a throwaway board built from the global scores is cheap
+    global_board = leaderboards.global_board(db)
+    friendships = db.execute(
+        select(Friend.sender_id, Friend.receiver_id).filter(
+            or_(Friend.sender_id == user_id, Friend.receiver_id == user_id),
+            Friend.status == FriendshipStatus.ACCEPTED,
+        )
+    ).all()
+    board = Leaderboard()
+    for member_id in {user_id, *(sender if sender != user_id else receiver for sender, receiver in friendships)}:
+        points = global_board.points(member_id)
+        if points is not None:
+            board.set(member_id, points)
+    return board
+
+
+def get_leaderboard(db: Session, scope: LeaderboardScope, top: int = 10, city: str | None = None, user_id: int | None = None) -> dict:
+    if scope == LeaderboardScope.GLOBAL:
+        board = leaderboards.global_board(db)
+    elif scope == LeaderboardScope.CITY:
+        if not city:
+            raise HTTPException(status_code=400, detail="A city is required for the city leaderboard")
+        board = leaderboards.city_board(db, city)
+    else:
+        if user_id is None:
+            raise HTTPException(status_code=400, detail="A user ID is required for the friends leaderboard")
+        board = _friends_board(db, user_id)
+
+    return {
+        "top": board.top(top),
+        "me": board.rank(user_id) if user_id is not None else None,
+        "size": len(board),
+    }
@@ -0,0 +1,285 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+import anyio
+import anyio.to_thread
+from sqlalchemy.pool import QueuePool
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Pool checkout wait buckets in seconds
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class _Cells:
+    """Per-thread value cells, summed when scraped.
+
+    Every thread writes to its own list, so updates take no lock. The lock is
+    only taken the first time a thread writes and when the cells are read.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._cells: list[list[float]] = []
+        self._lock = threading.Lock()
+
+    def mine(self) -> list[float]:
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = self._local.cells = [0.0] * self._size
+            with self._lock:
+                self._cells.append(cells)
+            return cells
+
+    def totals(self) -> list[float]:
+        with self._lock:
+            cells = list(self._cells)
+        return [math.fsum(values) for values in zip(*cells)] if cells else [0.0] * self._size
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        # dict reads are atomic, the lock is only taken for a new label set
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    def __init__(self):
+        self._cells = _Cells(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._cells.mine()[0] += amount
+
+    def value(self) -> float:
+        return self._cells.totals()[0]
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount: float = 1.0) -> None:
+        self._cells.mine()[0] -= amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(child.value())}"
+
+
+class Gauge(_Metric):
+    """A gauge moved with `inc`/`dec`, or read from `function` on every scrape."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), function: Callable[[], float] | None = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def _child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def _samples(self):
+        if self.function is not None:
+            try:
+                yield f"{self.name} {_number(self.function())}"
+            except RuntimeError:
+                # e.g. the threadpool gauges outside the event loop
+                pass
+            return
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(child.value())}"
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]):
+        self._buckets = buckets
+        # one cell per bucket and +Inf, then the sum
+        self._cells = _Cells(len(buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        cells = self._cells.mine()
+        cells[bisect_left(self._buckets, value)] += 1
+        cells[-1] += value
+
+    def snapshot(self) -> tuple[list[float], float]:
+        totals = self._cells.totals()
+        return totals[:-1], totals[-1]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, values, le)} {_number(cumulative)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {_number(cumulative)}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter("sanquin_http_requests_total", "HTTP requests by route and status.", ["method", "route", "status"]))
+http_request_duration = registry.register(Histogram("sanquin_http_request_duration_seconds", "HTTP request latency by route.", ["method", "route"]))
+http_in_flight = registry.register(Gauge("sanquin_http_requests_in_flight", "HTTP requests being handled.", ["method"]))
+cache_requests = registry.register(Counter("sanquin_cache_requests_total", "In-process cache lookups by cache and result.", ["cache", "result"]))
+pool_checkout_wait = registry.register(Histogram("sanquin_db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", buckets=WAIT_BUCKETS))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    cache_requests.labels(cache, "hit" if hit else "miss").inc()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started)
+
+
+def register_engine(engine) -> None:
+    """Export the size and usage of `engine`'s pool as gauges read on every scrape.
+
+    The pool is looked up on each scrape, so the gauges follow `engine.dispose()`.
+    """
+    if not isinstance(engine.pool, QueuePool):
+        return
+    registry.register(Gauge("sanquin_db_pool_size", "Configured connection pool size.", function=lambda: engine.pool.size()))
+    registry.register(Gauge("sanquin_db_pool_checked_out", "Pooled connections in use.", function=lambda: engine.pool.checkedout()))
+    registry.register(Gauge("sanquin_db_pool_checked_in", "Idle pooled connections.", function=lambda: engine.pool.checkedin()))
+    registry.register(Gauge("sanquin_db_pool_overflow", "Connections open beyond the pool size.", function=lambda: max(engine.pool.overflow(), 0)))
+
+
+def _threadpool() -> anyio.CapacityLimiter:
+    # answers only on the event loop thread, which is where /metrics renders
+    return anyio.to_thread.current_default_thread_limiter()
+
+registry.register(Gauge("sanquin_threadpool_size", "Threads available to sync routes.", function=lambda: _threadpool().total_tokens))
+registry.register(Gauge("sanquin_threadpool_in_use", "Threads running sync routes.", function=lambda: _threadpool().borrowed_tokens))
+registry.register(Gauge("sanquin_threadpool_waiting", "Sync route calls waiting for a thread.", function=lambda: _threadpool().statistics().tasks_waiting))
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and counts it by route template and status.
+
+    The route is the path template of the matched route, so
+    /challenges/1 and /challenges/2 share one series. Requests that match
+    no route are labelled "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = http_in_flight.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            matched = scope.get("route")
+            route = getattr(matched, "path", "unmatched")
+            http_request_duration.labels(method, route).observe(elapsed)
+            http_requests.labels(method, route, str(status)).inc()
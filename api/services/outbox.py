@@ -0,0 +1,188 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Protocol
+
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from models.outbox import OutboxEvent
+
+OUTBOX_RELAY_ENABLED = os.getenv("OUTBOX_RELAY_ENABLED", "true").lower() == "true"
+# Longest the relay sleeps when no commit wakes it, which bounds the delay of retries
+OUTBOX_RELAY_INTERVAL = float(os.getenv("OUTBOX_RELAY_INTERVAL", "5"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+# A claimed batch is handed out again when its relay has not finished it in time
+OUTBOX_LEASE = timedelta(seconds=float(os.getenv("OUTBOX_LEASE_SECONDS", "60")))
+MAX_BACKOFF = timedelta(minutes=10)
+
+logger = logging.getLogger(__name__)
+
+
+class Broker(Protocol):
+    def publish(self, events: list[dict]) -> None: ...
+
+
+Handler = Callable[[Session, dict], None]
+
+
+@dataclass
+class RelayResult:
+    published: int = 0
+    failed: int = 0
+
+
+def add_event(db: Session, event_type: str, payload: dict) -> None:
+    """Record a domain event, committed together with the caller's changes."""
+    db.add(OutboxEvent(event_type=event_type, payload=payload))
+    db.info["outbox_events"] = True
+
+
+def _backoff(attempts: int) -> timedelta:
+    return min(timedelta(seconds=2 ** attempts), MAX_BACKOFF)
+
+
+class OutboxRelay:
+    """Delivers outbox events to in-process handlers and an optional broker.
+
+    A batch of due events is claimed by pushing their `available_at` past a
+    lease, so relays in other workers skip them (rows being claimed are
+    locked with SKIP LOCKED on PostgreSQL). The broker gets the whole batch
+    in one call. Then every event runs its handlers in its own transaction,
+    which also marks it published. Handlers get the relay's session, so
+    derived rows they write commit together with the delivery.
+
+    Delivery is at least once. A failed broker call or handler retries the
+    event with exponential backoff, and a relay that dies mid-batch leaves
+    its events to be claimed again after the lease. Handlers must tolerate
+    seeing an event twice.
+    """
+
+    def __init__(self, broker: Broker | None = None, batch_size: int = OUTBOX_BATCH_SIZE, lease: timedelta = OUTBOX_LEASE):
+        self.broker = broker
+        self.batch_size = batch_size
+        self.lease = lease
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def subscribe(self, event_type: str, handler: Handler) -> None:
+        self._handlers[event_type].append(handler)
+
+    def _claim(self, db: Session, now: datetime) -> list[dict]:
+        events = db.scalars(
+            select(OutboxEvent)
+            .where(OutboxEvent.published_at.is_(None), OutboxEvent.available_at <= now)
+            .order_by(OutboxEvent.available_at, OutboxEvent.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        claimed = [
+            {"id": row.id, "type": row.event_type, "payload": row.payload, "created_at": row.created_at.isoformat(), "attempts": row.attempts + 1}
+            for row in events
+        ]
+        if claimed:
+            db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_([claim["id"] for claim in claimed]))
+                .values(available_at=now + self.lease, attempts=OutboxEvent.attempts + 1)
+            )
+        db.commit()
+        return claimed
+
+    def _retry(self, db: Session, events: list[dict], error: Exception) -> None:
+        now = datetime.now()
+        for claim in events:
+            db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id == claim["id"])
+                .values(available_at=now + _backoff(claim["attempts"]), last_error=str(error)[:500])
+            )
+        db.commit()
+
+    def relay_once(self, db: Session) -> RelayResult:
+        """Claim one batch of due events and deliver it."""
+        result = RelayResult()
+        events = self._claim(db, datetime.now())
+        if not events:
+            return result
+        if self.broker is not None:
+            try:
+                self.broker.publish(events)
+            except Exception as e:
+                logger.warning("outbox broker publish failed events=%s error=%s", len(events), e)
+                db.rollback()
+                self._retry(db, events, e)
+                result.failed = len(events)
+                return result
+        for claim in events:
+            try:
+                for handler in self._handlers.get(claim["type"], ()):
+                    handler(db, claim)
+                db.execute(update(OutboxEvent).where(OutboxEvent.id == claim["id"]).values(published_at=datetime.now()))
+                db.commit()
+                result.published += 1
+            except Exception as e:
+                logger.warning("outbox handler failed event_id=%s event_type=%s error=%s", claim["id"], claim["type"], e)
+                db.rollback()
+                self._retry(db, [claim], e)
+                result.failed += 1
+        return result
+
+    def relay_due(self, db: Session) -> RelayResult:
+        """Deliver batches until no event is due."""
+        total = RelayResult()
+        while True:
+            result = self.relay_once(db)
+            total.published += result.published
+            total.failed += result.failed
+            if result.published + result.failed < self.batch_size:
+                return total
+
+    def prune(self, db: Session, older_than: timedelta) -> int:
+        """Delete events published more than `older_than` ago."""
+        deleted = db.execute(delete(OutboxEvent).where(OutboxEvent.published_at < datetime.now() - older_than)).rowcount
+        db.commit()
+        return deleted
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def start(self, session_factory: sessionmaker, interval: float = OUTBOX_RELAY_INTERVAL) -> None:
+        """Relay in a daemon thread until `stop`, woken by commits that wrote events."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(session_factory, interval), name="outbox-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, session_factory: sessionmaker, interval: float) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                with session_factory() as db:
+                    self.relay_due(db)
+            except Exception:
+                logger.exception("Outbox relay run failed")
+            self._wake.wait(interval)
+
+
+outbox_relay = OutboxRelay()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_relay(session: Session) -> None:
+    if session.info.pop("outbox_events", False):
+        outbox_relay.wake()
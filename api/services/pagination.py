@@ -0,0 +1,117 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+from datetime import datetime
+from typing import Callable, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.orm import Session
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Cursors are signed so clients cannot forge sort keys; every worker must
+# share CURSOR_SECRET for a cursor from one worker to be accepted by another
+CURSOR_SECRET = os.getenv("CURSOR_SECRET")
+SIGNATURE_BYTES = 12
+
+logger = logging.getLogger(__name__)
+
+if not CURSOR_SECRET:
+    CURSOR_SECRET = secrets.token_hex(32)
+    logger.warning("CURSOR_SECRET is not set, cursors only work on the worker that made them")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(CURSOR_SECRET.encode(), body.encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES])
+
+
+def encode_cursor(*values) -> str:
+    """Opaque, signed cursor for the sort key of the last row of a page."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{body}.{_sign(body)}"
+
+def check_cursor(cursor: str | None) -> None:
+    """Raise 400 unless `cursor` is None or was made by `encode_cursor`.
+
+    Routes call this before their error handling, which reports everything
+    else as a 500.
+    """
+    if cursor is not None:
+        decode_cursor(cursor)
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Decode a cursor from `encode_cursor`, converting each value to the matching type.
+
+    Without `types` only the signature is checked. Raises 400 when the cursor
+    is malformed or its signature does not match.
+    """
+    try:
+        body, _, signature = cursor.partition(".")
+        if not hmac.compare_digest(signature, _sign(body)):
+            raise ValueError("bad signature")
+        payload = json.loads(_b64decode(body))
+        if not isinstance(payload, list) or (types and len(payload) != len(types)):
+            raise ValueError("wrong number of values")
+        return tuple(
+            datetime.fromisoformat(value) if value_type is datetime else value_type(value)
+            for value_type, value in zip(types, payload)
+        )
+    except (binascii.Error, UnicodeError, ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+def paginate(
+    db: Session,
+    statement: Select,
+    keys: Sequence,
+    limit: int,
+    cursor: str | None = None,
+    descending: bool = False,
+    key_of: Callable | None = None,
+) -> tuple[list, str | None]:
+    """One page of `statement` by keyset pagination on the `keys` columns.
+
+    The statement is ordered by the keys, which must be unique together and
+    not null, and the cursor continues after the last row of the previous
+    page with a comparison on them. Backed by an index on the keys every page
+    costs the same, however deep it is, unlike OFFSET which reads and drops
+    every row before it.
+
+    `key_of` gives a row's key values when the rows are not the entity the
+    keys belong to; by default they are read from the row's attributes.
+    Returns the rows and the cursor of the next page, which is None on the
+    last page.
+    """
+    statement = statement.order_by(None).order_by(*(key.desc() if descending else key for key in keys))
+    if cursor is not None:
+        values = decode_cursor(cursor, *(key.type.python_type for key in keys))
+        if len(keys) == 1:
+            position, values = keys[0], values[0]
+        else:
+            position = tuple_(*keys)
+        statement = statement.where(position < values if descending else position > values)
+    rows = db.scalars(statement.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(*(key_of(last) if key_of else (getattr(last, key.key) for key in keys)))
+    return rows, next_cursor
+
+def page_data(items: list, limit: int, next_cursor: str | None) -> dict:
+    """The `data` of a paginated response."""
+    return {"items": items, "limit": limit, "next_cursor": next_cursor}
@@ -0,0 +1,92 @@
+from fastapi import HTTPException
+from sqlalchemy import select, update, insert, func, desc
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from models.points import PointsTransaction
+from models.user import User
+from schemas.points import PointsBalance, PointsTransactionResponse
+from services.leaderboard import leaderboards
+from services.repository import get_or_404
+
+
+def award_points(db: Session, user_id: int, amount: int, reason: str) -> PointsBalance:
+    """Add `amount` points (negative to spend) and record it in the ledger.
+
+    The balance is changed with an in-SQL increment, so concurrent awards for
+    the same user cannot overwrite each other. Spending never takes
+    `current_points` below zero and never lowers `total_points`.
+    """
+    try:
+        current_points = func.coalesce(User.current_points, 0)
+        total_points = func.coalesce(User.total_points, 0)
+        row = db.execute(
+            update(User)
+            .where(User.id == user_id, current_points + amount >= 0)
+            .values(current_points=current_points + amount, total_points=total_points + max(amount, 0))
+            .returning(User.current_points, User.total_points, User.city)
+        ).first()
+        if row is None:
+            get_or_404(db, User, user_id)
+            raise HTTPException(status_code=400, detail=f"User with ID {user_id} does not have {-amount} points to spend")
+
+        transaction = PointsTransaction(user_id=user_id, amount=amount, reason=reason)
+        db.add(transaction)
+        db.commit()
+        db.refresh(transaction)
+
+        leaderboards.update(user_id, row.city, row.total_points)
+        return PointsBalance(
+            user_id=user_id,
+            current_points=row.current_points,
+            total_points=row.total_points,
+            transaction=PointsTransactionResponse.model_validate(transaction),
+        )
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def award_points_to_users(db: Session, user_ids: list[int], amount: int, reason: str, challenge_id: int | None = None) -> list[Row]:
+    """Add `amount` points to every user in `user_ids` with one UPDATE and one ledger INSERT.
+
+    With `challenge_id` it is a challenge reward: users whose ledger already
+    has a reward for that challenge are skipped. Runs in the caller's
+    transaction. Returns the (id, city, total_points) of the awarded users,
+    which the caller hands to `leaderboards.update` once the transaction is
+    committed.
+    """
+    if challenge_id is not None and user_ids:
+        rewarded = set(db.scalars(
+            select(PointsTransaction.user_id).where(PointsTransaction.challenge_id == challenge_id, PointsTransaction.user_id.in_(user_ids))
+        ))
+        user_ids = [user_id for user_id in user_ids if user_id not in rewarded]
+    if not user_ids or amount <= 0:
+        return []
+    rows = db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(
+            current_points=func.coalesce(User.current_points, 0) + amount,
+            total_points=func.coalesce(User.total_points, 0) + amount,
+        )
+        .returning(User.id, User.city, User.total_points)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if rows:
+        db.execute(insert(PointsTransaction), [{"user_id": row.id, "amount": amount, "reason": reason, "challenge_id": challenge_id} for row in rows])
+    return rows
+
+def get_points_history(db: Session, user_id: int) -> list[PointsTransaction]:
+    try:
+        transactions = (
+            db.query(PointsTransaction)
+            .filter(PointsTransaction.user_id == user_id)
+            .order_by(desc(PointsTransaction.created_at), desc(PointsTransaction.id))
+            .all()
+        )
+        if not transactions:
+            raise HTTPException(status_code=404, detail=f"No points transactions found for user with ID {user_id}")
+        return transactions
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
@@ -1,15 +1,24 @@
+import logging
 from datetime import datetime, timezone
 
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
 
 from models.post import Post
 from models.kudos import Kudos
-from schemas.post import PostResponse, KudosResponse, PostCreate
+from models.user import User
+from schemas.post import PostResponse, KudosResponse, PostCreate, KudosCreate
+from schemas.response import BatchItemResult
+from services.outbox import add_event
+from services.pagination import paginate
+from services.repository import get_or_404, get_many
+
+logger = logging.getLogger(__name__)
 
 def check_post_exists(db, post_id):
-    return db.query(Post).filter(Post.id == post_id).first() is not None   
+    return db.get(Post, post_id) is not None
     
 
 def create_post(db: Session, post: PostCreate):
@@ -21,10 +30,12 @@ def create_post(db: Session, post: PostCreate):
             created_at=datetime.now(tz=timezone.utc),
             post_type=post.post_type,
         )
-        print(new_post)
         db.add(new_post)
+        db.flush()
+        add_event(db, "post.created", {"post_id": new_post.id, "user_id": new_post.user_id, "post_type": new_post.post_type})
         db.commit()
-        db.refresh(new_post)     
+        db.refresh(new_post)
+        logger.debug("post created post_id=%s user_id=%s post_type=%s", new_post.id, new_post.user_id, new_post.post_type)
         return new_post
     except Exception as e:
         raise HTTPException(status_code=500, detail=e) from e
@@ -41,13 +52,17 @@ def get_posts_by_user_id(db: Session, user_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=e) from e
 
+def get_posts_page(db: Session, user_id: int, limit: int, cursor: str | None = None):
+    """One page of a user's posts, newest first, with the cursor of the next page."""
+    try:
+        query = select(Post).where(Post.user_id == user_id)
+        return paginate(db, query, (Post.created_at, Post.id), limit, cursor, descending=True)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 def delete_post(db: Session, post_id: int):
     try:
-        post = db.query(Post).filter(Post.id == post_id).first()
-        if not check_post_exists(db, post_id):
-            raise HTTPException(
-                status_code=404, detail=f"Post not found with ID {post_id}"
-            )
+        post = get_or_404(db, Post, post_id)
         db.delete(post)
         db.commit()
         return post
@@ -60,11 +75,8 @@ def check_kudos_exists(db: Session, post_id: int, user_id: int):
 
 def add_kudos(db: Session, kudos: Kudos):
     try:
-        if not check_post_exists(db, kudos.post_id):
-            raise HTTPException(
-                status_code=404, detail=f"Post not found with ID {kudos.post_id}"
-            )
-            
+        get_or_404(db, Post, kudos.post_id)
+
         new_kudos = Kudos(
             post_id=kudos.post_id,
             user_id=kudos.user_id,
@@ -81,13 +93,39 @@ def add_kudos(db: Session, kudos: Kudos):
     except Exception as e:
         raise HTTPException(status_code=500, detail=e) from e
 
-def get_kudos_by_post_id(db: Session, post_id: int):
+def add_kudos_batch(db: Session, kudos_list: list[KudosCreate]) -> list[BatchItemResult]:
     try:
-        if not check_post_exists(db, post_id):
-            raise HTTPException(
-                status_code=404, detail=f"Post not found with ID {post_id}"
+        post_ids = {post.id for post in get_many(db, Post, [kudos.post_id for kudos in kudos_list])}
+        user_ids = {user.id for user in get_many(db, User, [kudos.user_id for kudos in kudos_list])}
+
+        results = []
+        rows = []
+        row_indexes = []
+        created_at = datetime.now(tz=timezone.utc)
+        for index, kudos in enumerate(kudos_list):
+            if kudos.post_id not in post_ids:
+                results.append(BatchItemResult(index=index, status=404, message=f"Post not found with ID {kudos.post_id}"))
+            elif kudos.user_id not in user_ids:
+                results.append(BatchItemResult(index=index, status=404, message=f"User not found with ID {kudos.user_id}"))
+            else:
+                rows.append(dict(post_id=kudos.post_id, user_id=kudos.user_id, created_at=created_at))
+                row_indexes.append(index)
+
+        if rows:
+            new_ids = db.execute(insert(Kudos).returning(Kudos.id, sort_by_parameter_order=True), rows).scalars().all()
+            db.commit()
+            results.extend(
+                BatchItemResult(index=index, status=200, id=new_id) for index, new_id in zip(row_indexes, new_ids)
             )
-            
+        return sorted(results, key=lambda result: result.index)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def get_kudos_by_post_id(db: Session, post_id: int):
+    try:
+        get_or_404(db, Post, post_id)
+
         kudos = db.query(Kudos).filter(Kudos.post_id == post_id).all()
         if not kudos:
             raise HTTPException(
@@ -97,16 +135,18 @@ def get_kudos_by_post_id(db: Session, post_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=e) from e
 
+def get_kudos_page(db: Session, post_id: int, limit: int, cursor: str | None = None):
+    """One page of a post's kudos in user ID order, with the cursor of the next page."""
+    try:
+        get_or_404(db, Post, post_id)
+        query = select(Kudos).where(Kudos.post_id == post_id)
+        return paginate(db, query, (Kudos.user_id, Kudos.id), limit, cursor)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 def delete_kudos(db: Session, post_id: int, user_id: int):
     try:
-        if not check_post_exists(db, post_id):
-            raise HTTPException(
-                status_code=404, detail=f"Post not found with ID {post_id}"
-            )
-        if not check_kudos_exists(db, post_id, user_id):
-            raise HTTPException(
-                status_code=404, detail=f"Kudos not found for post with ID {post_id} and user with ID {user_id}"
-            )
+        get_or_404(db, Post, post_id)
         kudos = db.query(Kudos).filter(Kudos.post_id == post_id, Kudos.user_id == user_id).first()
         if not kudos:
             raise HTTPException(
@@ -118,13 +158,13 @@ def delete_kudos(db: Session, post_id: int, user_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=e) from e
 
-def get_friends_posts(db: Session, user_id: list[int], limit: int = 10 , offset: int = 0):
+def get_friends_posts(db: Session, user_id: int, limit: int = 10):
     try:
-        posts = db.query(Post).filter(Post.user_id == user_id).order_by(desc(Post.created_at)).limit(limit).offset(offset).all()
+        posts, _ = get_posts_page(db, user_id, limit)
         if not posts:
             raise HTTPException(
                 status_code=404, detail=f"No posts found for friends"
             )
         return posts
     except Exception as e:
-        raise HTTPException(status_code=500, detail=e) from e
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=e) from e
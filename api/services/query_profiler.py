@@ -0,0 +1,228 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements at least this slow are sampled and logged
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Share of the slow statements that are kept as samples
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+# Re-run sampled SELECTs under EXPLAIN ANALYZE (EXPLAIN QUERY PLAN on SQLite)
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() == "true"
+MAX_FINGERPRINTS = 500
+MAX_SAMPLES = 100
+
+logger = logging.getLogger(__name__)
+
+# "GET /challenges/1" for the request a statement runs for, set by QueryRouteMiddleware
+current_route: ContextVar[str | None] = ContextVar("current_route", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"%\(\w+\)s|%s|\?|(?<!:):\w+|\$\d+")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+", re.IGNORECASE)
+_POSTCOMPILE = re.compile(r"\(__\[POSTCOMPILE_\w+\]\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """`statement` with literals and parameters replaced, so repeats of one query group together.
+
+    Lists of any length collapse to `(...)`, which keeps IN lists and
+    multi-row VALUES of different sizes on one fingerprint.
+    """
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _POSTCOMPILE.sub("(?)", normalized)
+    normalized = _STRING.sub("?", normalized)
+    normalized = _PARAMETER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(...)", normalized)
+    return _VALUES_LIST.sub(r"\1", normalized)
+
+def redact(parameters) -> object:
+    """The shape of bound parameters with every value replaced by its type name."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: the first row stands for the rest
+            return {"rows": len(parameters), "first": redact(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+@dataclass
+class StatementStats:
+    fingerprint: str
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows: int = 0
+    slow: int = 0
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        stats["total_ms"] = round(self.total_ms, 3)
+        stats["max_ms"] = round(self.max_ms, 3)
+        stats["mean_ms"] = round(self.total_ms / self.calls, 3) if self.calls else 0.0
+        return stats
+
+
+@dataclass
+class SlowQuerySample:
+    fingerprint: str
+    parameters: object
+    duration_ms: float
+    route: str | None
+    at: datetime
+    plan: list[str] | None = None
+
+
+class QueryProfiler:
+    """Times every statement an engine runs and keeps per-fingerprint totals.
+
+    Statements slower than `slow_ms` are sampled at `sample_rate` into a
+    ring buffer of the last `max_samples`, with bound parameters redacted,
+    the route of the request that ran them and, with `explain`, the plan of
+    a re-run. Only the `max_fingerprints` most recently seen fingerprints
+    are kept.
+    """
+
+    def __init__(
+        self,
+        slow_ms: float = SLOW_QUERY_MS,
+        sample_rate: float = SLOW_QUERY_SAMPLE_RATE,
+        explain: bool = SLOW_QUERY_EXPLAIN,
+        max_fingerprints: int = MAX_FINGERPRINTS,
+        max_samples: int = MAX_SAMPLES,
+    ):
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.explain = explain
+        self.max_fingerprints = max_fingerprints
+        self._stats: OrderedDict[str, StatementStats] = OrderedDict()
+        self._samples: deque[SlowQuerySample] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def install(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        duration_ms = (time.perf_counter() - started) * 1000
+        key = fingerprint(statement)
+        slow = duration_ms >= self.slow_ms
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats(key)
+                if len(self._stats) > self.max_fingerprints:
+                    self._stats.popitem(last=False)
+            else:
+                self._stats.move_to_end(key)
+            stats.calls += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.rows += max(cursor.rowcount, 0) if cursor.rowcount is not None else 0
+            stats.slow += slow
+
+        if slow and random.random() < self.sample_rate:
+            self._sample(conn, cursor, statement, parameters, key, duration_ms)
+
+    def _handle_error(self, context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+    def _sample(self, conn, cursor, statement, parameters, key, duration_ms):
+        route = current_route.get()
+        sample = SlowQuerySample(
+            fingerprint=key, parameters=redact(parameters),
+            duration_ms=round(duration_ms, 3), route=route, at=datetime.now(),
+        )
+        if self.explain and statement.lstrip().upper().startswith("SELECT"):
+            sample.plan = self._explain(conn, cursor, statement, parameters)
+        with self._lock:
+            self._samples.append(sample)
+        logger.warning("slow query duration_ms=%.1f route=%s fingerprint=%s", duration_ms, route, key)
+
+    def _explain(self, conn, cursor, statement, parameters) -> list[str] | None:
+        prefix = {"postgresql": "EXPLAIN (ANALYZE, BUFFERS) ", "sqlite": "EXPLAIN QUERY PLAN "}.get(conn.dialect.name)
+        if prefix is None:
+            return None
+        # a raw DBAPI cursor, so the re-run is not timed or sampled itself
+        explain_cursor = cursor.connection.cursor()
+        # it shares the request's transaction: on PostgreSQL a failing EXPLAIN
+        # would abort it, so it runs in a savepoint that is rolled back on error
+        savepoint = conn.dialect.name == "postgresql"
+        try:
+            if savepoint:
+                explain_cursor.execute("SAVEPOINT query_profiler_explain")
+            try:
+                explain_cursor.execute(prefix + statement, parameters)
+                plan = [" ".join(str(column) for column in row) for row in explain_cursor.fetchall()]
+            except Exception:
+                if savepoint:
+                    explain_cursor.execute("ROLLBACK TO SAVEPOINT query_profiler_explain")
+                raise
+            finally:
+                if savepoint:
+                    explain_cursor.execute("RELEASE SAVEPOINT query_profiler_explain")
+            return plan
+        except Exception:
+            logger.debug("explain failed fingerprint=%s", fingerprint(statement), exc_info=True)
+            return None
+        finally:
+            explain_cursor.close()
+
+    def report(self, limit: int = 20, sort: str = "total_ms") -> dict:
+        """The `limit` costliest fingerprints by `sort`, and the slow query samples, newest first."""
+        with self._lock:
+            statements = [stats.as_dict() for stats in self._stats.values()]
+            samples = [asdict(sample) for sample in reversed(self._samples)]
+        statements.sort(key=lambda stats: stats[sort], reverse=True)
+        return {
+            "slow_ms": self.slow_ms,
+            "statements": statements[:limit],
+            "fingerprints": len(statements),
+            "slow_samples": samples,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._samples.clear()
+
+
+query_profiler = QueryProfiler()
+
+
+class QueryRouteMiddleware:
+    """Tags the statements run for each HTTP request with its method and path."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_route.set(f"{scope['method']} {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
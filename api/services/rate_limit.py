@@ -0,0 +1,150 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+
+import anyio.to_thread
+from fastapi import HTTPException, Request
+from sqlalchemy import case, func, delete, literal
+from sqlalchemy.dialects.postgresql import insert
+
+from database import SessionLocal
+from models.rate_limit import RateLimitBucket
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    rate: float  # tokens added per second
+    burst: int  # bucket size
+
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# "memory" keeps the buckets per worker, "postgres" shares them between workers
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Buckets kept in memory; the least recently used is dropped, which only refills it
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# An address is allowed this many times the per-user limit, it may be shared by several users
+RATE_LIMIT_IP_FACTOR = float(os.getenv("RATE_LIMIT_IP_FACTOR", "10"))
+
+LIMITS = {
+    # polled by the app
+    "notifications": RateLimit(rate=1.0, burst=10),
+    "friends_posts": RateLimit(rate=1.0, burst=10),
+    # password check, keyed by the email that is tried
+    "login": RateLimit(rate=0.1, burst=5),
+}
+
+def parse_limits(value: str) -> dict[str, RateLimit]:
+    """Limits from `name=rate:burst,...`, e.g. RATE_LIMITS="login=0.05:3"."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, spec = item.partition("=")
+        rate, _, burst = spec.partition(":")
+        limits[name.strip()] = RateLimit(rate=float(rate), burst=int(burst))
+    return limits
+
+LIMITS.update(parse_limits(os.getenv("RATE_LIMITS", "")))
+
+
+class MemoryBucketStore:
+    """Token buckets in an LRU ordered dict, O(1) per take.
+
+    A bucket is a two-item list of its tokens and when they were counted.
+    Beyond `max_keys` buckets the least recently used one is dropped; a
+    dropped bucket comes back full, which is what it would have refilled to
+    unless its client is still active.
+    """
+    blocking = False
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: RateLimit, now: float | None = None) -> float:
+        """Take a token from `key`'s bucket; 0 when one was there, else the seconds until there is one."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(limit.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(float(limit.burst), bucket[0] + (now - bucket[1]) * limit.rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return 0.0
+            return (1.0 - bucket[0]) / limit.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class PostgresBucketStore:
+    """Token buckets in the UNLOGGED `rate_limit_buckets` table, shared by every worker.
+
+    A take is one upsert that refills and takes in the database. Buckets idle
+    for `idle_seconds` are full again, about one take in `PRUNE_EVERY` deletes them.
+    """
+    blocking = True
+    PRUNE_EVERY = 1000
+
+    def __init__(self, session_factory, idle_seconds: float = 3600.0):
+        self.session_factory = session_factory
+        self.idle_seconds = idle_seconds
+
+    def take(self, key: str, limit: RateLimit) -> float:
+        bucket = RateLimitBucket.__table__
+        elapsed = func.extract("epoch", func.now() - bucket.c.updated_at)
+        refilled = func.least(literal(float(limit.burst)), bucket.c.tokens + elapsed * limit.rate)
+        statement = insert(bucket).values(key=key, tokens=float(limit.burst - 1), allowed=True, updated_at=func.now())
+        statement = statement.on_conflict_do_update(
+            index_elements=[bucket.c.key],
+            set_={
+                "tokens": case((refilled >= 1.0, refilled - 1.0), else_=refilled),
+                "allowed": refilled >= 1.0,
+                "updated_at": func.now(),
+            },
+        ).returning(bucket.c.tokens, bucket.c.allowed)
+        with self.session_factory() as db:
+            tokens, allowed = db.execute(statement).one()
+            if random.randrange(self.PRUNE_EVERY) == 0:
+                db.execute(delete(RateLimitBucket).where(RateLimitBucket.updated_at < func.now() - timedelta(seconds=self.idle_seconds)))
+            db.commit()
+        return 0.0 if allowed else (1.0 - tokens) / limit.rate
+
+
+bucket_store = PostgresBucketStore(SessionLocal) if RATE_LIMIT_BACKEND == "postgres" else MemoryBucketStore()
+
+
+def rate_limit(name: str, key_param: str = "user_id"):
+    """Route dependency that takes a token from the buckets of the path's `key_param` and of the client address.
+
+    Raises 429 with Retry-After when either bucket is empty. Limits are looked
+    up by `name` in LIMITS, which RATE_LIMITS overrides.
+    """
+    async def check_rate_limit(request: Request):
+        limit = LIMITS.get(name)
+        if not RATE_LIMIT_ENABLED or limit is None:
+            return
+        keys = []
+        user = request.path_params.get(key_param)
+        if user is not None:
+            keys.append((f"{name}:user:{user}", limit))
+        if request.client is not None:
+            keys.append((f"{name}:ip:{request.client.host}", RateLimit(limit.rate * RATE_LIMIT_IP_FACTOR, int(limit.burst * RATE_LIMIT_IP_FACTOR))))
+        for key, key_limit in keys:
+            if bucket_store.blocking:
+                retry_after = await anyio.to_thread.run_sync(bucket_store.take, key, key_limit)
+            else:
+                retry_after = bucket_store.take(key, key_limit)
+            if retry_after:
+                raise HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": str(max(int(retry_after + 0.999), 1))})
+
+    return check_rate_limit
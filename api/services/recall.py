@@ -0,0 +1,217 @@
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import select, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models.eligibility import DonorEligibility
+from models.enums import DonationType
+from models.location_info import LocationInfo
+from models.notification import Notification
+from models.user import User
+from schemas.recall import RecallRequest, RecallResult
+from services.cache_bus import cache_bus
+from services.metrics import record_cache
+from services.repository import get_or_404
+
+NOTIFICATION_CHUNK_SIZE = 1000
+
+# _BITS[byte] = positions of the set bits in byte
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def _bitmap(positions: Iterable[int], size: int) -> int:
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+def _normalize(value: str | None) -> str | None:
+    return value.strip().upper() if value else None
+
+
+class DonorIndex:
+    """Snapshot of every user in the shape recall queries need.
+
+    Users are numbered by their position in the sorted `user_ids` array.
+    Blood types and cities are bitmaps over those positions (Python ints),
+    and next-eligible and last-donation dates are kept as sorted timestamp
+    arrays with the matching positions. Every filter becomes a bitmap built
+    from a dictionary lookup or a binary search, and combining filters is a
+    bitwise AND over a few kilobytes.
+    """
+
+    def __init__(self, db: Session):
+        users = db.execute(select(User.id, User.blood_type, User.city).order_by(User.id)).all()
+        self.user_ids = array("q", (user_id for user_id, _, _ in users))
+        self.size = len(users)
+        self.everyone = (1 << self.size) - 1
+
+        blood_types: dict[str, list[int]] = {}
+        cities: dict[str, list[int]] = {}
+        for position, (_, blood_type, city) in enumerate(users):
+            if blood_type:
+                blood_types.setdefault(_normalize(blood_type), []).append(position)
+            cities.setdefault(_normalize(city), []).append(position)
+        self.blood_types = {name: _bitmap(positions, self.size) for name, positions in blood_types.items()}
+        self.cities = {name: _bitmap(positions, self.size) for name, positions in cities.items()}
+
+        positions_by_id = {user_id: position for position, user_id in enumerate(self.user_ids)}
+        next_eligible: dict[DonationType, list[tuple[float, int]]] = {donation_type: [] for donation_type in DonationType}
+        last_donation: dict[int, float] = {}
+        for user_id, donation_type, last_donation_at, next_eligible_at in db.execute(
+            select(DonorEligibility.user_id, DonorEligibility.donation_type, DonorEligibility.last_donation_at, DonorEligibility.next_eligible_at)
+        ):
+            position = positions_by_id.get(user_id)
+            if position is None:
+                continue
+            next_eligible[donation_type].append((next_eligible_at.timestamp(), position))
+            last_donation[position] = max(last_donation.get(position, 0.0), last_donation_at.timestamp())
+
+        self.next_eligible = {}
+        for donation_type, entries in next_eligible.items():
+            entries.sort()
+            self.next_eligible[donation_type] = (array("d", (ts for ts, _ in entries)), array("q", (position for _, position in entries)))
+        entries = sorted((ts, position) for position, ts in last_donation.items())
+        self.last_donation = (array("d", (ts for ts, _ in entries)), array("q", (position for _, position in entries)))
+
+    def eligible(self, donation_type: DonationType, at: datetime) -> int:
+        timestamps, positions = self.next_eligible[donation_type]
+        waiting = positions[bisect_right(timestamps, at.timestamp()):]
+        return self.everyone & ~_bitmap(waiting, self.size)
+
+    def donated_since(self, since: datetime) -> int:
+        timestamps, positions = self.last_donation
+        return _bitmap(positions[bisect_left(timestamps, since.timestamp()):], self.size)
+
+    def any_of(self, bitmaps: dict[str, int], names: Iterable[str]) -> int:
+        mask = 0
+        for name in names:
+            mask |= bitmaps.get(_normalize(name), 0)
+        return mask
+
+    def user_ids_of(self, mask: int) -> Iterator[int]:
+        for byte_index, byte in enumerate(mask.to_bytes((self.size + 7) // 8, "little")):
+            if byte:
+                base = byte_index * 8
+                for bit in _BITS[byte]:
+                    yield self.user_ids[base + bit]
+
+
+class DonorIndexCache:
+    """Lazily built `DonorIndex`, rebuilt after `invalidate` or once it is `max_age` old.
+
+    User and donation writes invalidate it, so a recall never notifies a donor
+    who just became ineligible. Invalidating only drops the index; the next
+    recall rebuilds it, so writes never pay for a rebuild and there is at most
+    one per recall. Every drop bumps a generation, and an index built while
+    one happened is used for that recall but not kept, since it may predate
+    the write.
+    """
+
+    def __init__(self, max_age: timedelta = timedelta(minutes=10)):
+        self.max_age = max_age
+        self._index: DonorIndex | None = None
+        self._built_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def get(self, db: Session) -> DonorIndex:
+        with self._build_lock:
+            with self._lock:
+                index = self._index
+                stale = index is None or time.monotonic() - self._built_at > self.max_age.total_seconds()
+                generation = self._generation
+            record_cache("donor_index", not stale)
+            if not stale:
+                return index
+            index = DonorIndex(db)
+            with self._lock:
+                if self._generation == generation:
+                    self._index = index
+                    self._built_at = time.monotonic()
+            return index
+
+    def invalidate(self) -> None:
+        self._drop()
+        cache_bus.publish("donor_index")
+
+    def _drop(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._index = None
+
+
+donor_index = DonorIndexCache()
+cache_bus.subscribe("donor_index", donor_index._drop, reset=donor_index._drop)
+
+
+def _distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+def _cities_near(db: Session, index: DonorIndex, location_id: int, radius_km: float) -> list[str]:
+    # Users only have a city, so a city counts as near when a location within
+    # the radius has it in its address, the same matching as the city location search
+    target = get_or_404(db, LocationInfo, location_id)
+    addresses = [
+        address.upper()
+        for address, latitude, longitude in db.execute(select(LocationInfo.address, LocationInfo.latitude, LocationInfo.longitude))
+        if _distance_km(float(target.latitude), float(target.longitude), float(latitude), float(longitude)) <= radius_km
+    ]
+    return [city for city in index.cities if city and any(city in address for address in addresses)]
+
+def select_recall_donors(db: Session, recall: RecallRequest) -> tuple[DonorIndex, int]:
+    """The donor index and the bitmap of users matching `recall`."""
+    index = donor_index.get(db)
+    now = datetime.now()
+    mask = index.any_of(index.blood_types, recall.blood_types) & index.eligible(recall.donation_type, now)
+    if recall.city is not None or recall.location_id is not None:
+        cities = [recall.city] if recall.city is not None else []
+        if recall.location_id is not None:
+            cities.extend(_cities_near(db, index, recall.location_id, recall.radius_km))
+        mask &= index.any_of(index.cities, cities)
+    if recall.donated_within_days is not None:
+        mask &= index.donated_since(now - timedelta(days=recall.donated_within_days))
+    return index, mask
+
+def send_recall(db: Session, recall: RecallRequest) -> RecallResult:
+    """Notify every donor matching `recall`, or only count them for a dry run.
+
+    Matching user IDs are streamed from the bitmap into multi-row notification
+    INSERTs, all in one transaction.
+    """
+    started = time.perf_counter()
+    index, mask = select_recall_donors(db, recall)
+    matched = mask.bit_count()
+    selection_ms = (time.perf_counter() - started) * 1000
+
+    notified = 0
+    if not recall.dry_run:
+        recipients = index.user_ids_of(mask)
+        if recall.limit is not None:
+            recipients = islice(recipients, recall.limit)
+        created_at = datetime.now()
+        try:
+            while chunk := list(islice(recipients, NOTIFICATION_CHUNK_SIZE)):
+                db.execute(insert(Notification), [
+                    dict(title=recall.title, content=recall.content, user_id=user_id, created_at=created_at, retrieved=False)
+                    for user_id in chunk
+                ])
+                notified += len(chunk)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=str(e)) from e
+
+    return RecallResult(matched=matched, notified=notified, selection_ms=round(selection_ms, 3))
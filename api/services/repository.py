@@ -0,0 +1,55 @@
+from typing import Iterable, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy import inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+ModelType = TypeVar("ModelType")
+
+
+def get_or_404(db: Session, model: type[ModelType], ident, detail: str | None = None, options=()) -> ModelType:
+    """Return the row with primary key `ident` or raise a 404.
+
+    `Session.get` checks the identity map before emitting SQL, so a row that
+    was already loaded earlier in the request (e.g. by the router) is reused.
+    """
+    instance = db.get(model, ident, options=options)
+    if instance is None:
+        raise HTTPException(status_code=404, detail=detail or f"{model.__name__} not found with ID {ident}")
+    return instance
+
+
+def get_many(db: Session, model: type[ModelType], idents: Iterable, options=()) -> list[ModelType]:
+    """Return the rows for `idents` in request order, skipping unknown IDs.
+
+    Rows already present in the session are taken from the identity map, the
+    rest are fetched with a single `IN` query.
+    """
+    idents = list(dict.fromkeys(idents))
+    found = {}
+    missing = []
+    for ident in idents:
+        instance = db.identity_map.get(identity_key(model, ident))
+        if instance is not None and not inspect(instance).expired:
+            found[ident] = instance
+        else:
+            missing.append(ident)
+
+    if missing:
+        primary_key = inspect(model).primary_key[0]
+        for instance in db.execute(select(model).options(*options).where(primary_key.in_(missing))).scalars():
+            found[getattr(instance, primary_key.key)] = instance
+
+    return [found[ident] for ident in idents if ident in found]
+
+
+def upsert(db: Session, model: type):
+    """Core INSERT into `model`'s table with the ON CONFLICT clauses of the session's dialect.
+
+    Goes to the table rather than the mapped class, which skips the ORM bulk
+    path and its per-row bookkeeping.
+    """
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model.__table__)
@@ -0,0 +1,179 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import FrameType
+
+# Opt-in continuous profiling, started from the app lifespan
+SAMPLING_PROFILER_ENABLED = os.getenv("SAMPLING_PROFILER_ENABLED", "false").lower() == "true"
+SAMPLING_PROFILER_INTERVAL = float(os.getenv("SAMPLING_PROFILER_INTERVAL_MS", "10")) / 1000
+# Length of each continuous profile and how many of them are kept
+SAMPLING_PROFILER_WINDOW = float(os.getenv("SAMPLING_PROFILER_WINDOW", "60"))
+SAMPLING_PROFILER_HISTORY = int(os.getenv("SAMPLING_PROFILER_HISTORY", "30"))
+
+# Only stacks that pass through a route handler are sampled
+ROUTERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "routers") + os.sep
+MAX_DEPTH = 128
+
+
+@dataclass
+class Profile:
+    started_at: datetime
+    seconds: float = 0.0
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+
+    def collapsed(self) -> str:
+        """The stacks in the collapsed format of flamegraph.pl and speedscope, heaviest first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 10) -> dict:
+        return {
+            "started_at": self.started_at,
+            "seconds": round(self.seconds, 3),
+            "samples": self.samples,
+            "top": [{"stack": stack, "count": count} for stack, count in self.stacks.most_common(top)],
+        }
+
+
+@dataclass
+class _Capture:
+    profile: Profile
+    started: float
+
+
+def _label(frame: FrameType) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class SamplingProfiler:
+    """Samples the stacks of threads serving routes from a background thread.
+
+    Every `interval` the thread reads the current frame of every other thread
+    and keeps the stacks that run through a file under `roots` (the routers),
+    trimmed to start at the outermost such frame. Nothing is added to the
+    request path; the cost is the sampling thread itself, which only runs
+    while continuous profiling is on or a capture is open.
+
+    Continuous profiling closes a profile every `window` seconds into a ring
+    buffer of the last `history` profiles.
+    """
+
+    def __init__(
+        self,
+        interval: float = SAMPLING_PROFILER_INTERVAL,
+        window: float = SAMPLING_PROFILER_WINDOW,
+        history: int = SAMPLING_PROFILER_HISTORY,
+        roots: tuple[str, ...] = (ROUTERS_DIR,),
+    ):
+        self.interval = interval
+        self.window = window
+        self.roots = roots
+        self._recent: deque[Profile] = deque(maxlen=history)
+        self._captures: list[_Capture] = []
+        self._continuous: _Capture | None = None
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def _stack(self, frame: FrameType) -> str | None:
+        labels = []
+        root = None
+        while frame is not None and len(labels) < MAX_DEPTH:
+            labels.append(_label(frame))
+            if frame.f_code.co_filename.startswith(self.roots):
+                root = len(labels)
+            frame = frame.f_back
+        if root is None:
+            return None
+        return ";".join(reversed(labels[:root]))
+
+    def sample(self) -> list[str]:
+        """The collapsed stack of every thread currently inside a route."""
+        own = threading.get_ident()
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != own:
+                stack = self._stack(frame)
+                if stack is not None:
+                    stacks.append(stack)
+        return stacks
+
+    def _ensure_running(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            stacks = self.sample()
+            # Profiles are only changed under the lock, so once `end` or a
+            # window roll has taken one out it is never touched again
+            with self._lock:
+                captures = list(self._captures)
+                if self._continuous is not None:
+                    captures.append(self._continuous)
+                if not captures:
+                    self._thread = None
+                    return
+                for capture in captures:
+                    capture.profile.samples += 1
+                    capture.profile.stacks.update(stacks)
+            self._roll_window()
+            time.sleep(self.interval)
+
+    def _roll_window(self) -> None:
+        with self._lock:
+            continuous = self._continuous
+            if continuous is None or time.monotonic() - continuous.started < self.window:
+                return
+            continuous.profile.seconds = time.monotonic() - continuous.started
+            self._recent.append(continuous.profile)
+            self._continuous = _Capture(Profile(datetime.now()), time.monotonic())
+
+    def start(self) -> None:
+        """Profile continuously into the ring buffer until `stop`."""
+        with self._lock:
+            if self._continuous is None:
+                self._continuous = _Capture(Profile(datetime.now()), time.monotonic())
+            self._ensure_running()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._continuous = None
+
+    @property
+    def running(self) -> bool:
+        return self._continuous is not None
+
+    def begin(self) -> _Capture:
+        """Open a capture that collects samples until `end`."""
+        capture = _Capture(Profile(datetime.now()), time.monotonic())
+        with self._lock:
+            self._captures.append(capture)
+            self._ensure_running()
+        return capture
+
+    def end(self, capture: _Capture) -> Profile:
+        with self._lock:
+            self._captures.remove(capture)
+        capture.profile.seconds = time.monotonic() - capture.started
+        return capture.profile
+
+    def capture(self, seconds: float) -> Profile:
+        capture = self.begin()
+        try:
+            time.sleep(seconds)
+        finally:
+            profile = self.end(capture)
+        return profile
+
+    def recent(self) -> list[Profile]:
+        """Closed continuous profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._recent))
+
+
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,175 @@
+import csv
+import json
+import time
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import case
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models.location_info import LocationInfo, Timeslot
+from schemas.donation import ScheduleImportError, ScheduleImportResult
+from services.repository import upsert
+from services.stats import mark_stats_dirty
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+SCHEDULE_FORMATS = ("csv", "jsonl")
+LOCATION_FIELDS = ("name", "address", "opening_hours", "latitude", "longitude")
+
+# A schedule record is one timeslot with the fields of its location, or a
+# location without timeslots. Unreadable records come through as the error.
+ScheduleRecord = tuple[int, dict | ValueError]
+
+
+def read_csv_schedule(lines: Iterable[str]) -> Iterator[ScheduleRecord]:
+    """One timeslot per row, with the location columns repeated on every row."""
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield reader.line_num, record
+
+def read_jsonl_schedule(lines: Iterable[str]) -> Iterator[ScheduleRecord]:
+    """One location per line, as accepted by POST /donations/location."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            location = json.loads(line)
+            if not isinstance(location, dict):
+                raise ValueError("Expected a location object")
+            timeslots = location.pop("timeslots", None) or [{}]
+        except ValueError as e:
+            yield line_number, ValueError(str(e))
+            continue
+        for timeslot in timeslots:
+            yield line_number, {**location, **timeslot} if isinstance(timeslot, dict) else ValueError("Expected a timeslot object")
+
+SCHEDULE_READERS = {"csv": read_csv_schedule, "jsonl": read_jsonl_schedule}
+
+
+def _parse_location(record: dict) -> dict:
+    location = {}
+    for field in LOCATION_FIELDS:
+        value = record.get(field)
+        if value is None or not str(value).strip():
+            raise ValueError(f"Missing {field}")
+        location[field] = str(value).strip()
+    return location
+
+def _parse_timeslot(record: dict) -> dict | None:
+    if not record.get("start_time"):
+        return None
+    start_time = datetime.fromisoformat(record["start_time"])
+    end_time = datetime.fromisoformat(record["end_time"])
+    total_capacity = int(record["total_capacity"])
+    remaining = record.get("remaining_capacity")
+    remaining_capacity = total_capacity if remaining in (None, "") else int(remaining)
+    # the same rules as create_timeslots
+    if end_time <= start_time:
+        raise ValueError("Timeslot must end after it starts")
+    if not 0 <= remaining_capacity <= total_capacity:
+        raise ValueError("Remaining capacity must be between 0 and total capacity")
+    return {"start_time": start_time, "end_time": end_time, "total_capacity": total_capacity, "remaining_capacity": remaining_capacity}
+
+def _upsert_locations(db: Session, locations: list[dict]) -> dict[str, int]:
+    statement = upsert(db, LocationInfo)
+    locations_table = statement.table
+    statement = statement.on_conflict_do_update(
+        index_elements=[locations_table.c.name],
+        set_={field: statement.excluded[field] for field in LOCATION_FIELDS if field != "name"},
+    ).returning(locations_table.c.id, locations_table.c.name)
+    return {name: location_id for location_id, name in db.execute(statement, locations)}
+
+def _upsert_timeslots(db: Session, timeslots: list[dict]) -> None:
+    statement = upsert(db, Timeslot)
+    # an updated slot keeps the bookings already made
+    timeslots_table = statement.table
+    remaining = statement.excluded.total_capacity - (timeslots_table.c.total_capacity - timeslots_table.c.remaining_capacity)
+    statement = statement.on_conflict_do_update(
+        index_elements=[timeslots_table.c.location_id, timeslots_table.c.start_time],
+        set_={
+            "end_time": statement.excluded.end_time,
+            "total_capacity": statement.excluded.total_capacity,
+            "remaining_capacity": case((remaining < 0, 0), else_=remaining),
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+    db.execute(statement, timeslots)
+
+def import_schedule(db: Session, lines: Iterable[str], fmt: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> ScheduleImportResult:
+    """Upsert the locations and timeslots of a CSV or JSON Lines schedule.
+
+    Records are validated as they are read. Invalid ones are skipped and
+    reported, the valid ones are written in multi-row INSERT ... ON CONFLICT
+    chunks of `chunk_size` timeslots, so memory does not grow with the
+    schedule. Locations are matched by name, timeslots by location and start
+    time. Everything is committed in one transaction at the end.
+    """
+    if fmt not in SCHEDULE_READERS:
+        raise HTTPException(status_code=400, detail=f"Unknown schedule format {fmt}, expected one of {', '.join(SCHEDULE_FORMATS)}")
+
+    started = time.perf_counter()
+    location_ids: dict[str, int] = {}
+    pending_locations: dict[str, dict] = {}
+    # keyed by (location name, start time) so a chunk never upserts the same slot twice
+    pending_timeslots: dict[tuple[str, datetime], dict] = {}
+    days = set()
+    errors = []
+    rejected = 0
+    written = 0
+    updated_at = datetime.now()
+
+    def flush():
+        nonlocal written
+        if pending_locations:
+            location_ids.update(_upsert_locations(db, list(pending_locations.values())))
+            pending_locations.clear()
+        if pending_timeslots:
+            _upsert_timeslots(db, [
+                dict(timeslot, location_id=location_ids[name], updated_at=updated_at)
+                for (name, _), timeslot in pending_timeslots.items()
+            ])
+            written += len(pending_timeslots)
+            pending_timeslots.clear()
+
+    try:
+        for line, record in SCHEDULE_READERS[fmt](lines):
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+                # a location is validated and upserted the first time its name comes up
+                name = str(record.get("name") or "").strip()
+                if name not in location_ids and name not in pending_locations:
+                    pending_locations[name] = _parse_location(record)
+                timeslot = _parse_timeslot(record)
+            except (ValueError, TypeError, KeyError) as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    message = f"Missing {e.args[0]}" if isinstance(e, KeyError) else str(e)
+                    errors.append(ScheduleImportError(line=line, message=message))
+                continue
+
+            if timeslot is not None:
+                pending_timeslots[(name, timeslot["start_time"])] = timeslot
+                days.add(timeslot["start_time"].date())
+                if len(pending_timeslots) >= chunk_size:
+                    flush()
+        flush()
+        mark_stats_dirty(db, days)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    seconds = time.perf_counter() - started
+    return ScheduleImportResult(
+        locations=len(location_ids),
+        timeslots=written,
+        rejected=rejected,
+        errors=errors,
+        seconds=round(seconds, 3),
+        timeslots_per_second=round(written / seconds, 1) if seconds else 0.0,
+    )
@@ -0,0 +1,76 @@
+import importlib
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Connections opened before the first request, at most the pool size
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", "5"))
+
+
+class StartupTimings:
+    """Seconds spent in each import and warm-up phase, in the order they ran."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def import_module(self, name: str):
+        """Import `name` and record the time under "import <name>"; modules it pulls in first are counted with it."""
+        with self.phase(f"import {name}"):
+            return importlib.import_module(name)
+
+    def as_dict(self) -> dict:
+        phases = {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+        return {"phases_ms": phases, "total_ms": round(sum(self.phases.values()) * 1000, 1)}
+
+    def log(self) -> None:
+        report = self.as_dict()
+        breakdown = " ".join(f"{name.replace(' ', '_')}_ms={ms}" for name, ms in report["phases_ms"].items())
+        logger.info("startup total_ms=%s %s", report["total_ms"], breakdown)
+
+
+startup_timings = StartupTimings()
+
+
+def prefill_pool(engine, connections: int = WARMUP_POOL_CONNECTIONS) -> int:
+    """Open up to `connections` pooled connections at once and return them to the pool idle."""
+    if not isinstance(engine.pool, QueuePool) or connections <= 0:
+        return 0
+    opened = []
+    try:
+        for _ in range(min(connections, engine.pool.size())):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+def warm_up(app, engine, timings: StartupTimings = startup_timings) -> None:
+    """Pay the one-off costs that would otherwise land on the first requests."""
+    with timings.phase("configure mappers"):
+        configure_mappers()
+    with timings.phase("build openapi"):
+        app.openapi()
+    with timings.phase("prefill pool"):
+        try:
+            prefill_pool(engine)
+        except Exception as e:
+            # the pool fills on demand once the database is reachable
+            logger.warning("startup could not prefill the connection pool error=%s", e)
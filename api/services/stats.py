@@ -0,0 +1,353 @@
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import Iterable
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import select, insert, delete, func, literal, union_all, or_, and_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models.challenge import Challenge
+from models.challenge_user import ChallengeUser
+from models.donation import Donation, DonationArchive, DonationDailyStats
+from models.enums import DonationStatus
+from models.location_info import Timeslot
+from models.stats import ChallengeStats, StatsDirtyDay, TimeslotDailyStats
+from services.repository import upsert
+
+FETCH_CHUNK_SIZE = 10000
+# Advisory lock held by the transaction that rewrites the rollups, see `lock_rollups`
+STATS_LOCK_KEY = 0x5354415453
+
+
+def start_of(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+# --- Rollup maintenance ---
+
+def mark_stats_dirty(db: Session, moments: Iterable[datetime | date | None]) -> None:
+    """Queue the days of `moments` for the next `refresh_stats`, in the caller's transaction."""
+    days = {moment.date() if isinstance(moment, datetime) else moment for moment in moments if moment is not None}
+    if not days:
+        return
+    # a day queued by a concurrent transaction is skipped, not a key violation
+    statement = upsert(db, StatsDirtyDay)
+    db.execute(statement.on_conflict_do_nothing(index_elements=[statement.table.c.day]), [{"day": day} for day in sorted(days)])
+
+def lock_rollups(db: Session, wait: bool = True) -> bool:
+    """Serialize rollup rewrites between processes until the caller's transaction ends.
+
+    Refreshes delete and reinsert rollup rows by primary key, so two at once
+    would collide. On PostgreSQL a transaction-scoped advisory lock makes the
+    second wait; its statements then see what the first committed. Without
+    `wait` it returns False instead of waiting. SQLite already serializes
+    writers.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    if wait:
+        db.execute(select(func.pg_advisory_xact_lock(STATS_LOCK_KEY)))
+        return True
+    return bool(db.scalar(select(func.pg_try_advisory_xact_lock(STATS_LOCK_KEY))))
+
+def invalidate_challenge_stats(db: Session, challenge_id: int) -> None:
+    """Drop a challenge's rollup so the next refresh recomputes it, in the caller's transaction."""
+    db.execute(delete(ChallengeStats).where(ChallengeStats.challenge_id == challenge_id))
+
+def write_donation_stats(db: Session, since: date | None = None, until: date | None = None) -> int:
+    """Replace the `donation_daily_stats` rows for [since, until) from live and archived donations."""
+    sources = []
+    for model in (Donation, DonationArchive):
+        source = select(
+            func.date(model.appointment).label("day"),
+            func.coalesce(model.location_id, literal(0)).label("location_id"),
+            model.donation_type.label("donation_type"),
+            model.status.label("status"),
+            model.amount.label("amount"),
+        )
+        if since is not None:
+            source = source.where(model.appointment >= start_of(since))
+        if until is not None:
+            source = source.where(model.appointment < start_of(until))
+        sources.append(source)
+    donations = union_all(*sources).subquery()
+
+    stale = delete(DonationDailyStats)
+    if since is not None:
+        stale = stale.where(DonationDailyStats.day >= since)
+    if until is not None:
+        stale = stale.where(DonationDailyStats.day < until)
+    db.execute(stale)
+    return db.execute(
+        insert(DonationDailyStats).from_select(
+            ["day", "location_id", "donation_type", "status", "donations", "amount"],
+            select(
+                donations.c.day,
+                donations.c.location_id,
+                donations.c.donation_type,
+                donations.c.status,
+                func.count(),
+                func.coalesce(func.sum(donations.c.amount), 0.0),
+            ).group_by(donations.c.day, donations.c.location_id, donations.c.donation_type, donations.c.status),
+        )
+    ).rowcount
+
+def write_timeslot_stats(db: Session, since: date | None = None, until: date | None = None) -> int:
+    """Replace the `timeslot_daily_stats` rows for [since, until)."""
+    source = select(Timeslot)
+    stale = delete(TimeslotDailyStats)
+    if since is not None:
+        source = source.where(Timeslot.start_time >= start_of(since))
+        stale = stale.where(TimeslotDailyStats.day >= since)
+    if until is not None:
+        source = source.where(Timeslot.start_time < start_of(until))
+        stale = stale.where(TimeslotDailyStats.day < until)
+    timeslots = source.subquery()
+
+    db.execute(stale)
+    day = func.date(timeslots.c.start_time)
+    return db.execute(
+        insert(TimeslotDailyStats).from_select(
+            ["day", "location_id", "timeslots", "capacity", "booked"],
+            select(
+                day,
+                timeslots.c.location_id,
+                func.count(),
+                func.sum(timeslots.c.total_capacity),
+                func.sum(timeslots.c.total_capacity - timeslots.c.remaining_capacity),
+            ).where(timeslots.c.location_id.is_not(None)).group_by(day, timeslots.c.location_id),
+        )
+    ).rowcount
+
+def write_challenge_stats(db: Session, challenge_ids: Iterable[int]) -> int:
+    """Recompute the contributions of `challenge_ids` in one vectorized pass.
+
+    Contributions are the donation amounts of participants between the
+    challenge start and end, the same rule as `calculate_total_contributions`,
+    with archived donations included.
+    """
+    challenge_ids = sorted(set(challenge_ids))
+    if not challenge_ids:
+        return 0
+    ids, starts, ends = fetch_columns(
+        db,
+        select(Challenge.id, Challenge.start, Challenge.end).where(Challenge.id.in_(challenge_ids)).order_by(Challenge.id),
+        dtypes={"start": "datetime64[us]", "end": "datetime64[us]"},
+    )
+    if not len(ids):
+        return 0
+
+    sources = [
+        select(
+            ChallengeUser.challenge_id.label("challenge_id"),
+            model.appointment.label("appointment"),
+            func.coalesce(model.amount, 0.0).label("amount"),
+        )
+        .join(ChallengeUser, ChallengeUser.user_id == model.user_id)
+        .where(ChallengeUser.challenge_id.in_(ids.tolist()), model.appointment >= starts.min().tolist(), model.appointment <= ends.max().tolist())
+        for model in (Donation, DonationArchive)
+    ]
+    challenge_column, appointments, amounts = fetch_columns(
+        db, union_all(*sources), dtypes={"challenge_id": "int64", "appointment": "datetime64[us]", "amount": "float64"},
+    )
+
+    # each donation row is matched against the window of its own challenge
+    positions = np.searchsorted(ids, challenge_column)
+    in_window = (appointments >= starts[positions]) & (appointments <= ends[positions])
+    contributed = np.bincount(positions[in_window], weights=amounts[in_window], minlength=len(ids))
+
+    db.execute(delete(ChallengeStats).where(ChallengeStats.challenge_id.in_(ids.tolist())))
+    refreshed_at = datetime.now()
+    db.execute(insert(ChallengeStats), [
+        {"challenge_id": challenge_id, "contributed": total, "refreshed_at": refreshed_at}
+        for challenge_id, total in zip(ids.tolist(), contributed.tolist())
+    ])
+    return len(ids)
+
+def _day_ranges(days: list[date]) -> list[tuple[date, date]]:
+    """Collapse sorted days into [since, until) ranges of consecutive days."""
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day:
+            ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+        else:
+            ranges.append((day, day + timedelta(days=1)))
+    return ranges
+
+def _challenges_without_stats():
+    return select(Challenge.id).where(~select(ChallengeStats.challenge_id).where(ChallengeStats.challenge_id == Challenge.id).exists())
+
+def stats_stale(db: Session) -> bool:
+    """Whether a refresh has anything to do, checked without writing."""
+    return bool(db.scalar(select(or_(select(StatsDirtyDay.day).exists(), _challenges_without_stats().exists()))))
+
+def refresh_stats(db: Session, wait: bool = True) -> dict:
+    """Bring the rollups up to date with the writes since the last refresh.
+
+    Only queued days are recomputed, plus challenges whose window covers one
+    of them and challenges without a rollup row. The queued days are claimed
+    with one DELETE ... RETURNING before anything is recomputed: a write
+    committed after that queues its day again, so it is never dropped
+    unrefreshed. Without `wait` a refresh already running in another process
+    is not waited for and nothing is done.
+    """
+    try:
+        if not lock_rollups(db, wait):
+            db.rollback()
+            return {"days": 0, "challenges": 0}
+        days = sorted(db.scalars(delete(StatsDirtyDay).returning(StatsDirtyDay.day)))
+        for since, until in _day_ranges(days):
+            write_donation_stats(db, since, until)
+            write_timeslot_stats(db, since, until)
+
+        stale_challenges = _challenges_without_stats()
+        if days:
+            stale_challenges = select(Challenge.id).where(or_(
+                Challenge.id.in_(stale_challenges),
+                *[and_(Challenge.start < start_of(until), Challenge.end >= start_of(since)) for since, until in _day_ranges(days)],
+            ))
+        challenges = write_challenge_stats(db, db.scalars(stale_challenges))
+        db.commit()
+        return {"days": len(days), "challenges": challenges}
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def refresh_stale_stats(db: Session) -> dict | None:
+    """Refresh before a report is read, unless nothing is stale or another process is already refreshing.
+
+    Reads of fresh rollups stay read-only and never queue behind the lock.
+    """
+    if not stats_stale(db):
+        return None
+    return refresh_stats(db, wait=False)
+
+def rebuild_stats(db: Session) -> dict:
+    """Recompute every rollup from scratch."""
+    try:
+        lock_rollups(db)
+        donation_rows = write_donation_stats(db)
+        timeslot_rows = write_timeslot_stats(db)
+        db.execute(delete(StatsDirtyDay))
+        challenges = write_challenge_stats(db, db.scalars(select(Challenge.id)))
+        db.commit()
+        return {"donation_rows": donation_rows, "timeslot_rows": timeslot_rows, "challenges": challenges}
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+# --- Columnar reads ---
+
+def _to_array(values: list, dtype: str | None = None) -> np.ndarray:
+    if values and isinstance(values[0], Enum):
+        values = [value.value for value in values]
+    if dtype is None and values and isinstance(values[0], datetime):
+        dtype = "datetime64[us]"
+    return np.array(values, dtype=dtype)
+
+def fetch_columns(db: Session, statement, dtypes: dict[str, str] | None = None, chunk_size: int = FETCH_CHUNK_SIZE) -> list[np.ndarray]:
+    """Run `statement` on a server-side cursor and return one NumPy array per column.
+
+    Rows arrive `chunk_size` at a time and are transposed per chunk, so no
+    ORM objects or per-row dicts are built. `dtypes` overrides the inferred
+    dtype by column name, e.g. "datetime64[D]" for dates, which SQLite
+    returns as ISO strings.
+    """
+    dtypes = dtypes or {}
+    result = db.execute(statement.execution_options(stream_results=True, yield_per=chunk_size))
+    names = list(result.keys())
+    columns = [[] for _ in names]
+    for partition in result.partitions():
+        for name, column, values in zip(names, columns, zip(*partition)):
+            column.append(_to_array(list(values), dtypes.get(name)))
+    return [
+        np.concatenate(chunks) if chunks else np.array([], dtype=dtypes.get(name, "float64"))
+        for name, chunks in zip(names, columns)
+    ]
+
+def _date_filters(column, since: date | None, until: date | None) -> list:
+    filters = []
+    if since is not None:
+        filters.append(column >= since)
+    if until is not None:
+        filters.append(column < until)
+    return filters
+
+def _group(*keys: np.ndarray) -> tuple[list[np.ndarray], np.ndarray]:
+    """Unique key combinations and, for each input row, the index of its combination."""
+    if not len(keys[0]):
+        return [key[:0] for key in keys], np.array([], dtype=np.intp)
+    records = np.rec.fromarrays(keys)
+    unique, inverse = np.unique(records, return_inverse=True)
+    return [unique[name] for name in unique.dtype.names], inverse.reshape(-1)
+
+
+# --- Reports ---
+
+def donations_per_location_per_day(db: Session, since: date | None = None, until: date | None = None, location_id: int | None = None) -> list[dict]:
+    filters = _date_filters(DonationDailyStats.day, since, until)
+    if location_id is not None:
+        filters.append(DonationDailyStats.location_id == location_id)
+    days, locations, statuses, counts, amounts = fetch_columns(db, select(
+        DonationDailyStats.day, DonationDailyStats.location_id, DonationDailyStats.status, DonationDailyStats.donations, DonationDailyStats.amount,
+    ).where(*filters), dtypes={"day": "datetime64[D]", "location_id": "int64", "status": "U16", "donations": "int64", "amount": "float64"})
+
+    (group_days, group_locations), inverse = _group(days, locations)
+    completed = statuses == DonationStatus.COMPLETED.value
+    size = len(group_days)
+    totals = np.bincount(inverse, weights=counts, minlength=size)
+    completed_counts = np.bincount(inverse, weights=np.where(completed, counts, 0), minlength=size)
+    completed_amounts = np.bincount(inverse, weights=np.where(completed, amounts, 0.0), minlength=size)
+    return [
+        {"day": day, "location_id": location, "donations": int(total), "completed": int(done), "amount": amount}
+        for day, location, total, done, amount in zip(
+            group_days.tolist(), group_locations.tolist(), totals.tolist(), completed_counts.tolist(), completed_amounts.tolist()
+        )
+    ]
+
+def timeslot_fill_rates(db: Session, since: date | None = None, until: date | None = None, location_id: int | None = None) -> list[dict]:
+    filters = _date_filters(TimeslotDailyStats.day, since, until)
+    if location_id is not None:
+        filters.append(TimeslotDailyStats.location_id == location_id)
+    locations, timeslots, capacity, booked = fetch_columns(db, select(
+        TimeslotDailyStats.location_id, TimeslotDailyStats.timeslots, TimeslotDailyStats.capacity, TimeslotDailyStats.booked,
+    ).where(*filters), dtypes={"location_id": "int64", "timeslots": "int64", "capacity": "int64", "booked": "int64"})
+
+    (group_locations,), inverse = _group(locations)
+    size = len(group_locations)
+    slot_totals = np.bincount(inverse, weights=timeslots, minlength=size)
+    capacity_totals = np.bincount(inverse, weights=capacity, minlength=size)
+    booked_totals = np.bincount(inverse, weights=booked, minlength=size)
+    fill_rates = np.divide(booked_totals, capacity_totals, out=np.zeros(size), where=capacity_totals > 0)
+    return [
+        {"location_id": location, "timeslots": int(slots), "capacity": int(total), "booked": int(used), "fill_rate": round(rate, 4)}
+        for location, slots, total, used, rate in zip(
+            group_locations.tolist(), slot_totals.tolist(), capacity_totals.tolist(), booked_totals.tolist(), fill_rates.tolist()
+        )
+    ]
+
+def cancellation_rates(db: Session, since: date | None = None, until: date | None = None) -> dict:
+    statuses, counts = fetch_columns(db, select(DonationDailyStats.status, DonationDailyStats.donations).where(
+        *_date_filters(DonationDailyStats.day, since, until)
+    ), dtypes={"status": "U16", "donations": "int64"})
+    total = int(counts.sum())
+    by_status = {}
+    for status in DonationStatus:
+        count = int(counts[statuses == status.value].sum())
+        by_status[status.value] = {"count": count, "rate": round(count / total, 4) if total else 0.0}
+    return {"total": total, "by_status": by_status}
+
+def challenge_goal_attainment(db: Session) -> list[dict]:
+    ids, titles, goals, contributed = fetch_columns(db, select(
+        Challenge.id, Challenge.title, Challenge.goal, ChallengeStats.contributed,
+    ).join(ChallengeStats, ChallengeStats.challenge_id == Challenge.id).order_by(Challenge.id),
+        dtypes={"id": "int64", "title": "object", "goal": "float64", "contributed": "float64"})
+
+    attainment = np.divide(contributed, goals, out=np.zeros(len(goals)), where=goals > 0)
+    return [
+        {"challenge_id": challenge_id, "title": title, "goal": goal, "contributed": total, "attainment": round(rate, 4), "reached": bool(rate >= 1)}
+        for challenge_id, title, goal, total, rate in zip(ids.tolist(), titles.tolist(), goals.tolist(), contributed.tolist(), attainment.tolist())
+    ]
@@ -0,0 +1,202 @@
+import re
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from typing import Iterable, Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models.location_info import LocationInfo, Timeslot, TimeslotTemplate
+from schemas.donation import ScheduledTimeslot, TimeslotTemplateCreate
+from schemas.response import BatchItemResult
+from services.repository import get_or_404, upsert
+from services.stats import mark_stats_dirty
+
+# Longest window the expanded schedule can be requested for
+MAX_WINDOW = timedelta(days=92)
+
+# "9:00 AM - 5:00 PM", "09:00-17:00"
+OPENING_HOURS = re.compile(
+    r"^\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])?\s*[-–]\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])?\s*$"
+)
+
+
+def _clock(hour: str, minute: str, meridiem: str | None) -> time:
+    hour = int(hour)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.upper() == "PM" else 0)
+    return time(hour, int(minute))
+
+def parse_opening_hours(text: str) -> tuple[time, time] | None:
+    """The opening and closing time in `LocationInfo.opening_hours`, None when it has another shape."""
+    match = OPENING_HOURS.match(text or "")
+    if match is None:
+        return None
+    opens, closes = _clock(*match.group(1, 2, 3)), _clock(*match.group(4, 5, 6))
+    return (opens, closes) if opens < closes else None
+
+
+def expand_templates(templates: Iterable[TimeslotTemplate], since: datetime, until: datetime) -> Iterator[ScheduledTimeslot]:
+    """The slots `templates` produce with a start in [since, until), ordered by day."""
+    by_weekday = defaultdict(list)
+    for template in templates:
+        by_weekday[template.weekday].append(template)
+
+    day = since.date()
+    while datetime.combine(day, time()) < until:
+        for template in by_weekday.get(day.weekday(), ()):
+            if template.valid_from is not None and day < template.valid_from:
+                continue
+            if template.valid_until is not None and day > template.valid_until:
+                continue
+            step = timedelta(minutes=template.slot_minutes)
+            start = datetime.combine(day, template.start_time)
+            block_end = datetime.combine(day, template.end_time)
+            while start + step <= block_end:
+                if since <= start < until:
+                    yield ScheduledTimeslot(
+                        start_time=start, end_time=start + step, total_capacity=template.capacity,
+                        remaining_capacity=template.capacity, template_id=template.id,
+                    )
+                start += step
+        day += timedelta(days=1)
+
+
+def create_timeslot_templates(db: Session, location_id: int, templates: list[TimeslotTemplateCreate]) -> list[BatchItemResult]:
+    try:
+        get_or_404(db, LocationInfo, location_id, detail=f"Location not found with ID {location_id}")
+
+        results = []
+        created = []
+        for index, template in enumerate(templates):
+            if template.end_time <= template.start_time:
+                results.append(BatchItemResult(index=index, status=400, message="Template must end after it starts"))
+            elif template.valid_from and template.valid_until and template.valid_until < template.valid_from:
+                results.append(BatchItemResult(index=index, status=400, message="Template must be valid until after it is valid from"))
+            else:
+                new_template = TimeslotTemplate(location_id=location_id, **template.model_dump())
+                db.add(new_template)
+                created.append((index, new_template))
+        db.commit()
+        results.extend(BatchItemResult(index=index, status=200, id=template.id) for index, template in created)
+        results.sort(key=lambda result: result.index)
+        return results
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def get_timeslot_templates(db: Session, location_id: int) -> list[TimeslotTemplate]:
+    try:
+        return (
+            db.query(TimeslotTemplate)
+            .filter(TimeslotTemplate.location_id == location_id)
+            .order_by(TimeslotTemplate.weekday, TimeslotTemplate.start_time)
+            .all()
+        )
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def delete_timeslot_template(db: Session, location_id: int, template_id: int) -> None:
+    """Remove a template. Slots it produced that were already booked stay."""
+    try:
+        template = db.get(TimeslotTemplate, template_id)
+        if template is None or template.location_id != location_id:
+            raise HTTPException(status_code=404, detail=f"Template not found with ID {template_id}")
+        db.delete(template)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def get_scheduled_timeslots(db: Session, location_id: int, since: datetime, until: datetime) -> list[ScheduledTimeslot]:
+    """Every slot of a location starting in [since, until), booked or not.
+
+    Stored timeslots come from one range query on (location_id, start_time),
+    the rest is expanded from the location's templates. A stored slot takes
+    the place of the template slot with the same start.
+    """
+    if until <= since or until - since > MAX_WINDOW:
+        raise HTTPException(status_code=400, detail=f"The window must end after it starts and span at most {MAX_WINDOW.days} days")
+    try:
+        stored = (
+            db.query(Timeslot)
+            .filter(Timeslot.location_id == location_id, Timeslot.start_time >= since, Timeslot.start_time < until)
+            .all()
+        )
+        templates = db.query(TimeslotTemplate).filter(TimeslotTemplate.location_id == location_id).all()
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    slots = {slot.start_time: slot for slot in expand_templates(templates, since, until)}
+    for timeslot in stored:
+        slot = ScheduledTimeslot.model_validate(timeslot)
+        slot.template_id = getattr(slots.get(timeslot.start_time), "template_id", None)
+        slots[timeslot.start_time] = slot
+    return sorted(slots.values(), key=lambda slot: slot.start_time)
+
+def book_timeslot(db: Session, location_id: int, start_time: datetime) -> Timeslot:
+    """Take one place in the slot starting at `start_time`.
+
+    A template slot is stored as a `Timeslot` on its first booking. The
+    capacity is taken with a conditional UPDATE, so concurrent bookings
+    cannot overbook.
+    """
+    try:
+        get_or_404(db, LocationInfo, location_id, detail=f"Location not found with ID {location_id}")
+        slot_filter = (Timeslot.location_id == location_id, Timeslot.start_time == start_time)
+        if db.query(Timeslot.id).filter(*slot_filter).first() is None:
+            templates = (
+                db.query(TimeslotTemplate)
+                .filter(TimeslotTemplate.location_id == location_id, TimeslotTemplate.weekday == start_time.weekday())
+                .all()
+            )
+            slot = next(expand_templates(templates, start_time, start_time + timedelta(microseconds=1)), None)
+            if slot is None:
+                raise HTTPException(status_code=404, detail=f"No timeslot at {start_time.isoformat()} for location with ID {location_id}")
+            statement = upsert(db, Timeslot)
+            db.execute(statement.on_conflict_do_nothing(index_elements=[statement.table.c.location_id, statement.table.c.start_time]), [dict(
+                location_id=location_id, start_time=slot.start_time, end_time=slot.end_time, total_capacity=slot.total_capacity,
+                remaining_capacity=slot.remaining_capacity, updated_at=datetime.now(),
+            )])
+
+        booked = db.execute(
+            update(Timeslot)
+            .where(*slot_filter, Timeslot.remaining_capacity > 0)
+            .values(remaining_capacity=Timeslot.remaining_capacity - 1)
+            .returning(Timeslot.id)
+        ).scalar()
+        if booked is None:
+            raise HTTPException(status_code=409, detail=f"Timeslot at {start_time.isoformat()} is fully booked")
+        mark_stats_dirty(db, [start_time])
+        db.commit()
+        return db.get(Timeslot, booked, populate_existing=True)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def templates_from_opening_hours(db: Session, slot_minutes: int, capacity: int, weekdays: Iterable[int] = range(5)) -> int:
+    """Give every location without templates one per weekday from its opening hours.
+
+    Returns the number of templates created. Locations whose opening hours
+    cannot be parsed are left alone.
+    """
+    try:
+        created = 0
+        locations = db.query(LocationInfo).filter(~LocationInfo.templates.any()).all()
+        for location in locations:
+            hours = parse_opening_hours(location.opening_hours)
+            if hours is None:
+                continue
+            for weekday in weekdays:
+                db.add(TimeslotTemplate(
+                    location_id=location.id, weekday=weekday, start_time=hours[0], end_time=hours[1],
+                    slot_minutes=slot_minutes, capacity=capacity,
+                ))
+                created += 1
+        db.commit()
+        return created
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
@@ -2,16 +2,22 @@ from datetime import datetime, timezone
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import or_
+from sqlalchemy import select, union_all, update
 from models.user import User
 from models.friend import Friend
 from models.enums import FriendshipStatus
 from schemas.user import UserCreate, UserUpdate
 from schemas.notification import NotificationCreate, NotificationResponse
 from models.notification import Notification
+from services.outbox import add_event, outbox_relay
+from services.pagination import paginate
+from services.repository import get_or_404, get_many
+from services.leaderboard import leaderboards
+from services.recall import donor_index
+from services.challenge_leaderboard import challenge_leaderboards
 
 def check_user_exists(db: Session, user_id: int) -> bool:
-    return db.query(User).filter(User.id == user_id).first() is not None
+    return db.get(User, user_id) is not None
 
 def check_user_exists_by_username(db: Session, username: str) -> bool:
     return db.query(User).filter(User.username == username).first() is not None
@@ -42,17 +48,25 @@ def create_user(db: Session, user: UserCreate) -> User:
         db.add(new_user)
         db.commit()
         db.refresh(new_user)
+        leaderboards.update(new_user.id, new_user.city, new_user.total_points)
+        donor_index.invalidate()
         return new_user
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=e) from e
 
-def get_user_by_id(db: Session, user_id: int) -> User:
+def get_user_by_id(db: Session, user_id: int, options=()) -> User:
     try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
-        return user
+        return get_or_404(db, User, user_id, options=options)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=e) from e
+
+def get_users_by_ids(db: Session, user_ids: list[int], options=()) -> list[User]:
+    try:
+        users = get_many(db, User, user_ids, options=options)
+        if not users:
+            raise HTTPException(status_code=404, detail=f"Users not found with IDs {user_ids}")
+        return users
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
 
@@ -65,9 +79,9 @@ def get_user_by_email_and_password(db: Session, email: str, password: str) -> Us
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
 
-def get_users_by_partial_username(db: Session, username: str) -> list[User]:
+def get_users_by_partial_username(db: Session, username: str, options=()) -> list[User]:
     try:
-        users = db.query(User).filter(User.username.contains(username)).all()
+        users = db.query(User).options(*options).filter(User.username.contains(username)).all()
         if not users:
             raise HTTPException(status_code=404, detail=f"Users not found with partial username {username}")
         return users
@@ -76,14 +90,14 @@ def get_users_by_partial_username(db: Session, username: str) -> list[User]:
 
 def update_user(db: Session, user_id: int, user_partial: UserUpdate) -> User:
     try:
-        if not check_user_exists(db, user_id):
-            raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
-        user = get_user_by_id(db, user_id)
+        user = get_or_404(db, User, user_id)
         user_data = user_partial.dict(exclude_unset=True)
         for key, value in user_data.items():
             setattr(user, key, value)
         db.commit()
         db.refresh(user)
+        leaderboards.update(user.id, user.city, user.total_points)
+        donor_index.invalidate()
         return user
     except SQLAlchemyError as e:
         db.rollback()
@@ -94,14 +108,17 @@ def delete_user(db: Session, user_id: int) -> None:
         user = get_user_by_id(db, user_id)
         db.delete(user)
         db.commit()
+        leaderboards.remove(user_id)
+        donor_index.invalidate()
+        # the user's challenge memberships went with them
+        challenge_leaderboards.invalidate()
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=e) from e
 
 def send_friend_request(db: Session, user_id: int, friend_id: int) -> Friend:
     try:
-        if not check_user_exists(db, friend_id):
-            raise HTTPException(status_code=404, detail=f"User not found with ID {friend_id}")
+        get_or_404(db, User, friend_id)
         new_friend = Friend(sender_id=user_id, receiver_id=friend_id)
         db.add(new_friend)
         db.commit()
@@ -117,6 +134,7 @@ def edit_friend_request(db: Session, user_id: int, friend_id: int, status: Frien
         if not request:
             raise HTTPException(status_code=404, detail=f"Friend request not found with IDs {user_id} and {friend_id}")
         request.status = status
+        add_event(db, "friend_request.updated", {"sender_id": user_id, "receiver_id": friend_id, "status": status})
         db.commit()
         db.refresh(request)
         return request
@@ -124,24 +142,52 @@ def edit_friend_request(db: Session, user_id: int, friend_id: int, status: Frien
         db.rollback()
         raise HTTPException(status_code=500, detail=e) from e
 
+def notify_friend_request_accepted(db: Session, event: dict) -> None:
+    """Outbox handler: tell the sender their friend request was accepted."""
+    payload = event["payload"]
+    if payload["status"] != FriendshipStatus.ACCEPTED:
+        return
+    receiver = db.get(User, payload["receiver_id"])
+    if receiver is None:
+        return
+    db.add(Notification(
+        title="Friend request accepted",
+        content=f"{receiver.username} accepted your friend request",
+        user_id=payload["sender_id"],
+    ))
+
+outbox_relay.subscribe("friend_request.updated", notify_friend_request_accepted)
+
+def accepted_friend_ids(user_id: int):
+    """IDs of the accepted friends of `user_id`, as a subquery.
+
+    One branch per side of the friendship, so each is served by an index:
+    the primary key for sent requests, ix_friends_receiver_id_status for
+    received ones.
+    """
+    return union_all(
+        select(Friend.receiver_id).where(Friend.sender_id == user_id, Friend.status == FriendshipStatus.ACCEPTED),
+        select(Friend.sender_id).where(Friend.receiver_id == user_id, Friend.status == FriendshipStatus.ACCEPTED),
+    )
+
 def get_friends(db: Session, user_id: int) -> list[User]:
     try:
-        friends = db.query(Friend).filter(
-            or_(Friend.sender_id == user_id, Friend.receiver_id == user_id),
-            Friend.status == FriendshipStatus.ACCEPTED
-        ).all()
+        friends = db.scalars(select(User).where(User.id.in_(accepted_friend_ids(user_id))).order_by(User.id)).all()
         if not friends:
             raise HTTPException(status_code=404, detail=f"Friends not found for user with ID {user_id}")
-        output = list()
-        for friend in friends:
-            if friend.sender_id == user_id:
-                output.append(friend.receiver)
-            else:
-                output.append(friend.sender)
-        return output
+        return friends
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
 
+def get_friends_page(db: Session, user_id: int, limit: int, cursor: str | None = None) -> tuple[list[User], str | None]:
+    """One page of a user's friends in user ID order, with the cursor of the next page."""
+    try:
+        get_or_404(db, User, user_id)
+        query = select(User).where(User.id.in_(accepted_friend_ids(user_id)))
+        return paginate(db, query, (User.id,), limit, cursor)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 def get_friend_requests(db: Session, user_id: int) -> list[Friend]:
     try:
         requests = db.query(Friend).filter(Friend.receiver_id == user_id, Friend.status == FriendshipStatus.PENDING).all()
@@ -174,8 +220,7 @@ def delete_friend(db: Session, user_id: int, friend_id: int) -> None:
 
 def create_notification(db: Session, notification: NotificationCreate) -> Notification:
     try:
-        if not check_user_exists(db, notification.user_id):
-            raise HTTPException(status_code=404, detail=f"User not found with ID {notification.user_id}")
+        get_or_404(db, User, notification.user_id)
         new_notification = Notification(
             title=notification.title,
             content=notification.content,
@@ -191,8 +236,7 @@ def create_notification(db: Session, notification: NotificationCreate) -> Notifi
     
 def get_notifications(db: Session, user_id: int) -> list[Notification]:
     try:
-        if not check_user_exists(db, user_id):
-            raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+        get_or_404(db, User, user_id)
         notifications = db.query(Notification).filter(Notification.user_id == user_id).all()
         if not notifications:
             raise HTTPException(status_code=404, detail=f"Notifications not found for user with ID {user_id}")
@@ -200,14 +244,40 @@ def get_notifications(db: Session, user_id: int) -> list[Notification]:
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=e) from e
     
-def get_new_notifications(db: Session, user_id: int) -> list[Notification]:
+def get_notifications_page(db: Session, user_id: int, limit: int, cursor: str | None = None) -> tuple[list[Notification], str | None]:
+    """One page of a user's notifications, newest first, with the cursor of the next page.
+
+    Pages by ID, which follows creation order; `created_at` may be null.
+    """
+    try:
+        get_or_404(db, User, user_id)
+        query = select(Notification).where(Notification.user_id == user_id)
+        return paginate(db, query, (Notification.id,), limit, cursor, descending=True)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def find_new_notifications(db: Session, user_id: int) -> list[Notification]:
+    """The user's notifications that were not retrieved yet, left unretrieved."""
     try:
-        if not check_user_exists(db, user_id):
-            raise HTTPException(status_code=404, detail=f"User not found with ID {user_id}")
+        get_or_404(db, User, user_id)
         notifications = db.query(Notification).filter(Notification.user_id == user_id, Notification.retrieved == False).all()
         if not notifications:
             raise HTTPException(status_code=404, detail=f"New notifications not found for user with ID {user_id}")
-        
+        return notifications
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def mark_notifications_retrieved(db: Session, notification_ids: list[int]) -> None:
+    try:
+        db.execute(update(Notification).where(Notification.id.in_(notification_ids)).values(retrieved=True))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+def get_new_notifications(db: Session, user_id: int) -> list[Notification]:
+    notifications = find_new_notifications(db, user_id)
+    try:
         for notification in notifications:
             notification.retrieved = True
         db.commit()
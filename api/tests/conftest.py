@@ -0,0 +1,45 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from main import app  # noqa: F401 - registers every model on Base.metadata
+from database import Base
+from models.user import User
+
+
+@pytest.fixture
+def db():
+    """Session on a private in-memory SQLite database seeded with three users.
+
+    Every statement sent to the database is recorded in `db.statements`, so
+    tests can pin the number of queries a service issues.
+    """
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    for user_id in (1, 2, 3):
+        session.add(User(
+            id=user_id,
+            first_name="Test",
+            last_name=f"User {user_id}",
+            username=f"user_{user_id}",
+            email=f"user_{user_id}@example.com",
+            password="secure_password",
+            birthdate=datetime(2000, 1, 1),
+            city="Test City",
+        ))
+    session.commit()
+    session.expunge_all()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session.statements = statements
+    yield session
+    session.close()
+    engine.dispose()
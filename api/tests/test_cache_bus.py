@@ -0,0 +1,164 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from main import app  # noqa: F401 - subscribes every cache on the bus
+from models.challenge import Challenge
+from models.location_info import LocationInfo
+from models.user import User
+from services.cache_bus import CacheBus, cache_bus
+from services.challenge import add_user_to_challenge
+from services.challenge_leaderboard import challenge_leaderboards, get_challenge_leaderboard
+from services.leaderboard import leaderboards
+from services.donation import _summary_cache, invalidate_donation_summary
+
+START = datetime(2024, 3, 1)
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    cache_bus.reset_all()
+    yield
+    cache_bus.stop()
+    cache_bus.reset_all()
+
+
+def connect(sender: CacheBus, receiver: CacheBus):
+    """Deliver what `sender` publishes to `receiver`, as NOTIFY would between two workers."""
+    sender.start_sending(receiver.receive)
+
+
+# --- Cache Bus Tests ---
+# Test that published changes run the handler of the other process
+def test_cache_bus_delivers_changes():
+    sender, receiver = CacheBus(), CacheBus()
+    received = []
+    receiver.subscribe("users", lambda *user_ids: received.append(user_ids), reset=lambda: received.append("reset"))
+    connect(sender, receiver)
+    sender.publish("users", 1, 2)
+    sender.publish("users", 3)
+    sender.publish("unknown", 4)
+    sender.stop()
+    assert received == [(1, 2), (3,)]
+
+# Test that a process ignores its own changes
+def test_cache_bus_ignores_own_changes():
+    bus = CacheBus()
+    received = []
+    bus.subscribe("users", lambda *user_ids: received.append(user_ids), reset=lambda: None)
+    connect(bus, bus)
+    bus.publish("users", 1)
+    bus.stop()
+    assert received == []
+
+# Test that a failed send is tried again
+@patch("services.cache_bus.RETRY_DELAY", 0)
+def test_cache_bus_retries_failed_send():
+    sender, receiver = CacheBus(), CacheBus()
+    received, attempts = [], []
+    receiver.subscribe("users", lambda *user_ids: received.append(user_ids), reset=lambda: received.append("reset"))
+
+    def send(payload):
+        attempts.append(payload)
+        if len(attempts) == 1:
+            raise ConnectionError("connection lost")
+        receiver.receive(payload)
+
+    sender.start_sending(send)
+    sender.publish("users", 1)
+    sender.stop()
+    assert len(attempts) == 2
+    assert received == [(1,)]
+
+# Test that a change that cannot be sent resets the cache in the other processes instead
+@patch("services.cache_bus.RETRY_DELAY", 0)
+def test_cache_bus_resets_after_lost_change():
+    sender, receiver = CacheBus(), CacheBus()
+    received, attempts, reset = [], [], threading.Event()
+    receiver.subscribe("users", lambda *user_ids: received.append(user_ids), reset=reset.set)
+
+    def send(payload):
+        attempts.append(payload)
+        if len(attempts) <= 3:
+            raise ConnectionError("connection lost")
+        receiver.receive(payload)
+
+    sender.start_sending(send)
+    sender.publish("users", 1)
+    assert reset.wait(5)
+    sender.stop()
+    assert received == []
+    assert json.loads(attempts[-1])["messages"] == [{"cache": "users", "reset": True}]
+
+# Test that changes are batched into payloads that fit NOTIFY and oversized ones reset the cache
+def test_cache_bus_payloads():
+    bus = CacheBus()
+    payloads = bus._payloads([{"cache": "users", "args": list(range(i, i + 500))} for i in range(10)] + [{"cache": "users", "args": list(range(5000))}])
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) < 8000 for payload in payloads)
+    messages = [message for payload in payloads for message in json.loads(payload)["messages"]]
+    assert len(messages) == 11
+    assert messages[-1] == {"cache": "users", "reset": True}
+
+# Test that cache writes are published
+def test_cache_bus_publishes_cache_writes():
+    sent = []
+    cache_bus.start_sending(sent.append)
+    invalidate_donation_summary(1, 2)
+    cache_bus.stop()
+    assert json.loads(sent[0])["messages"] == [{"cache": "donation_summary", "args": [1, 2]}]
+
+# Test that changes from another process reach the donation summaries
+def test_cache_bus_drops_donation_summaries():
+    summary = object()
+    for user_id in (1, 2):
+        _summary_cache.put(user_id, summary, _summary_cache.begin())
+    other = CacheBus()
+    connect(other, cache_bus)
+    other.publish("donation_summary", 1)
+    other.stop()
+    assert _summary_cache.get(1) is None and _summary_cache.get(2) is summary
+
+# Test that a donation in another process moves the loaded leaderboard without reloading it
+def test_cache_bus_updates_challenge_leaderboard(db):
+    db.add(LocationInfo(id=1, name="Utrecht", address="Plesmanlaan 125, Utrecht", opening_hours="9:00 AM - 5:00 PM", latitude="52.0907", longitude="5.1214"))
+    db.add(Challenge(id=1, title="March", description="Donate in March", location="Utrecht", goal=1000.0, start=START, end=START + timedelta(days=30)))
+    db.commit()
+    for user_id in (1, 2, 3):
+        add_user_to_challenge(db, 1, user_id)
+    get_challenge_leaderboard(db, 1)
+
+    other = CacheBus()
+    connect(other, cache_bus)
+    other.publish("challenge_leaderboard.donations", [[3, (START + timedelta(days=1)).isoformat(), 800.0]])
+    other.stop()
+
+    db.statements.clear()
+    top = get_challenge_leaderboard(db, 1)["top"][0]
+    assert (top.user_id, top.contributed) == (3, 800.0)
+    assert not any("GROUP BY challenge_users.user_id" in statement for statement in db.statements)
+    challenge_leaderboards.invalidate()
+
+# Test that a points change in another process is read back from the database, whatever the order of the changes
+def test_cache_bus_reloads_points_leaderboard(db):
+    leaderboards.global_board(db)
+    db.query(User).filter(User.id == 1).update({"total_points": 500})
+    db.query(User).filter(User.id == 3).delete()
+    db.commit()
+
+    other = CacheBus()
+    # Delivered on this thread, since the SQLite session cannot move to the sender's
+    payload, = other._payloads([{"cache": "points_leaderboard.update", "args": [user_id]} for user_id in (1, 3)])
+    with patch.object(leaderboards, "_session_factory", lambda: db):
+        cache_bus.receive(payload)
+
+    board = leaderboards.global_board(db)
+    assert (board.points(1), board.points(3), len(board)) == (500, None, 2)
+    leaderboards.reset()
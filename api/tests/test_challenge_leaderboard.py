@@ -0,0 +1,154 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from models.challenge import Challenge
+from models.donation import DonationArchive
+from models.enums import DonationStatus, DonationType
+from models.location_info import LocationInfo
+from schemas.donation import DonationBase, DonationCreate
+from services.challenge import add_user_to_challenge, calculate_total_contributions, delete_user_from_challenge
+from services.challenge_leaderboard import ContributionBoard, challenge_leaderboards, get_challenge_leaderboard
+from services.donation import create_donation, create_donations, delete_donation, update_donation
+
+client = TestClient(app)
+
+START = datetime(2024, 3, 1)
+
+
+@pytest.fixture(autouse=True)
+def reset_challenge_leaderboards():
+    challenge_leaderboards.invalidate()
+    yield
+    challenge_leaderboards.invalidate()
+
+
+def seed_challenge(db):
+    db.add(LocationInfo(id=1, name="Utrecht", address="Plesmanlaan 125, Utrecht", opening_hours="9:00 AM - 5:00 PM", latitude="52.0907", longitude="5.1214"))
+    db.add(Challenge(id=1, title="March", description="Donate in March", location="Utrecht", goal=1000.0, start=START, end=START + timedelta(days=30)))
+    db.commit()
+    for user_id in (1, 2, 3):
+        add_user_to_challenge(db, 1, user_id)
+
+def donate(db, user_id, amount, days=1):
+    return create_donation(db, DonationCreate(
+        amount=amount, user_id=user_id, location_id=1, donation_type=DonationType.BLOOD,
+        appointment=START + timedelta(days=days), status=DonationStatus.COMPLETED, enable_joining=False,
+    ))
+
+def ranking(db, **kwargs):
+    return [(entry.rank, entry.user_id, entry.contributed) for entry in get_challenge_leaderboard(db, 1, **kwargs)["top"]]
+
+
+# --- Challenge Leaderboard Tests ---
+# Test the around view on a contribution board
+def test_contribution_board_around():
+    board = ContributionBoard()
+    for user_id in range(1, 11):
+        board.set(user_id, user_id * 100.0)
+    assert [entry.user_id for entry in board.around(5, 2)] == [7, 6, 5, 4, 3]
+    assert [entry.rank for entry in board.around(10, 1)] == [1, 2]
+    assert board.around(11, 2) is None
+
+# Test that totals come from one grouped query and only count the challenge window
+def test_challenge_leaderboard_loads_contributions(db):
+    seed_challenge(db)
+    donate(db, 1, 500.0)
+    donate(db, 2, 300.0)
+    donate(db, 2, 400.0)
+    donate(db, 3, 900.0, days=-5)
+
+    db.statements.clear()
+    assert ranking(db) == [(1, 2, 700.0), (2, 1, 500.0), (3, 3, 0.0)]
+    assert sum("GROUP BY challenge_users.user_id" in statement for statement in db.statements) == 1
+
+# Test that archived donations count towards the challenge total and the board alike
+def test_challenge_contributions_include_archive(db):
+    seed_challenge(db)
+    donate(db, 1, 500.0)
+    db.add(DonationArchive(id=100, user_id=2, location_id=1, donation_type=DonationType.BLOOD, amount=300.0, appointment=START + timedelta(days=2), status=DonationStatus.COMPLETED))
+    db.add(DonationArchive(id=101, user_id=3, location_id=1, donation_type=DonationType.BLOOD, amount=900.0, appointment=START - timedelta(days=5), status=DonationStatus.COMPLETED))
+    db.commit()
+
+    assert calculate_total_contributions(db, 1, START, START + timedelta(days=30)) == 800.0
+    assert ranking(db) == [(1, 1, 500.0), (2, 2, 300.0), (3, 3, 0.0)]
+
+# Test that donation writes move a loaded board without reloading it
+def test_challenge_leaderboard_follows_donation_writes(db):
+    seed_challenge(db)
+    donate(db, 1, 500.0)
+    assert ranking(db)[0][1] == 1
+
+    db.statements.clear()
+    donation = donate(db, 3, 600.0)
+    assert ranking(db)[0] == (1, 3, 600.0)
+    update_donation(db, donation.id, DonationBase(
+        amount=100.0, user_id=3, location_id=1, donation_type=DonationType.BLOOD,
+        appointment=START + timedelta(days=2), status=DonationStatus.COMPLETED, enable_joining=False,
+    ))
+    assert ranking(db)[:2] == [(1, 1, 500.0), (2, 3, 100.0)]
+    delete_donation(db, donation.id)
+    assert ranking(db) == [(1, 1, 500.0), (2, 2, 0.0), (3, 3, 0.0)]
+    assert not any("GROUP BY challenge_users.user_id" in statement for statement in db.statements)
+
+# Test that a batch with offset-aware appointments moves a loaded board
+def test_challenge_leaderboard_follows_batch_with_offsets(db):
+    seed_challenge(db)
+    donate(db, 1, 500.0)
+    assert ranking(db)[0] == (1, 1, 500.0)
+
+    create_donations(db, [DonationCreate(
+        amount=500.0, user_id=1, location_id=1, donation_type=DonationType.BLOOD,
+        appointment="2024-03-02T10:00:00Z", status=DonationStatus.COMPLETED, enable_joining=False,
+    )])
+    assert ranking(db)[0] == (1, 1, 1000.0)
+
+# Test that a failing board update drops the boards instead of failing the write
+def test_challenge_leaderboard_update_failure(db):
+    seed_challenge(db)
+    donate(db, 1, 500.0)
+    ranking(db)
+    with patch.object(challenge_leaderboards, "_apply_donations", side_effect=TypeError("boom")):
+        donate(db, 1, 200.0)
+    db.statements.clear()
+    assert ranking(db)[0] == (1, 1, 700.0)
+    assert any("GROUP BY challenge_users.user_id" in statement for statement in db.statements)
+
+# Test the around_user view and membership changes
+def test_challenge_leaderboard_around_user(db):
+    seed_challenge(db)
+    donate(db, 1, 500.0)
+    donate(db, 2, 300.0)
+    leaderboard = get_challenge_leaderboard(db, 1, top=1, around_user=2, radius=1)
+    assert [entry.user_id for entry in leaderboard["around"]] == [1, 2, 3]
+    assert leaderboard["size"] == 3
+
+    delete_user_from_challenge(db, 1, 1)
+    assert get_challenge_leaderboard(db, 1, around_user=1)["around"] is None
+    assert ranking(db)[0] == (1, 2, 300.0)
+
+
+# --- Challenge Leaderboard Routes Tests ---
+# Test for retrieving a challenge leaderboard
+@patch("routers.challenges.get_or_404")
+@patch("routers.challenges.get_challenge_leaderboard", return_value={"top": [{"rank": 1, "user_id": 2, "contributed": 700.0}], "around": None, "size": 1})
+def test_get_challenge_leaderboard_route(get_challenge_leaderboard, get_or_404):
+    response = client.get("/challenges/1/leaderboard?top=5&around_user=2")
+    assert response.status_code == 200
+    assert response.json()["data"]["top"][0]["contributed"] == 700.0
+    assert get_challenge_leaderboard.call_args.kwargs == {"top": 5, "around_user": 2, "radius": 2}
+
+# Test for retrieving a challenge leaderboard service error
+@patch("routers.challenges.get_or_404")
+@patch("routers.challenges.get_challenge_leaderboard", side_effect=Exception("Test Exception"))
+def test_get_challenge_leaderboard_route_service_error(get_challenge_leaderboard, get_or_404):
+    response = client.get("/challenges/1/leaderboard")
+    assert response.status_code == 500
+    assert "An error occurred while retrieving the leaderboard" in response.json()["detail"]
@@ -0,0 +1,126 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import datetime, timedelta
+
+from models.challenge import Challenge
+from models.challenge_user import ChallengeUser
+from models.enums import ChallengeStatus, DonationStatus, DonationType
+from models.location_info import LocationInfo
+from models.points import PointsTransaction
+from models.user import User
+from schemas.challenge import ChallengeUpdate
+from schemas.donation import DonationCreate
+from services.challenge import add_user_to_challenge, delete_user_from_challenge, update_challenge
+from services.challenge_scheduler import ChallengeScheduler, initial_status
+from services.donation import create_donation
+
+START = (datetime.now() + timedelta(days=1)).replace(microsecond=0)
+END = START + timedelta(days=30)
+
+
+def seed_challenge(db, goal=1000.0):
+    db.add(LocationInfo(id=1, name="Utrecht", address="Plesmanlaan 125, Utrecht", opening_hours="9:00 AM - 5:00 PM", latitude="52.0907", longitude="5.1214"))
+    db.add(Challenge(id=1, title="Spring", description="Donate this month", location="Utrecht", goal=goal, start=START, end=END, reward_points=50))
+    db.commit()
+    for user_id in (1, 2, 3):
+        add_user_to_challenge(db, 1, user_id)
+
+def donate(db, user_id, amount):
+    return create_donation(db, DonationCreate(
+        amount=amount, user_id=user_id, location_id=1, donation_type=DonationType.BLOOD,
+        appointment=START + timedelta(days=2), status=DonationStatus.COMPLETED, enable_joining=False,
+    ))
+
+def statuses(db):
+    db.expire_all()
+    return {row.user_id: row.status for row in db.query(ChallengeUser).filter(ChallengeUser.challenge_id == 1)}
+
+def points(db):
+    db.expire_all()
+    return {user.id: user.total_points for user in db.query(User).order_by(User.id)}
+
+
+# --- Challenge Scheduler Tests ---
+# Test the status a participant starts in
+def test_initial_status():
+    challenge = Challenge(start=START, end=END)
+    assert initial_status(challenge, START - timedelta(seconds=1)) == ChallengeStatus.PENDING
+    assert initial_status(challenge, START) == ChallengeStatus.ACTIVE
+    assert initial_status(challenge, END) == ChallengeStatus.COMPLETED
+
+# Test that a start moves every pending participant with one UPDATE
+def test_scheduler_activates_at_start(db):
+    seed_challenge(db)
+    scheduler = ChallengeScheduler()
+    assert set(statuses(db).values()) == {ChallengeStatus.PENDING}
+
+    assert scheduler.run_due(db, START - timedelta(minutes=1)).activated == 0
+    assert scheduler.next_deadline() == START
+
+    db.statements.clear()
+    assert scheduler.run_due(db, START).activated == 3
+    assert sum(statement.startswith("UPDATE challenge_users") for statement in db.statements) == 1
+    assert set(statuses(db).values()) == {ChallengeStatus.ACTIVE}
+    assert scheduler.next_deadline() == END
+
+# Test that a reached goal completes the challenge early and pays the reward once
+def test_scheduler_rewards_reached_goal(db):
+    seed_challenge(db)
+    scheduler = ChallengeScheduler()
+    scheduler.run_due(db, START)
+    donate(db, 1, 600.0)
+    donate(db, 2, 500.0)
+
+    db.statements.clear()
+    result = scheduler.run_due(db, START + timedelta(days=3))
+    assert (result.completed, result.rewarded, result.points) == (3, 3, 150)
+    assert sum(statement.startswith("INSERT INTO points_transactions") for statement in db.statements) == 1
+    assert set(statuses(db).values()) == {ChallengeStatus.COMPLETED}
+    assert points(db) == {1: 250, 2: 250, 3: 250}
+
+    # neither the end boundary nor a second process pays again
+    assert scheduler.run_due(db, END).completed == 0
+    assert ChallengeScheduler().run_due(db, END).rewarded == 0
+    assert db.query(PointsTransaction).count() == 3
+
+# Test that leaving and rejoining a challenge whose goal was reached does not pay again
+def test_scheduler_rewards_once_per_user(db):
+    seed_challenge(db)
+    scheduler = ChallengeScheduler()
+    scheduler.run_due(db, START)
+    donate(db, 1, 1000.0)
+    assert scheduler.run_due(db, START + timedelta(days=3)).rewarded == 3
+
+    for _ in range(3):
+        delete_user_from_challenge(db, 1, 1)
+        add_user_to_challenge(db, 1, 1)
+        result = scheduler.run_due(db, START + timedelta(days=3))
+        assert (result.completed, result.rewarded) == (1, 0)
+    assert points(db)[1] == 250
+    assert db.query(PointsTransaction).filter(PointsTransaction.user_id == 1).count() == 1
+
+# Test that an end without the goal completes the participants without a reward
+def test_scheduler_completes_at_end(db):
+    seed_challenge(db)
+    scheduler = ChallengeScheduler()
+    donate(db, 1, 100.0)
+    result = scheduler.run_due(db, END)
+    assert (result.activated, result.completed, result.rewarded) == (3, 3, 0)
+    assert set(statuses(db).values()) == {ChallengeStatus.COMPLETED}
+    assert points(db) == {1: 200, 2: 200, 3: 200}
+
+# Test that a moved end replaces the old boundary
+def test_scheduler_follows_moved_end(db):
+    seed_challenge(db)
+    scheduler = ChallengeScheduler()
+    scheduler.run_due(db, START)
+    moved_end = END + timedelta(days=7)
+    update_challenge(db, 1, ChallengeUpdate(end=moved_end))
+    scheduler.schedule(db.get(Challenge, 1))
+
+    assert scheduler.run_due(db, END).completed == 0
+    assert set(statuses(db).values()) == {ChallengeStatus.ACTIVE}
+    assert scheduler.run_due(db, moved_end).completed == 3
@@ -3,12 +3,26 @@ import sys
 
 # Adjust the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import datetime
 from unittest.mock import patch
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+import pytest
 from main import app
+from models.challenge import Challenge
+from models.challenge_user import ChallengeUser
+from models.enums import ChallengeStatus, FriendshipStatus
+from models.friend import Friend
+from models.user import User
+from schemas.user import UserResponse
+from services.challenge import get_users_by_challenge_id, get_challenge_participants, get_friends_by_challenge_id
 
 client = TestClient(app)
 
+
+def user_not_found(db, model, ident):
+    raise HTTPException(status_code=404, detail=f"User not found with ID {ident}")
+
 # Sample challenge data
 sample_challenge = {
     "title": "Test Challenge",
@@ -75,6 +89,20 @@ def test_read_challenges_route(get_challenges):
     assert len(response.json()["data"]) == 1
     assert response.json()["data"][0]["title"] == "Test Challenge"
     
+# Test for getting a page of challenges
+@patch("routers.challenges.get_challenges_page", return_value=([{**sample_challenge_response, "reward_points": 10, "total_contributions": 50.0}], "next"))
+def test_read_challenges_route_paginated(get_challenges_page):
+    response = client.get("/challenges/", params={"limit": 1})
+    assert response.status_code == 200
+    assert response.json()["data"]["limit"] == 1
+    assert response.json()["data"]["next_cursor"] == "next"
+    assert response.json()["data"]["items"][0]["title"] == "Test Challenge"
+
+# Test for getting challenges with a limit out of range
+def test_read_challenges_route_limit_too_large():
+    response = client.get("/challenges/", params={"limit": 1000})
+    assert response.status_code == 422
+
 # Test for getting all challenges service error
 @patch("routers.challenges.get_challenges", side_effect=Exception("An error occurred while retrieving the challenges"))
 def test_read_challenges_route_error(get_challenges):
@@ -125,20 +153,20 @@ def test_remove_challenge_route_not_found(check_challenge_exists):
 
 # Test for adding a user to a challenge
 @patch("routers.challenges.add_user_to_challenge")
-@patch("routers.challenges.check_user_exists", return_value=True)
+@patch("routers.challenges.get_or_404")
 def test_add_user_to_challenge_route(add_user_to_challenge, check_user_exists):
     response = client.post("/challenges/1/user/1")
     assert response.status_code == 200
     assert response.json()["message"] == "User added to challenge successfully"
 
 
-@patch("routers.challenges.check_user_exists", return_value=False)
+@patch("routers.challenges.get_or_404", side_effect=user_not_found)
 def test_add_user_to_challenge_route_user_not_found(check_user_exists):
     response = client.post("/challenges/1/user/2")
     assert response.status_code == 404
     assert "User not found with ID 2" in response.json()["detail"]
 
-@patch("routers.challenges.check_user_exists", return_value=True)
+@patch("routers.challenges.get_or_404")
 @patch("services.challenge.check_challenge_exists", return_value=False)
 def test_add_user_to_challenge_route_challenge_not_found(check_user_exists, check_challenge_exists):
     response = client.post("/challenges/2/user/1")
@@ -148,21 +176,21 @@ def test_add_user_to_challenge_route_challenge_not_found(check_user_exists, chec
 
 # Test for getting challenges by user ID
 @patch("routers.challenges.get_challenges_by_user_id", return_value=[sample_challenge_response])
-@patch("routers.challenges.check_user_exists", return_value=True)
+@patch("routers.challenges.get_or_404")
 def test_read_challenges_by_user_id_route(get_challenges_by_user_id, check_user_exists):
     response = client.get("/challenges/user/1")
     assert response.status_code == 200
     assert len(response.json()["data"]) == 1
     assert response.json()["data"][0]["title"] == "Test Challenge"
 
-@patch("routers.challenges.check_user_exists", return_value=False)
+@patch("routers.challenges.get_or_404", side_effect=user_not_found)
 def test_read_challenges_by_user_id_route_not_found(check_user_exists):
     response = client.get("/challenges/user/2")
     assert response.status_code == 404
     assert "User not found with ID 2" in response.json()["detail"]
     
 # Test for getting challenges by user ID service error
-@patch("routers.challenges.check_user_exists", return_value=True)
+@patch("routers.challenges.get_or_404")
 @patch("services.challenge.get_challenges_by_user_id", side_effect=Exception("An error occurred while retrieving the challenges"))
 def test_read_challenges_by_user_id_route_error(check_user_exists, get_challenges_by_user_id):
     response = client.get("/challenges/user/1")
@@ -182,24 +210,84 @@ def test_get_users_by_challenge_id_route_not_found(check_challenge_exists):
     assert response.status_code == 500
     assert "An error occurred while retrieving the users" in response.json()["detail"]
 
+# Test for getting a page of users by challenge ID
+@patch("routers.challenges.get_challenge_participants", return_value=([sample_user_response], "next"))
+def test_get_users_by_challenge_id_route_paginated(get_challenge_participants):
+    response = client.get("/challenges/1/users?limit=1")
+    assert response.status_code == 200
+    assert len(response.json()["data"]["items"]) == 1
+    assert response.json()["data"]["next_cursor"] == "next"
+    assert get_challenge_participants.call_args.kwargs == {"limit": 1, "cursor": None}
+
 # Test for deleting a user from a challenge
 @patch("routers.challenges.delete_user_from_challenge", return_value=True)
-@patch("routers.challenges.check_user_exists", return_value=True)
+@patch("routers.challenges.get_or_404")
 def test_delete_user_from_challenge_route(delete_user_from_challenge, check_user_exists):
     response = client.delete("/challenges/1/user/1")
     assert response.status_code == 200
     assert response.json()["message"] == "User deleted from challenge successfully"
 
-@patch("routers.challenges.check_user_exists", return_value=False)
+@patch("routers.challenges.get_or_404", side_effect=user_not_found)
 def test_delete_user_from_challenge_route_user_not_found(check_user_exists):
     response = client.delete("/challenges/1/user/2")
     assert response.status_code == 404
     assert "User not found with ID 2" in response.json()["detail"]
 
 
-@patch("routers.challenges.check_user_exists", return_value=True)
+@patch("routers.challenges.get_or_404")
 @patch("services.challenge.check_challenge_exists", return_value=False)
 def test_delete_user_from_challenge_route_challenge_not_found(check_user_exists, check_challenge_exists):
     response = client.delete("/challenges/2/user/1")
     assert response.status_code == 500
-    assert "An error occurred while deleting user from challenge" in response.json()["detail"]
\ No newline at end of file
+    assert "An error occurred while deleting user from challenge" in response.json()["detail"]
+
+
+# --- Challenge Participant Query Tests ---
+def seed_participants(db, count):
+    db.add(Challenge(id=1, title="Test Challenge", description="Test", location="Test", goal=100.0, start=datetime(2024, 1, 1), end=datetime(2024, 1, 31)))
+    db.add_all([
+        User(id=user_id, first_name="Test", last_name=f"User {user_id}", username=f"user_{user_id}", email=f"user_{user_id}@example.com",
+             password="secure_password", birthdate=datetime(2000, 1, 1), city="Test City")
+        for user_id in range(4, count + 1)
+    ])
+    db.add_all([ChallengeUser(challenge_id=1, user_id=user_id, status=ChallengeStatus.ACTIVE) for user_id in range(1, count + 1)])
+    db.add_all([Friend(sender_id=1, receiver_id=user_id, status=FriendshipStatus.ACCEPTED) for user_id in range(2, count + 1, 2)])
+    db.commit()
+    db.expunge_all()
+    db.statements.clear()
+
+# Test that listing participants takes the same number of queries for any challenge size
+@pytest.mark.parametrize("count", [3, 200])
+def test_get_users_by_challenge_id_query_count(db, count):
+    seed_participants(db, count)
+    users = get_users_by_challenge_id(db, 1)
+    assert [user.id for user in users] == list(range(1, count + 1))
+    # serializing the users must not load anything else
+    [UserResponse.model_validate(user) for user in users]
+    assert len(db.statements) == 2
+
+# Test that friends among the participants take the same number of queries for any challenge size
+@pytest.mark.parametrize("count", [3, 200])
+def test_get_friends_by_challenge_id_query_count(db, count):
+    seed_participants(db, count)
+    friends = get_friends_by_challenge_id(db, 1, 1)
+    assert [friend.id for friend in friends] == list(range(2, count + 1, 2))
+    assert len(db.statements) == 2
+
+# Test that participant pages follow each other without gaps or repeats
+def test_get_challenge_participants_pages(db):
+    seed_participants(db, 25)
+    seen, cursor = [], None
+    while True:
+        db.statements.clear()
+        users, cursor = get_challenge_participants(db, 1, limit=10, cursor=cursor)
+        assert len(db.statements) <= 2
+        seen.extend(user.id for user in users)
+        if cursor is None:
+            break
+    assert seen == list(range(1, 26))
+
+    users, cursor = get_challenge_participants(db, 1, limit=5, friends_of=1)
+    assert [user.id for user in users] == [2, 4, 6, 8, 10]
+    users, cursor = get_challenge_participants(db, 1, limit=5, cursor=cursor, friends_of=1)
+    assert [user.id for user in users] == [12, 14, 16, 18, 20]
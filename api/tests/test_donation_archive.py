@@ -0,0 +1,67 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date, datetime, timedelta
+
+from models.donation import Donation, DonationArchive, DonationDailyStats
+from models.enums import DonationStatus, DonationType
+from models.location_info import LocationInfo
+from services.donation_archive import add_months, archive_donations, ensure_donation_partitions, rebuild_donation_stats
+
+
+def add_donation(db, appointment, status, amount=500.0, user_id=1):
+    db.add(Donation(user_id=user_id, location_id=1, donation_type=DonationType.BLOOD, amount=amount, appointment=appointment, status=status))
+
+
+def seed_donations(db):
+    db.add(LocationInfo(id=1, name="Test Location", address="Test Address", opening_hours="9:00 AM - 5:00 PM", latitude="52.0", longitude="5.0"))
+    old = datetime.now() - timedelta(days=3 * 365)
+    add_donation(db, old, DonationStatus.COMPLETED)
+    add_donation(db, old, DonationStatus.CANCELLED, amount=0.0)
+    add_donation(db, old, DonationStatus.PENDING)
+    add_donation(db, datetime.now() - timedelta(days=30), DonationStatus.COMPLETED)
+    db.commit()
+    return old
+
+
+# Test month arithmetic across year boundaries
+def test_add_months():
+    assert add_months(date(2024, 11, 15), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 31), -24) == date(2022, 1, 1)
+
+# Test that only old completed and cancelled donations move to the archive
+def test_archive_donations(db):
+    seed_donations(db)
+
+    assert archive_donations(db, older_than_months=24, batch_size=1) == 2
+
+    assert {row.status for row in db.query(DonationArchive)} == {DonationStatus.COMPLETED, DonationStatus.CANCELLED}
+    assert {row.status for row in db.query(Donation)} == {DonationStatus.PENDING, DonationStatus.COMPLETED}
+    assert archive_donations(db, older_than_months=24) == 0
+
+# Test that the statistics rebuild counts archived and live donations
+def test_rebuild_donation_stats(db):
+    old = seed_donations(db)
+    archive_donations(db, older_than_months=24)
+
+    assert rebuild_donation_stats(db) == 4
+    stats = db.query(DonationDailyStats).filter(DonationDailyStats.day == old.date()).all()
+    assert {(row.status, row.donations, row.amount) for row in stats} == {
+        (DonationStatus.COMPLETED, 1, 500.0),
+        (DonationStatus.CANCELLED, 1, 0.0),
+        (DonationStatus.PENDING, 1, 500.0),
+    }
+
+    # A bounded rebuild only replaces the rows of its own days
+    add_donation(db, old, DonationStatus.COMPLETED, amount=250.0)
+    db.commit()
+    assert rebuild_donation_stats(db, since=old.date(), until=old.date() + timedelta(days=1)) == 3
+    assert db.query(DonationDailyStats).count() == 4
+    completed = db.get(DonationDailyStats, (old.date(), 1, DonationType.BLOOD, DonationStatus.COMPLETED))
+    assert (completed.donations, completed.amount) == (2, 750.0)
+
+# Test that partition maintenance is skipped on databases without partitioning
+def test_ensure_donation_partitions_without_partitioning(db):
+    assert ensure_donation_partitions(db) == 0
@@ -4,11 +4,17 @@ import sys
 # Adjust the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from unittest.mock import patch
+import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from main import app 
 
 client = TestClient(app)
 
+
+def user_not_found(db, model, ident):
+    raise HTTPException(status_code=404, detail=f"User not found with ID {ident}")
+
 # sample data
 sample_timeslot = {
     "start_time": "2021-01-01T00:00:00+00:00",
@@ -65,14 +71,14 @@ sample_update_donation = {
 # --- Donation Routes Tests ---
 # Test for creating a donation
 @patch("routers.donations.create_donation", return_value=sample_update_donation)
-@patch("routers.donations.check_user_exists", return_value=True)
+@patch("routers.donations.get_or_404")
 def test_create_donation_route(create_donation, check_user_exists):
     response = client.post("/donations/", json=sample_donation)
     assert response.status_code == 200
     assert response.json()["message"] == "Donation created successfully"
 
 @patch("routers.donations.create_donation", return_value=sample_update_donation)
-@patch("routers.donations.check_user_exists", return_value=False)
+@patch("routers.donations.get_or_404", side_effect=user_not_found)
 def test_create_donation_route_user_not_found(get_donation_by_id, check_user_exists):
     response = client.post("/donations/", json=sample_donation)
     assert response.status_code == 404
@@ -80,7 +86,7 @@ def test_create_donation_route_user_not_found(get_donation_by_id, check_user_exi
     
 # Test for creating a donation service error
 @patch("routers.donations.create_donation", side_effect=Exception("Test Exception"))
-@patch("routers.donations.check_user_exists", return_value=True)
+@patch("routers.donations.get_or_404")
 def test_create_donation_route_service_error(create_donation, check_user_exists):
     response = client.post("/donations/", json=sample_donation)
     assert response.status_code == 500
@@ -88,14 +94,14 @@ def test_create_donation_route_service_error(create_donation, check_user_exists)
     
 # Test for getting donations by user ID
 @patch("routers.donations.get_donations_by_user_id", return_value=[sample_update_donation])
-@patch("routers.donations.check_user_exists", return_value=True)
+@patch("routers.donations.get_or_404")
 def test_get_donations_by_user_id_route(get_donations_by_user_id, check_user_exists):
     response = client.get("/donations/user/1")
     assert response.status_code == 200
     assert response.json()["message"] == "Donations retrieved successfully"
 
 @patch("routers.donations.get_donation_by_id", return_value=sample_donation)
-@patch("routers.donations.check_user_exists", return_value=False)
+@patch("routers.donations.get_or_404", side_effect=user_not_found)
 def test_get_donations_by_user_id_route_not_found(get_donation_by_id, check_user_exists):
     response = client.get("/donations/user/2")
     assert response.status_code == 404
@@ -103,7 +109,7 @@ def test_get_donations_by_user_id_route_not_found(get_donation_by_id, check_user
     
 # Test for getting donations by user ID service error
 @patch("routers.donations.get_donations_by_user_id", side_effect=Exception("Test Exception"))
-@patch("routers.donations.check_user_exists", return_value=True)
+@patch("routers.donations.get_or_404")
 def test_get_donations_by_user_id_route_service_error(get_donations_by_user_id, check_user_exists):
     response = client.get("/donations/user/1")
     assert response.status_code == 500
@@ -111,14 +117,14 @@ def test_get_donations_by_user_id_route_service_error(get_donations_by_user_id,
     
 # Test for getting friends donations
 @patch("routers.donations.get_friends_donations", return_value=[sample_update_donation])
-@patch("routers.donations.check_user_exists", return_value=True)
+@patch("routers.donations.get_or_404")
 def test_get_friends_donations_route(get_friends_donations, check_user_exists):
     response = client.get("/donations/user/1/friends")
     assert response.status_code == 200
     assert response.json()["message"] == "Friends' donations retrieved successfully"
     
 # Test for getting friends donations user not found
-@patch("routers.donations.check_user_exists", return_value=False)
+@patch("routers.donations.get_or_404", side_effect=user_not_found)
 def test_get_friends_donations_route_user_not_found(check_user_exists):
     response = client.get("/donations/user/2/friends")
     assert response.status_code == 404
@@ -126,7 +132,7 @@ def test_get_friends_donations_route_user_not_found(check_user_exists):
     
 # Test for getting friends donations service error
 @patch("routers.donations.get_friends_donations", side_effect=Exception("Test Exception"))
-@patch("routers.donations.check_user_exists", return_value=True)
+@patch("routers.donations.get_or_404")
 def test_get_friends_donations_route_service_error(get_friends_donations, check_user_exists):
     response = client.get("/donations/user/1/friends")
     assert response.status_code == 500
@@ -249,6 +255,13 @@ def test_create_location_info_route_service_error(create_location_info):
     assert response.status_code == 500
     assert "An error occurred while creating the location" in response.json()["detail"]
 
+# Test for creating location info with a name that is taken
+@patch("routers.donations.create_location_info", side_effect=HTTPException(status_code=409, detail="A location named Test Location already exists"))
+def test_create_location_info_route_conflict(create_location_info):
+    response = client.post("/donations/location", json=sample_location)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "A location named Test Location already exists"
+
 # Test for updating location info
 @patch("routers.donations.update_location_info", return_value=sample_location_response)
 def test_update_location_info_route(update_location_info):
@@ -276,4 +289,324 @@ def test_delete_location_info_route_not_found(check_location_exists):
     response = client.delete("/donations/location/2")
     assert response.status_code == 500
     assert "An error occurred while deleting the location information" in response.json()["detail"]
-    
\ No newline at end of file
+    
+# --- Batch Routes Tests ---
+# Test for creating donations in batch
+@patch("routers.donations.create_donations", return_value=[{"index": 0, "status": 200, "id": 1}])
+def test_create_donations_batch_route(create_donations):
+    response = client.post("/donations/batch", json=[sample_donation])
+    assert response.status_code == 200
+    assert response.json()["message"] == "Donations processed successfully"
+    assert response.json()["data"][0]["id"] == 1
+
+# Test for creating donations in batch service error
+@patch("routers.donations.create_donations", side_effect=Exception("Test Exception"))
+def test_create_donations_batch_route_service_error(create_donations):
+    response = client.post("/donations/batch", json=[sample_donation])
+    assert response.status_code == 500
+    assert "An error occurred while creating the donations" in response.json()["detail"]
+
+# Test for getting donations by a list of IDs
+@patch("routers.donations.get_donations_by_ids", return_value=[sample_update_donation])
+def test_get_donations_by_ids_route(get_donations_by_ids):
+    response = client.get("/donations/", params={"ids": [1]})
+    assert response.status_code == 200
+    assert response.json()["message"] == "Donations retrieved successfully"
+
+# Test for creating timeslots in batch
+@patch("routers.donations.create_timeslots", return_value=[{"index": 0, "status": 200, "id": 1}])
+def test_create_timeslots_route(create_timeslots):
+    response = client.post("/donations/location/1/timeslots", json=[sample_timeslot])
+    assert response.status_code == 200
+    assert response.json()["message"] == "Timeslots processed successfully"
+
+# --- Batch Service Tests ---
+# Test that valid donations are inserted together and invalid ones are reported per item
+def test_create_donations_reports_per_item(db):
+    from models.donation import Donation
+    from models.location_info import LocationInfo
+    from schemas.donation import DonationCreate
+    from services.donation import create_donations
+
+    db.add(LocationInfo(id=1, name="Test Location", address="Test City", opening_hours="9:00 AM - 5:00 PM", latitude="1", longitude="1"))
+    db.commit()
+    donations = [
+        DonationCreate(**sample_donation),
+        DonationCreate(**{**sample_donation, "user_id": 999}),
+        DonationCreate(**{**sample_donation, "location_id": 999}),
+        DonationCreate(**{**sample_donation, "user_id": 2}),
+    ]
+    results = create_donations(db, donations)
+    assert [result.status for result in results] == [200, 404, 404, 200]
+    assert results[1].message == "User not found with ID 999"
+    assert {donation.user_id for donation in db.query(Donation).all()} == {1, 2}
+
+# Test that invalid timeslots are rejected without blocking the valid ones
+def test_create_timeslots_reports_per_item(db):
+    from models.location_info import LocationInfo
+    from schemas.donation import Timeslot
+    from services.donation import create_timeslots
+
+    db.add(LocationInfo(id=1, name="Test Location", address="Test City", opening_hours="9:00 AM - 5:00 PM", latitude="1", longitude="1"))
+    db.commit()
+    timeslots = [
+        Timeslot(**sample_timeslot),
+        Timeslot(**{**sample_timeslot, "end_time": sample_timeslot["start_time"]}),
+    ]
+    results = create_timeslots(db, 1, timeslots)
+    assert [result.status for result in results] == [200, 400]
+    assert results[0].id is not None
+
+# Test that timeslots starting at a taken time are reported per item instead of failing the batch
+def test_create_timeslots_duplicates(db):
+    from datetime import timedelta
+    from models.location_info import LocationInfo, Timeslot as TimeslotModel
+    from schemas.donation import Timeslot
+    from services.donation import create_timeslots
+
+    db.add(LocationInfo(id=1, name="Test Location", address="Test City", opening_hours="9:00 AM - 5:00 PM", latitude="1", longitude="1"))
+    db.commit()
+    create_timeslots(db, 1, [Timeslot(**sample_timeslot)])
+    later = Timeslot(**sample_timeslot)
+    later.start_time += timedelta(hours=1)
+    later.end_time += timedelta(hours=1)
+
+    results = create_timeslots(db, 1, [Timeslot(**sample_timeslot), later, later])
+    assert [result.status for result in results] == [409, 200, 409]
+    assert results[1].id is not None
+    assert db.query(TimeslotModel).count() == 2
+
+# Test that a location with a name that is taken is a conflict
+def test_create_location_info_duplicate_name(db):
+    from schemas.donation import LocationInfoCreate
+    from services.donation import create_location_info
+
+    location = LocationInfoCreate(**{**sample_location, "timeslots": []})
+    create_location_info(db, location)
+    with pytest.raises(HTTPException) as error:
+        create_location_info(db, location)
+    assert error.value.status_code == 409
+
+# --- Fieldset Tests ---
+def seed_locations(db):
+    from models.location_info import LocationInfo, Timeslot
+    from datetime import datetime
+
+    for location_id in (1, 2, 3):
+        db.add(LocationInfo(
+            id=location_id, name=f"Location {location_id}", address="Test City", opening_hours="9:00 AM - 5:00 PM", latitude="1", longitude="1",
+            timeslots=[Timeslot(start_time=datetime(2021, 1, 1, 9), end_time=datetime(2021, 1, 1, 10), total_capacity=10, remaining_capacity=10)],
+        ))
+    db.commit()
+    db.expunge_all()
+    db.statements.clear()
+
+# Test that the default location listing eager loads timeslots in a constant number of queries
+def test_location_fieldset_default_expands_timeslots(db):
+    from routers.donations import location_fieldset
+    from services.donation import get_all_location_info
+
+    seed_locations(db)
+    fieldset = location_fieldset(None, None)
+    output = [fieldset.serialize(location) for location in get_all_location_info(db, options=fieldset.options())]
+    assert len(db.statements) == 2
+    assert all(len(location.timeslots) == 1 for location in output)
+
+# Test that an empty expansion and a field list skip the timeslots and unused columns
+def test_location_fieldset_sparse(db):
+    from routers.donations import location_fieldset
+    from services.donation import get_all_location_info
+
+    seed_locations(db)
+    fieldset = location_fieldset("id,name", "")
+    output = [fieldset.serialize(location) for location in get_all_location_info(db, options=fieldset.options())]
+    assert len(db.statements) == 1
+    assert "opening_hours" not in db.statements[0]
+    assert output[0] == {"id": 1, "name": "Location 1"}
+
+# Test that a field list without an expansion only expands the relationships it names
+def test_location_fieldset_fields_without_expand(db):
+    from routers.donations import location_fieldset
+    from services.donation import get_all_location_info
+
+    seed_locations(db)
+    fieldset = location_fieldset("id,name", None)
+    output = [fieldset.serialize(location) for location in get_all_location_info(db, options=fieldset.options())]
+    assert len(db.statements) == 1
+    assert output[0] == {"id": 1, "name": "Location 1"}
+
+    db.expunge_all()
+    db.statements.clear()
+    fieldset = location_fieldset("id,timeslots", None)
+    output = [fieldset.serialize(location) for location in get_all_location_info(db, options=fieldset.options())]
+    assert len(db.statements) == 2
+    assert set(output[0]) == {"id", "timeslots"} and len(output[0]["timeslots"]) == 1
+
+    db.expunge_all()
+    db.statements.clear()
+    fieldset = location_fieldset("timeslots", None)
+    output = [fieldset.serialize(location) for location in get_all_location_info(db, options=fieldset.options())]
+    assert "opening_hours" not in db.statements[0]
+    assert set(output[0]) == {"id", "timeslots"}
+
+# Test for an unknown expansion
+def test_get_all_location_info_route_unknown_expand():
+    response = client.get("/donations/location/all", params={"expand": "donations"})
+    assert response.status_code == 400
+    assert "Unknown expansion(s) donations" in response.json()["detail"]
+
+# --- History And Summary Tests ---
+def seed_history(db):
+    from models.donation import Donation
+    from models.location_info import LocationInfo
+    from datetime import datetime
+
+    db.add(LocationInfo(id=1, name="Test Location", address="Test City", opening_hours="9:00 AM - 5:00 PM", latitude="1", longitude="1"))
+    for day in (1, 2, 2, 3, 4):
+        db.add(Donation(user_id=1, location_id=1, donation_type="blood", amount=500.0, appointment=datetime(2024, 1, day), status="completed"))
+    db.add(Donation(user_id=1, location_id=1, donation_type="plasma", amount=700.0, appointment=datetime(2024, 2, 1), status="completed"))
+    db.add(Donation(user_id=1, location_id=1, donation_type="blood", amount=500.0, appointment=datetime(2024, 3, 1), status="cancelled"))
+    db.commit()
+
+# Test that keyset pages cover the history exactly once, newest first
+def test_get_donation_history_pages(db):
+    from services.donation import get_donation_history
+
+    seed_history(db)
+    seen = []
+    cursor = None
+    while True:
+        donations, cursor = get_donation_history(db, 1, limit=3, cursor=cursor)
+        seen.extend((donation.appointment, donation.id) for donation in donations)
+        if cursor is None:
+            break
+    assert len(seen) == 7
+    assert seen == sorted(seen, reverse=True)
+
+# Test that the summary is computed once, cached, and refreshed after a donation write
+def test_get_donation_summary_cached_until_write(db):
+    from datetime import datetime, timedelta
+    from schemas.donation import DonationCreate
+    from services.donation import create_donation, get_donation_summary, invalidate_donation_summary
+
+    invalidate_donation_summary(1)
+    seed_history(db)
+    summary = get_donation_summary(db, 1)
+    assert summary.total_count == 7
+    assert summary.total_amount == 5 * 500.0 + 700.0
+    assert summary.last_donation_at == datetime(2024, 2, 1)
+    assert summary.next_eligible_by_type["blood"] == datetime(2024, 1, 4) + timedelta(days=56)
+    assert summary.next_eligible_at == datetime(2024, 2, 15)
+
+    statements = len(db.statements)
+    assert get_donation_summary(db, 1) is summary
+    assert len(db.statements) == statements
+
+    create_donation(db, DonationCreate(**{**sample_donation, "donation_type": "plasma", "status": "completed", "appointment": "2024-03-01T00:00:00"}))
+    assert get_donation_summary(db, 1).next_eligible_by_type["plasma"] == datetime(2024, 3, 15)
+
+# Test for getting a page of donations by user ID
+@patch("routers.donations.get_donation_history", return_value=([sample_update_donation], "next"))
+@patch("routers.donations.get_or_404")
+def test_get_donations_by_user_id_route_paginated(get_or_404, get_donation_history):
+    response = client.get("/donations/user/1", params={"limit": 1})
+    assert response.status_code == 200
+    assert response.json()["data"]["next_cursor"] == "next"
+    assert len(response.json()["data"]["items"]) == 1
+
+# Test for getting donations by user ID with an invalid cursor
+@patch("routers.donations.get_or_404")
+def test_get_donations_by_user_id_route_invalid_cursor(get_or_404):
+    response = client.get("/donations/user/1", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+# Test that a summary computed before a write is not stored after the write dropped it
+def test_summary_cache_rejects_stale_summary():
+    from services.donation import SummaryCache
+
+    cache = SummaryCache()
+    started = cache.begin()
+    cache.drop(1)
+    cache.put(1, "stale", started)
+    assert cache.get(1) is None
+    cache.put(1, "fresh", cache.begin())
+    assert cache.get(1) == "fresh"
+
+# Test that the summary cache keeps the most recently used users and stays safe after evicting a drop
+def test_summary_cache_bounded():
+    from services.donation import SummaryCache
+
+    cache = SummaryCache(max_size=2)
+    started = cache.begin()
+    cache.drop(1)
+    cache.put(2, "two", cache.begin())
+    cache.put(3, "three", cache.begin())
+    assert len(cache) == 2
+    cache.put(1, "stale", started)
+    assert cache.get(1) is None
+    assert (cache.get(2), cache.get(3)) == ("two", "three")
+
+# Test for getting the donation summary
+@patch("routers.donations.get_donation_summary")
+@patch("routers.donations.get_or_404")
+def test_get_donation_summary_route(get_or_404, get_donation_summary):
+    get_donation_summary.return_value.model_dump.return_value = {"user_id": 1, "total_count": 0}
+    response = client.get("/donations/user/1/summary")
+    assert response.status_code == 200
+    assert response.json()["message"] == "Donation summary retrieved successfully"
+
+# Test for getting the donation summary service error
+@patch("routers.donations.get_donation_summary", side_effect=Exception("Test Exception"))
+@patch("routers.donations.get_or_404")
+def test_get_donation_summary_route_service_error(get_or_404, get_donation_summary):
+    response = client.get("/donations/user/1/summary")
+    assert response.status_code == 500
+    assert "An error occurred while retrieving the donation summary" in response.json()["detail"]
+
+# --- Eligibility Tests ---
+# Test that donation writes keep the next eligible dates current
+def test_eligibility_follows_donation_writes(db):
+    from datetime import datetime
+    from models.eligibility import DonorEligibility
+    from schemas.donation import DonationBase, DonationCreate
+    from services.donation import create_donation, delete_donation, update_donation
+    from services.eligibility import get_eligibility
+
+    seed_history(db)
+    assert db.query(DonorEligibility).count() == 0
+    donation = create_donation(db, DonationCreate(**{**sample_donation, "status": "completed", "appointment": "2099-01-01T00:00:00"}))
+    assert db.get(DonorEligibility, (1, "blood")).next_eligible_at == datetime(2099, 2, 26)
+    assert db.get(DonorEligibility, (1, "plasma")).next_eligible_at == datetime(2024, 2, 15)
+    assert get_eligibility(db, 1) == {"blood": datetime(2099, 2, 26), "plasma": None}
+
+    update_donation(db, donation.id, DonationBase(**{**sample_donation, "user_id": 2, "status": "completed", "appointment": "2099-01-01T00:00:00"}))
+    db.expire_all()
+    assert db.get(DonorEligibility, (1, "blood")).last_donation_at == datetime(2024, 1, 4)
+    assert db.get(DonorEligibility, (2, "blood")).last_donation_at == datetime(2099, 1, 1)
+
+    delete_donation(db, donation.id)
+    db.expire_all()
+    assert db.get(DonorEligibility, (2, "blood")) is None
+
+# Test that the full rebuild matches the incremental state and selects eligible users
+def test_rebuild_eligibility(db):
+    from datetime import datetime
+    from models.donation import Donation
+    from models.user import User
+    from services.eligibility import eligible_users, rebuild_eligibility
+
+    seed_history(db)
+    db.add(Donation(user_id=2, location_id=1, donation_type="blood", amount=500.0, appointment=datetime(2099, 1, 1), status="completed"))
+    db.commit()
+    assert rebuild_eligibility(db) == 3
+    eligible = db.query(User.id).filter(eligible_users("blood")).order_by(User.id).all()
+    assert [user_id for user_id, in eligible] == [1, 3]
+
+# Test for getting a user's eligibility
+@patch("routers.donations.get_eligibility", return_value={"blood": None, "plasma": "2099-01-15T00:00:00"})
+@patch("routers.donations.get_or_404")
+def test_get_eligibility_route(get_or_404, get_eligibility):
+    response = client.get("/donations/user/1/eligibility")
+    assert response.status_code == 200
+    assert response.json()["data"] == {"blood": None, "plasma": "2099-01-15T00:00:00"}
@@ -0,0 +1,147 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import csv
+import io
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+from main import app
+from models.donation import Donation
+from models.enums import DonationStatus, DonationType
+from models.location_info import LocationInfo
+from services.export import ExportResult, export_table
+
+client = TestClient(app)
+
+DAY = datetime(2024, 3, 1, 10, 0)
+ADMIN_HEADERS = {"X-Admin-Token": "secret"}
+
+
+def seed_donations(db, count=5):
+    db.add(LocationInfo(id=1, name="Utrecht", address="Plesmanlaan 125, Utrecht", opening_hours="9:00 AM - 5:00 PM", latitude="52.0907", longitude="5.1214"))
+    for index in range(count):
+        db.add(Donation(
+            user_id=1, location_id=1, donation_type=DonationType.BLOOD, amount=500.0, appointment=DAY + timedelta(days=index),
+            status=DonationStatus.COMPLETED, updated_at=DAY + timedelta(days=index),
+        ))
+    db.commit()
+
+def export_csv(db, **kwargs):
+    out = io.BytesIO()
+    result = export_table(db, "donations", "csv", out, **kwargs)
+    return result, list(csv.DictReader(io.StringIO(out.getvalue().decode())))
+
+
+# --- Export Service Tests ---
+# Test a full CSV export in small chunks and its watermark
+def test_export_csv(db):
+    seed_donations(db)
+    result, rows = export_csv(db, chunk_size=2)
+    assert result == ExportResult(rows=5, watermark=DAY + timedelta(days=4))
+    assert [row["id"] for row in rows] == ["1", "2", "3", "4", "5"]
+    assert rows[0]["donation_type"] == "BLOOD"
+    assert rows[0]["status"] == "COMPLETED"
+
+# Test that an incremental export only returns rows changed after the watermark
+@patch("services.export.EXPORT_WATERMARK_LAG", timedelta(0))
+def test_export_since_watermark(db):
+    seed_donations(db)
+    result, _ = export_csv(db, since=DAY + timedelta(days=2))
+    assert result.rows == 2
+
+    donation = db.get(Donation, 1)
+    donation.amount = 250.0
+    db.commit()
+    result, rows = export_csv(db, since=result.watermark)
+    assert [(row["id"], row["amount"]) for row in rows] == [("1", "250.0")]
+
+    # nothing changed since, the watermark carries over
+    assert export_csv(db, since=result.watermark)[0] == ExportResult(rows=0, watermark=result.watermark)
+
+# Test that rows changed within the lag are left to the next export
+def test_export_watermark_lag(db):
+    seed_donations(db)
+    donation = db.get(Donation, 1)
+    donation.amount = 250.0
+    db.commit()
+
+    result, rows = export_csv(db)
+    assert result == ExportResult(rows=4, watermark=DAY + timedelta(days=4))
+    assert "1" not in [row["id"] for row in rows]
+    with patch("services.export.EXPORT_WATERMARK_LAG", timedelta(0)):
+        assert [row["id"] for row in export_csv(db, since=result.watermark)[1]] == ["1"]
+
+# Test that an export where every changed row is within the lag writes nothing and keeps the watermark
+def test_export_only_young_rows(db):
+    seed_donations(db)
+    for donation in db.query(Donation):
+        donation.amount = 250.0
+    db.commit()
+
+    result, rows = export_csv(db, since=DAY)
+    assert (result, rows) == (ExportResult(rows=0, watermark=DAY), [])
+
+# Test Parquet and Arrow IPC exports with typed columns
+def test_export_parquet_and_arrow(db):
+    seed_donations(db)
+    out = io.BytesIO()
+    export_table(db, "donations", "parquet", out, chunk_size=2)
+    table = pq.read_table(io.BytesIO(out.getvalue()))
+    assert table.num_rows == 5
+    assert table.column("appointment").to_pylist()[0] == DAY
+    assert str(table.schema.field("amount").type) == "double"
+
+    out = io.BytesIO()
+    export_table(db, "timeslots", "arrow", out)
+    assert pyarrow.ipc.open_file(io.BytesIO(out.getvalue())).read_all().num_rows == 0
+
+
+# --- Export Routes Tests ---
+def fake_export(db, table_name, fmt, out, since=None):
+    out.write(b"id\n1\n")
+    return ExportResult(rows=1, watermark=DAY)
+
+# Test for exporting a table
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.export.export_table", side_effect=fake_export)
+def test_export_table_route(export_table):
+    response = client.get("/admin/export/donations?format=csv&since=2024-01-01T00:00:00", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.content == b"id\n1\n"
+    assert response.headers["X-Export-Rows"] == "1"
+    assert response.headers["X-Export-Watermark"] == DAY.isoformat()
+    assert export_table.call_args.kwargs["since"] == datetime(2024, 1, 1)
+
+# Test for exporting an unknown table
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+def test_export_table_route_not_found():
+    response = client.get("/admin/export/users", headers=ADMIN_HEADERS)
+    assert response.status_code == 404
+
+# Test for exporting with an unknown format
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+def test_export_table_route_invalid_format():
+    response = client.get("/admin/export/donations?format=xlsx", headers=ADMIN_HEADERS)
+    assert response.status_code == 422
+
+# Test for exporting a table service error
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.export.export_table", side_effect=Exception("Test Exception"))
+def test_export_table_route_service_error(export_table):
+    response = client.get("/admin/export/donations", headers=ADMIN_HEADERS)
+    assert response.status_code == 500
+    assert "An error occurred while exporting donations" in response.json()["detail"]
+
+# Test that exports need the admin token
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.export.export_table", side_effect=fake_export)
+def test_export_table_route_needs_token(export_table):
+    assert client.get("/admin/export/donations").status_code == 403
+    assert client.get("/admin/export/donations", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    export_table.assert_not_called()
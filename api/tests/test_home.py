@@ -0,0 +1,102 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from main import app
+from models.notification import Notification
+from services.home import _challenges, _friends_posts, _new_notifications, _run_section, mark_home_notifications_retrieved
+
+client = TestClient(app)
+
+
+def user_not_found(db, model, ident):
+    raise HTTPException(status_code=404, detail=f"User not found with ID {ident}")
+
+sample_user = {
+    "id": 1,
+    "first_name": "Test",
+    "last_name": "User",
+    "username": "test_user",
+    "email": "test@example.com",
+    "birthdate": "2000-01-01T00:00:00",
+    "city": "Test City",
+    "current_points": 200,
+    "total_points": 200,
+    "role": "user",
+    "created_at": "2021-01-01T00:00:00",
+}
+
+def slow_section(db, user_id):
+    time.sleep(0.5)
+    return ["too late"]
+
+def empty_section(db, user_id):
+    raise HTTPException(status_code=404, detail=f"No challenges found for user with ID {user_id}")
+
+sample_sections = {
+    "new_notifications": (lambda db, user_id: [{"title": "Test Notification"}], 1.0),
+    "friends_posts": (slow_section, 0.05),
+    "challenges": (empty_section, 1.0),
+}
+
+
+# --- Home Screen Routes Tests ---
+# Test that the sections are combined and a slow section degrades to a timeout
+@patch("services.home.SessionLocal", MagicMock())
+@patch.dict("services.home.HOME_SECTIONS", sample_sections, clear=True)
+@patch("routers.home.mark_home_notifications_retrieved")
+@patch("routers.home.get_or_404", return_value=MagicMock(**sample_user))
+def test_get_home_screen_route(get_or_404, mark_home_notifications_retrieved):
+    started = time.monotonic()
+    response = client.get("/home/1")
+    assert time.monotonic() - started < 0.5
+    assert response.status_code == 200
+    assert response.json()["message"] == "Home screen retrieved successfully"
+    data = response.json()["data"]
+    assert data["profile"]["username"] == "test_user"
+    assert data["new_notifications"]["status"] == 200
+    assert data["new_notifications"]["data"][0]["title"] == "Test Notification"
+    assert data["friends_posts"]["status"] == 504
+    assert data["challenges"]["status"] == 404
+    assert data["challenges"]["data"] == []
+    assert mark_home_notifications_retrieved.call_args.args[1]["new_notifications"].status == 200
+
+# Test that a real section that finds nothing reports the 404 its service wrapped in a 500
+@pytest.mark.parametrize("name, loader", [("friends_posts", _friends_posts), ("challenges", _challenges)])
+def test_home_section_not_found(db, name, loader):
+    with patch("services.home.SessionLocal", return_value=db):
+        section = _run_section(name, loader, 1, 1.0, time.monotonic())
+    assert section.status == 404
+    assert section.data == []
+
+# Test that new notifications are only marked retrieved once the section made it into the response
+def test_home_notifications_retrieved_after_response(db):
+    db.add_all([Notification(title="Notification", content="Content", user_id=1, retrieved=False) for _ in range(2)])
+    db.commit()
+    with patch("services.home.SessionLocal", return_value=db):
+        section = _run_section("new_notifications", _new_notifications, 1, 1.0, time.monotonic())
+    assert section.status == 200 and len(section.data) == 2
+    assert db.query(Notification).filter(Notification.retrieved == False).count() == 2
+
+    mark_home_notifications_retrieved(db, {"new_notifications": section})
+    assert db.query(Notification).filter(Notification.retrieved == False).count() == 0
+
+# Test that a section that starts after its deadline does not run
+def test_home_section_started_too_late():
+    loader = MagicMock()
+    section = _run_section("friends_posts", loader, 1, 0.5, time.monotonic() - 1.0)
+    assert section.status == 504
+    loader.assert_not_called()
+
+# Test for getting the home screen when the user does not exist
+@patch("routers.home.get_or_404", side_effect=user_not_found)
+def test_get_home_screen_route_user_not_found(get_or_404):
+    response = client.get("/home/2")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "User not found with ID 2"
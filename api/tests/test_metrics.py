@@ -0,0 +1,94 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from main import app
+from services.donation import get_donation_summary, invalidate_donation_summary
+from services.metrics import Counter, Histogram, Registry, TimedQueuePool, cache_requests, pool_checkout_wait
+
+client = TestClient(app)
+
+
+def sample(body: str, prefix: str) -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in body.splitlines() if line.startswith(prefix))
+
+
+# --- Metrics Tests ---
+# Test that counts from many threads add up without a lock on the update
+def test_counter_across_threads():
+    counter = Counter("test_total", "Test counter.", ["kind"])
+
+    def work():
+        for _ in range(10000):
+            counter.labels("a").inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.labels("a").value() == 80000
+
+# Test the exposition format of a histogram
+def test_histogram_render():
+    registry = Registry()
+    histogram = registry.register(Histogram("test_seconds", "Test histogram.", ["route"], buckets=(0.1, 1.0)))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels('/a"b').observe(value)
+    assert registry.render().splitlines() == [
+        "# HELP test_seconds Test histogram.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/a\\"b",le="0.1"} 2',
+        'test_seconds_bucket{route="/a\\"b",le="1"} 3',
+        'test_seconds_bucket{route="/a\\"b",le="+Inf"} 4',
+        'test_seconds_count{route="/a\\"b"} 4',
+        'test_seconds_sum{route="/a\\"b"} 3.65',
+    ]
+
+# Test that cache lookups are counted as hits and misses
+def test_cache_counters(db):
+    hits, misses = cache_requests.labels("donation_summary", "hit"), cache_requests.labels("donation_summary", "miss")
+    before = hits.value(), misses.value()
+    invalidate_donation_summary(1)
+    get_donation_summary(db, 1)
+    get_donation_summary(db, 1)
+    assert (hits.value() - before[0], misses.value() - before[1]) == (1, 1)
+
+# Test that pool checkouts are timed
+def test_timed_queue_pool():
+    engine = create_engine("sqlite://", poolclass=TimedQueuePool)
+    before = pool_checkout_wait.labels().snapshot()[0]
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert sum(pool_checkout_wait.labels().snapshot()[0]) == sum(before) + 1
+    engine.dispose()
+
+
+# --- Metrics Routes Tests ---
+# Test that requests are labelled with their route template
+@patch("routers.challenges.get_or_404")
+@patch("routers.challenges.get_challenge_leaderboard", return_value={"top": [], "around": None, "size": 0})
+def test_metrics_route(get_challenge_leaderboard, get_or_404):
+    route = 'sanquin_http_requests_total{method="GET",route="/challenges/{challenge_id}/leaderboard",status="200"}'
+    before = sample(client.get("/metrics").text, route)
+    client.get("/challenges/7/leaderboard")
+    client.get("/challenges/8/leaderboard")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert sample(response.text, route) == before + 2
+    assert 'sanquin_http_request_duration_seconds_bucket{method="GET",route="/challenges/{challenge_id}/leaderboard",le="+Inf"}' in response.text
+    assert "sanquin_threadpool_in_use " in response.text
+    assert 'sanquin_http_requests_in_flight{method="GET"} 1' in response.text
+
+# Test that unknown paths share one series
+def test_metrics_route_unmatched():
+    client.get("/no/such/path")
+    assert 'route="unmatched",status="404"' in client.get("/metrics").text
@@ -0,0 +1,139 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import datetime
+
+from sqlalchemy import select, update
+from main import app  # noqa: F401 - subscribes every outbox handler
+from models.enums import DonationStatus, DonationType, FriendshipStatus
+from models.location_info import LocationInfo
+from models.notification import Notification
+from models.outbox import OutboxEvent
+from schemas.donation import DonationCreate
+from schemas.post import PostCreate
+from services.donation import create_donations
+from services.outbox import OutboxRelay, add_event, outbox_relay
+from services.post import create_post
+from services.user import edit_friend_request, send_friend_request
+
+
+class ListBroker:
+    """Stand-in for an external broker, keeps every published batch."""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    def publish(self, events):
+        if self.fail:
+            raise ConnectionError("broker unavailable")
+        self.batches.append([event["id"] for event in events])
+
+
+def make_due(db):
+    db.execute(update(OutboxEvent).values(available_at=datetime.now()))
+    db.commit()
+
+
+# --- Outbox Tests ---
+# Test that the event is written in the same transaction as the change
+def test_outbox_event_written_with_change(db):
+    post = create_post(db, PostCreate(title="Hello", content="First post", post_type="text", user_id=1))
+    event = db.scalars(select(OutboxEvent)).one()
+    assert (event.event_type, event.payload) == ("post.created", {"post_id": post.id, "user_id": 1, "post_type": "text"})
+
+    add_event(db, "post.created", {"post_id": 0})
+    db.rollback()
+    assert db.query(OutboxEvent).count() == 1
+
+# Test that a donation batch writes one event per inserted donation
+def test_outbox_events_for_donation_batch(db):
+    db.add(LocationInfo(id=1, name="Utrecht", address="Plesmanlaan 125, Utrecht", opening_hours="9:00 AM - 5:00 PM", latitude="52.0907", longitude="5.1214"))
+    db.commit()
+    donation = dict(amount=500.0, location_id=1, donation_type=DonationType.BLOOD, appointment=datetime(2024, 3, 1), status=DonationStatus.COMPLETED, enable_joining=False)
+    results = create_donations(db, [DonationCreate(user_id=1, **donation), DonationCreate(user_id=999, **donation), DonationCreate(user_id=2, **donation)])
+
+    events = db.scalars(select(OutboxEvent).order_by(OutboxEvent.id)).all()
+    assert [event.event_type for event in events] == ["donation.created", "donation.created"]
+    assert [(event.payload["donation_id"], event.payload["user_id"]) for event in events] == [(results[0].id, 1), (results[2].id, 2)]
+
+# Test that a commit with events wakes the relay
+def test_outbox_commit_wakes_relay(db):
+    outbox_relay._wake.clear()
+    db.commit()
+    assert not outbox_relay._wake.is_set()
+    add_event(db, "post.created", {"post_id": 1})
+    db.commit()
+    assert outbox_relay._wake.is_set()
+
+# Test that the relay hands a batch to the broker and handlers and marks it published
+def test_outbox_relay_delivers(db):
+    for post_id in (1, 2, 3):
+        add_event(db, "post.created", {"post_id": post_id})
+    db.commit()
+    broker = ListBroker()
+    relay = OutboxRelay(broker=broker, batch_size=2)
+    handled = []
+    relay.subscribe("post.created", lambda session, event: handled.append(event["payload"]["post_id"]))
+
+    result = relay.relay_due(db)
+    assert (result.published, result.failed) == (3, 0)
+    assert handled == [1, 2, 3]
+    assert [len(batch) for batch in broker.batches] == [2, 1]
+    assert relay.relay_due(db).published == 0
+    assert db.query(OutboxEvent).filter(OutboxEvent.published_at.is_(None)).count() == 0
+
+# Test that a failed broker call is retried later, at least once delivery
+def test_outbox_relay_broker_failure(db):
+    add_event(db, "post.created", {"post_id": 1})
+    db.commit()
+    broker = ListBroker(fail=True)
+    relay = OutboxRelay(broker=broker)
+
+    assert relay.relay_once(db).failed == 1
+    event = db.scalars(select(OutboxEvent)).one()
+    assert (event.attempts, event.published_at, event.last_error) == (1, None, "broker unavailable")
+    # backed off, not handed out again right away
+    assert relay.relay_once(db).failed == 0
+
+    broker.fail = False
+    make_due(db)
+    assert relay.relay_once(db).published == 1
+    assert broker.batches == [[event.id]]
+
+# Test that a failing handler does not hold up the other events
+def test_outbox_relay_handler_failure(db):
+    add_event(db, "post.created", {"post_id": 1})
+    add_event(db, "post.created", {"post_id": 2})
+    db.commit()
+    relay = OutboxRelay()
+
+    def handler(session, event):
+        if event["payload"]["post_id"] == 1:
+            raise ValueError("bad event")
+
+    relay.subscribe("post.created", handler)
+    result = relay.relay_once(db)
+    assert (result.published, result.failed) == (1, 1)
+    assert db.scalars(select(OutboxEvent.payload).where(OutboxEvent.published_at.is_(None))).all() == [{"post_id": 1}]
+
+# Test that claimed events are not handed to another relay before the lease ends
+def test_outbox_relay_lease(db):
+    add_event(db, "post.created", {"post_id": 1})
+    db.commit()
+    assert len(OutboxRelay()._claim(db, datetime.now())) == 1
+    assert OutboxRelay().relay_once(db).published == 0
+    make_due(db)
+    assert OutboxRelay().relay_once(db).published == 1
+
+# Test that accepting a friend request notifies the sender through the relay
+def test_outbox_friend_request_accepted(db):
+    send_friend_request(db, 1, 2)
+    edit_friend_request(db, 1, 2, FriendshipStatus.ACCEPTED)
+    assert db.query(Notification).count() == 0
+
+    assert outbox_relay.relay_due(db).published == 1
+    notification = db.scalars(select(Notification)).one()
+    assert (notification.user_id, notification.title) == (1, "Friend request accepted")
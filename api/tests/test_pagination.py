@@ -0,0 +1,76 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from models.notification import Notification
+from models.post import Post
+from services.pagination import check_cursor, decode_cursor, encode_cursor
+from services.post import get_posts_page
+from services.user import get_notifications_page
+
+NOW = datetime(2024, 6, 1)
+
+
+# --- Pagination Tests ---
+# Test that a cursor gives back the values it was made from
+def test_cursor_round_trip():
+    cursor = encode_cursor(NOW, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, datetime, int) == (NOW, 42)
+
+# Test that changed, foreign or malformed cursors are rejected
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor(42) + "x", encode_cursor(42).replace(".", "x.", 1), encode_cursor(1, 2)])
+def test_cursor_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, int)
+    assert (error.value.status_code, error.value.detail) == (400, "Invalid cursor")
+
+# Test that a cursor signed with another secret is rejected
+def test_cursor_other_secret():
+    with patch("services.pagination.CURSOR_SECRET", "other"):
+        cursor = encode_cursor(42)
+    with pytest.raises(HTTPException):
+        decode_cursor(cursor, int)
+
+# Test that routes can reject a bad cursor before knowing its key types
+def test_check_cursor():
+    check_cursor(None)
+    check_cursor(encode_cursor(NOW, 42))
+    with pytest.raises(HTTPException) as error:
+        check_cursor(encode_cursor(NOW, 42) + "x")
+    assert error.value.status_code == 400
+
+# Test that pages walk every row once, newest first, also past rows with the same timestamp
+def test_paginate_walks_every_row(db):
+    db.add_all([
+        Post(id=i, user_id=1, title="Post", content="Content", post_type="text", created_at=NOW - timedelta(minutes=i // 2))
+        for i in range(1, 8)
+    ])
+    db.commit()
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        db.statements.clear()
+        posts, cursor = get_posts_page(db, 1, limit=2, cursor=cursor)
+        assert len(db.statements) == 1
+        seen += [post.id for post in posts]
+        pages += 1
+        if cursor is None:
+            break
+    assert seen == [1, 3, 2, 5, 4, 7, 6]
+    assert pages == 4
+
+# Test that an exact last page has no next cursor
+def test_paginate_last_page(db):
+    db.add_all([Notification(title="Notification", content="Content", user_id=1, created_at=None) for _ in range(4)])
+    db.commit()
+    notifications, cursor = get_notifications_page(db, 1, limit=2)
+    assert [notification.id for notification in notifications] == [4, 3]
+    notifications, cursor = get_notifications_page(db, 1, limit=2, cursor=cursor)
+    assert ([notification.id for notification in notifications], cursor) == ([2, 1], None)
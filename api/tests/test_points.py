@@ -0,0 +1,131 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from main import app
+from models.enums import LeaderboardScope
+from models.points import PointsTransaction
+from models.user import User
+from services.leaderboard import RankedSet, Leaderboard, leaderboards, get_leaderboard
+from services.points import award_points
+
+client = TestClient(app)
+
+ADMIN_HEADERS = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture(autouse=True)
+def reset_leaderboards():
+    leaderboards.reset()
+    yield
+    leaderboards.reset()
+
+
+# --- Ranking Structure Tests ---
+# Test that positions match a plain sorted list through random inserts and removals
+def test_ranked_set_matches_sorted_list():
+    ranked = RankedSet()
+    expected = []
+    rng = random.Random(42)
+    for _ in range(2000):
+        key = (rng.randint(0, 50), rng.randint(0, 10_000))
+        if expected and rng.random() < 0.3:
+            key = rng.choice(expected)
+            ranked.remove(key)
+            expected.remove(key)
+        elif key not in expected:
+            ranked.add(key)
+            expected.append(key)
+    expected.sort()
+    assert len(ranked) == len(expected)
+    assert list(ranked.iter_from(0)) == expected
+    for position in rng.sample(range(len(expected)), 50):
+        assert ranked[position] == expected[position]
+        assert ranked.index(expected[position]) == position
+
+# Test ranks, ties and updates on a leaderboard
+def test_leaderboard_rank_and_top():
+    board = Leaderboard()
+    board.set(1, 100)
+    board.set(2, 300)
+    board.set(3, 100)
+    assert [(entry.rank, entry.user_id) for entry in board.top(3)] == [(1, 2), (2, 1), (3, 3)]
+    board.set(3, 500)
+    assert board.rank(3).rank == 1
+    assert board.rank(2).rank == 2
+    board.discard(2)
+    assert board.rank(1).rank == 2
+    assert board.rank(2) is None
+
+
+# --- Points Service Tests ---
+# Test that awards increment in SQL, are recorded in the ledger and move the leaderboard
+def test_award_points_updates_ledger_and_leaderboard(db):
+    assert get_leaderboard(db, LeaderboardScope.GLOBAL, user_id=2)["me"].rank == 2
+
+    balance = award_points(db, 2, 50, "donation")
+    assert (balance.current_points, balance.total_points) == (250, 250)
+    balance = award_points(db, 2, -100, "reward redeemed")
+    assert (balance.current_points, balance.total_points) == (150, 250)
+
+    assert [row.amount for row in db.query(PointsTransaction).order_by(PointsTransaction.id)] == [50, -100]
+    leaderboard = get_leaderboard(db, LeaderboardScope.GLOBAL, top=1, user_id=2)
+    assert leaderboard["top"][0].user_id == 2
+    assert leaderboard["me"].points == 250
+    assert get_leaderboard(db, LeaderboardScope.CITY, city="Test City")["size"] == 3
+
+# Test that spending more than the balance is refused without writing to the ledger
+def test_award_points_insufficient_balance(db):
+    with pytest.raises(HTTPException) as exc:
+        award_points(db, 1, -500, "reward redeemed")
+    assert exc.value.status_code == 400
+    assert db.get(User, 1).current_points == 200
+    assert db.query(PointsTransaction).count() == 0
+
+
+# --- Points Routes Tests ---
+# Test for awarding points
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.points.award_points")
+def test_award_points_route(award_points):
+    award_points.return_value.model_dump.return_value = {"user_id": 1, "current_points": 250, "total_points": 250}
+    response = client.post("/points/1", json={"amount": 50, "reason": "donation"}, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["message"] == "Points awarded successfully"
+
+# Test that an overspend keeps its 400
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.points.award_points", side_effect=HTTPException(status_code=400, detail="Insufficient points"))
+def test_award_points_route_insufficient_balance(award_points):
+    response = client.post("/points/1", json={"amount": -500, "reason": "reward redeemed"}, headers=ADMIN_HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Insufficient points"
+
+# Test that awarding points needs the admin token
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.points.award_points")
+def test_award_points_route_needs_token(award_points):
+    assert client.post("/points/1", json={"amount": 50, "reason": "donation"}).status_code == 403
+    award_points.assert_not_called()
+
+# Test that zero and oversized amounts are rejected
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.points.award_points")
+@pytest.mark.parametrize("amount", [0, 10001, -10001])
+def test_award_points_route_invalid_amount(award_points, amount):
+    response = client.post("/points/1", json={"amount": amount, "reason": "donation"}, headers=ADMIN_HEADERS)
+    assert response.status_code == 422
+    award_points.assert_not_called()
+
+# Test for getting the leaderboard service error
+@patch("routers.points.get_leaderboard", side_effect=Exception("Test Exception"))
+def test_get_leaderboard_route_service_error(get_leaderboard):
+    response = client.get("/points/leaderboard")
+    assert response.status_code == 500
+    assert "An error occurred while retrieving the leaderboard" in response.json()["detail"]
@@ -4,12 +4,19 @@ import sys
 # Adjust the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from datetime import datetime
 from unittest.mock import patch, MagicMock
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from main import app 
+from services.pagination import encode_cursor
 
 client = TestClient(app)
 
+
+def user_not_found(db, model, ident):
+    raise HTTPException(status_code=404, detail=f"User not found with ID {ident}")
+
 # Sample kudos data
 sample_kudos = {
     "post_id": 1,
@@ -46,21 +53,21 @@ sample_post_response = {
 
 # Test for creating a post
 @patch("routers.posts.create_post", return_value=sample_post_response)
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 def test_create_post_route(create_post, check_user_exists):
     response = client.post("/posts/", json=sample_post)
     assert response.status_code == 200
     assert response.json()["message"] == "Post created successfully"
     
 # Test for creating a post with non-existent user
-@patch("routers.posts.check_user_exists", return_value=False)
+@patch("routers.posts.get_or_404", side_effect=user_not_found)
 def test_create_post_route_user_not_found(check_user_exists):
     response = client.post("/posts/", json=sample_post)
     assert response.status_code == 404
     assert response.json()["detail"] == "User not found with ID 1"
     
 # Test for creating a post - not created
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 @patch("routers.posts.create_post", return_value=None)
 def test_create_post_route_not_created(check_user_exists, create_post):
     response = client.post("/posts/", json=sample_post)
@@ -69,7 +76,7 @@ def test_create_post_route_not_created(check_user_exists, create_post):
 
 # Test for getting posts by user ID
 @patch("routers.posts.get_posts_by_user_id", return_value=[sample_post_response])
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 def test_get_posts_by_user_id_route(get_posts_by_user_id, check_user_exists):
     response = client.get("/posts/user/1")
     assert response.status_code == 200
@@ -78,20 +85,27 @@ def test_get_posts_by_user_id_route(get_posts_by_user_id, check_user_exists):
     assert response.json()["data"][0]["user_id"] == 1
     
 # Test for getting posts by user ID - user not found
-@patch("routers.posts.check_user_exists", return_value=False)
+@patch("routers.posts.get_or_404", side_effect=user_not_found)
 def test_get_posts_by_user_id_route_user_not_found(check_user_exists):
     response = client.get("/posts/user/1")
     assert response.status_code == 404
     assert response.json()["detail"] == "User not found with ID 1"
     
 # Test for getting posts by user ID - not found
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 @patch("routers.posts.get_posts_by_user_id", return_value=None)
 def test_get_posts_by_user_id_route_not_found(check_user_exists, get_posts_by_user_id):
     response = client.get("/posts/user/1")
     assert response.status_code == 500
     assert "An error occurred while retrieving the posts" in response.json()["detail"]
 
+# Test for getting posts by user ID - invalid cursor
+@patch("routers.posts.get_or_404")
+def test_get_posts_by_user_id_route_invalid_cursor(check_user_exists):
+    response = client.get("/posts/user/1", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
 # Test for deleting a post
 @patch("routers.posts.delete_post", return_value=True)
 @patch("services.post.check_post_exists", return_value=True)
@@ -110,21 +124,21 @@ def test_delete_post_route_not_found(delete_post):
 # Test for adding kudos to a post
 @patch("routers.posts.add_kudos", return_value=sample_kudos_response)
 @patch("services.post.check_post_exists", return_value=True)
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 def test_add_kudos_route(add_kudos, check_post_exists, check_user_exists):
     response = client.post("/posts/1/kudos", json=sample_kudos)
     assert response.status_code == 200
     assert response.json()["message"] == "Kudos added successfully"
     
 # Test for adding kudos to a post - user not found
-@patch("routers.posts.check_user_exists", return_value=False)
+@patch("routers.posts.get_or_404", side_effect=user_not_found)
 def test_add_kudos_route_user_not_found(check_user_exists):
     response = client.post("/posts/1/kudos", json=sample_kudos)
     assert response.status_code == 404
     assert response.json()["detail"] == "User not found with ID 1"
     
 # Test for adding kudos to a post - not found
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 @patch("services.post.check_kudos_exists", return_value=False)
 def test_add_kudos_route_not_added(check_user_exists, check_kudos_exists):
     response = client.post("/posts/1/kudos", json=sample_kudos)
@@ -141,6 +155,15 @@ def test_get_kudos_by_post_id_route(get_kudos_by_post_id, check_post_exists):
     assert response.json()["data"][0]["post_id"] == 1
     assert response.json()["data"][0]["user_id"] == 1
     
+# Test for getting a page of kudos by post ID
+@patch("routers.posts.get_kudos_page", return_value=([sample_kudos_response], None))
+def test_get_kudos_by_post_id_route_paginated(get_kudos_page):
+    response = client.get("/posts/1/kudos", params={"limit": 5})
+    assert response.status_code == 200
+    assert response.json()["data"]["limit"] == 5
+    assert response.json()["data"]["next_cursor"] is None
+    assert len(response.json()["data"]["items"]) == 1
+
 # Test for getting kudos by post ID - not found
 @patch("services.post.check_post_exists", return_value=True)
 @patch("routers.posts.get_kudos_by_post_id", return_value=None)
@@ -152,7 +175,7 @@ def test_get_kudos_by_post_id_route_not_found(check_post_exists, get_kudos_by_po
 # Test for deleting kudos
 @patch("routers.posts.delete_kudos", return_value=True)
 @patch("services.post.check_post_exists", return_value=True)
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 @patch("services.post.check_kudos_exists", return_value=True)
 def test_delete_kudos_route(delete_kudos, check_post_exists, check_user_exists, check_kudos_exists):
     response = client.delete("/posts/1/kudos/1")
@@ -160,14 +183,14 @@ def test_delete_kudos_route(delete_kudos, check_post_exists, check_user_exists,
     assert response.json()["message"] == "Kudos deleted successfully"
     
 # Test for deleting kudos - user not found
-@patch("routers.posts.check_user_exists", return_value=False)
+@patch("routers.posts.get_or_404", side_effect=user_not_found)
 def test_delete_kudos_route_user_not_found(check_user_exists):
     response = client.delete("/posts/1/kudos/1")
     assert response.status_code == 404
     assert response.json()["detail"] == "User not found with ID 1"
     
 # Test for deleting kudos - kudos not found
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 @patch("services.post.check_kudos_exists", return_value=False)
 def test_delete_kudos_route_not_found(check_user_exists, delete_kudos):
     response = client.delete("/posts/1/kudos/1")
@@ -176,24 +199,50 @@ def test_delete_kudos_route_not_found(check_user_exists, delete_kudos):
 
 # Test for getting friends' posts
 @patch("routers.posts.get_friends_posts", return_value=[sample_post_response])
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 def test_get_friends_posts_route(get_friends_posts, check_user_exists):
     response = client.get("/posts/friends/1")
     assert response.status_code == 200
     assert response.json()["data"][0]["content"] == "This is a test post"
     assert response.json()["data"][0]["user_id"] == 1
     
+# Test for getting a page of friends' posts
+@patch("routers.posts.get_posts_page", return_value=([sample_post_response], "next"))
+@patch("routers.posts.get_or_404")
+def test_get_friends_posts_route_paginated(get_or_404, get_posts_page):
+    cursor = encode_cursor(datetime(2024, 6, 1), 1)
+    response = client.get("/posts/friends/1", params={"cursor": cursor})
+    assert response.status_code == 200
+    assert response.json()["data"]["limit"] == 20
+    assert response.json()["data"]["next_cursor"] == "next"
+    assert response.json()["data"]["items"][0]["content"] == "This is a test post"
+    assert get_posts_page.call_args.kwargs["cursor"] == cursor
+
 # Test for getting friends' posts - user not found
-@patch("routers.posts.check_user_exists", return_value=False)
+@patch("routers.posts.get_or_404", side_effect=user_not_found)
 def test_get_friends_posts_route_user_not_found(check_user_exists):
     response = client.get("/posts/friends/1")
     assert response.status_code == 404
     assert response.json()["detail"] == "User not found with ID 1"
     
 # Test for getting friends' posts - not found
-@patch("routers.posts.check_user_exists", return_value=True)
+@patch("routers.posts.get_or_404")
 @patch("routers.posts.get_friends_posts", return_value=None)
 def test_get_friends_posts_route_not_found(check_user_exists, get_friends_posts):
     response = client.get("/posts/friends/1")
     assert response.status_code == 500
-    assert "An error occurred while retrieving the friends' posts" in response.json()["detail"]
\ No newline at end of file
+    assert "An error occurred while retrieving the friends' posts" in response.json()["detail"]
+# Test for adding kudos in batch
+@patch("routers.posts.add_kudos_batch", return_value=[{"index": 0, "status": 200, "id": 1}, {"index": 1, "status": 404, "message": "Post not found with ID 2"}])
+def test_add_kudos_batch_route(add_kudos_batch):
+    response = client.post("/posts/kudos/batch", json=[sample_kudos, {"post_id": 2, "user_id": 1}])
+    assert response.status_code == 200
+    assert response.json()["message"] == "Kudos processed successfully"
+    assert response.json()["data"][1]["status"] == 404
+
+# Test for adding kudos in batch service error
+@patch("routers.posts.add_kudos_batch", side_effect=Exception("Test Exception"))
+def test_add_kudos_batch_route_service_error(add_kudos_batch):
+    response = client.post("/posts/kudos/batch", json=[sample_kudos])
+    assert response.status_code == 500
+    assert "An error occurred while adding kudos" in response.json()["detail"]
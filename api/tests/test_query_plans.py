@@ -0,0 +1,199 @@
+"""Query plan regression tests.
+
+A private database is built by running the Alembic migrations and seeded
+with a few thousand rows. The SQL each hot service function emits is
+captured and EXPLAINed, and the test fails if any table is read with a
+full scan instead of an index.
+
+Runs on in-memory SQLite by default. Point QUERY_PLAN_DATABASE_URL at an
+empty, disposable PostgreSQL database to check the PostgreSQL plans
+instead; all tables in it are dropped at the end.
+"""
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from main import app  # noqa: F401 - registers every model on Base.metadata
+from models.challenge import Challenge
+from models.challenge_user import ChallengeUser
+from models.donation import Donation
+from models.enums import ChallengeStatus, DonationStatus, DonationType, FriendshipStatus
+from models.friend import Friend
+from models.kudos import Kudos
+from models.location_info import LocationInfo, Timeslot
+from models.notification import Notification
+from models.points import PointsTransaction
+from models.post import Post
+from models.user import User
+from services.challenge import calculate_total_contributions, get_challenges_by_user_id, get_challenges_page, get_users_by_challenge_id, get_challenge_participants, get_friends_by_challenge_id
+from services.donation import get_donation_history, get_donation_summary, get_donations_by_user_id, get_friends_donations, get_timeslots_by_location_id, invalidate_donation_summary
+from services.points import get_points_history
+from services.pagination import encode_cursor
+from services.post import get_friends_posts, get_kudos_by_post_id, get_kudos_page, get_posts_by_user_id, get_posts_page
+from services.user import get_friend_requests, get_friends, get_friends_page, get_new_notifications, get_notifications, get_notifications_page
+
+MIGRATIONS = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'migrations'))
+DATABASE_URL = os.getenv("QUERY_PLAN_DATABASE_URL", "sqlite://")
+
+USERS = 500
+NOW = datetime(2024, 6, 1)
+
+
+def seed(connection):
+    rng = random.Random(7)
+    connection.execute(insert(User), [
+        dict(id=i, first_name="Test", last_name="User", username=f"user_{i}", email=f"user_{i}@example.com",
+             password="secure_password", birthdate=datetime(1990, 1, 1), city=f"City {i % 20}",
+             current_points=200, total_points=200, created_at=NOW)
+        for i in range(1, USERS + 1)
+    ])
+    connection.execute(insert(LocationInfo), [
+        dict(id=i, name=f"Location {i}", address=f"Street {i}, City {i}", opening_hours="9:00 AM - 5:00 PM", latitude="52.0", longitude="5.0")
+        for i in range(1, 21)
+    ])
+    connection.execute(insert(Timeslot), [
+        dict(location_id=i % 20 + 1, start_time=NOW + timedelta(hours=i), end_time=NOW + timedelta(hours=i + 1), total_capacity=10, remaining_capacity=10)
+        for i in range(4000)
+    ])
+    connection.execute(insert(Donation), [
+        dict(user_id=i % USERS + 1, location_id=i % 20 + 1, donation_type=DonationType.BLOOD, amount=500.0,
+             appointment=NOW + timedelta(days=rng.randint(-700, 60)), status=DonationStatus.COMPLETED, enable_joining=i % 10 == 0)
+        for i in range(10000)
+    ])
+    connection.execute(insert(Challenge), [
+        dict(id=i, title=f"Challenge {i}", description="Test", location="Test", goal=1000.0,
+             start=NOW - timedelta(days=30), end=NOW + timedelta(days=30), reward_points=50)
+        for i in range(1, 11)
+    ])
+    connection.execute(insert(ChallengeUser), [
+        dict(challenge_id=i % 10 + 1, user_id=i, status=ChallengeStatus.ACTIVE) for i in range(1, USERS + 1)
+    ])
+    connection.execute(insert(Friend), [
+        dict(sender_id=i, receiver_id=(i + offset) % USERS + 1, created_at=NOW,
+             status=FriendshipStatus.ACCEPTED if offset < 4 else FriendshipStatus.PENDING)
+        for i in range(1, USERS + 1) for offset in range(1, 6)
+    ])
+    connection.execute(insert(Post), [
+        dict(id=i, user_id=i % USERS + 1, title="Post", content="Content", created_at=NOW - timedelta(minutes=i), post_type="text")
+        for i in range(1, 5001)
+    ])
+    connection.execute(insert(Kudos), [
+        dict(post_id=i % 5000 + 1, user_id=i % USERS + 1, created_at=NOW) for i in range(10000)
+    ])
+    connection.execute(insert(Notification), [
+        dict(title="Notification", content="Content", user_id=i % USERS + 1, created_at=NOW, retrieved=i % 5 != 0)
+        for i in range(10000)
+    ])
+    connection.execute(insert(PointsTransaction), [
+        dict(user_id=i % USERS + 1, amount=10, reason="donation", created_at=NOW) for i in range(5000)
+    ])
+
+
+@pytest.fixture(scope="module")
+def engine():
+    if DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(DATABASE_URL, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(DATABASE_URL)
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS)
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+        connection.commit()
+    with engine.begin() as connection:
+        seed(connection)
+        connection.execute(text("ANALYZE"))
+
+    yield engine
+
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.downgrade(config, "base")
+        connection.commit()
+    engine.dispose()
+
+
+def full_scans(engine, statement, parameters) -> list[str]:
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            # "SCAN <table>" reads every row; scans of subquery results are fine
+            return [row[3] for row in plan if row[3].startswith("SCAN ") and row[3].split()[1] in Base.metadata.tables]
+        # With sequential scans priced out, a Seq Scan in the plan means no index can serve the query
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        plan = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).all()
+        return [row[0].strip() for row in plan if "Seq Scan" in row[0]]
+
+
+HOT_QUERIES = {
+    "get_donations_by_user_id": lambda db: get_donations_by_user_id(db, 42),
+    "get_donation_history": lambda db: get_donation_history(db, 42, limit=5, cursor=get_donation_history(db, 42, limit=5)[1]),
+    "get_donation_summary": lambda db: invalidate_donation_summary(42) or get_donation_summary(db, 42),
+    "get_friends_donations": lambda db: get_friends_donations(db, 42),
+    "calculate_total_contributions": lambda db: calculate_total_contributions(db, 3, NOW - timedelta(days=30), NOW + timedelta(days=30)),
+    "get_challenges_by_user_id": lambda db: get_challenges_by_user_id(db, 42),
+    # the first page reads the primary key in order, which SQLite reports as a scan
+    "get_challenges_page": lambda db: get_challenges_page(db, limit=2, cursor=encode_cursor(1)),
+    "get_users_by_challenge_id": lambda db: get_users_by_challenge_id(db, 3),
+    "get_challenge_participants": lambda db: get_challenge_participants(db, 3, limit=5, cursor=get_challenge_participants(db, 3, limit=5)[1]),
+    "get_friends_by_challenge_id": lambda db: get_friends_by_challenge_id(db, 3, 42),
+    "get_friends": lambda db: get_friends(db, 42),
+    "get_friends_page": lambda db: get_friends_page(db, 42, limit=2, cursor=get_friends_page(db, 42, limit=2)[1]),
+    "get_friend_requests": lambda db: get_friend_requests(db, 42),
+    "get_posts_by_user_id": lambda db: get_posts_by_user_id(db, 42),
+    "get_posts_page": lambda db: get_posts_page(db, 42, limit=2, cursor=get_posts_page(db, 42, limit=2)[1]),
+    "get_friends_posts": lambda db: get_friends_posts(db, 42),
+    "get_kudos_by_post_id": lambda db: get_kudos_by_post_id(db, 42),
+    "get_kudos_page": lambda db: get_kudos_page(db, 42, limit=2, cursor=get_kudos_page(db, 42, limit=2)[1]),
+    "get_notifications": lambda db: get_notifications(db, 42),
+    "get_notifications_page": lambda db: get_notifications_page(db, 42, limit=2, cursor=get_notifications_page(db, 42, limit=2)[1]),
+    "get_new_notifications": lambda db: get_new_notifications(db, 46),
+    "get_timeslots_by_location_id": lambda db: get_timeslots_by_location_id(db, 7),
+    "get_points_history": lambda db: get_points_history(db, 42),
+}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+def test_hot_query_uses_indexes(engine, name):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    db = sessionmaker(bind=engine)()
+    try:
+        HOT_QUERIES[name](db)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+        db.rollback()
+        db.close()
+
+    assert statements, f"{name} did not run any SELECT"
+    for statement, parameters in statements:
+        scans = full_scans(engine, statement, parameters)
+        assert not scans, f"{name} regressed to a full scan: {scans}\n{statement}"
+
+
+# Test that the models and the migrations describe the same schema
+def test_migrations_match_models(engine):
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"compare_type": True})
+        assert compare_metadata(context, Base.metadata) == []
@@ -0,0 +1,104 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from main import app
+from models.user import User
+from services.query_profiler import QueryProfiler, QueryRouteMiddleware, current_route, fingerprint, redact
+from services.repository import get_many
+
+client = TestClient(app)
+
+
+# --- Query Profiler Tests ---
+# Test that literals, parameters and lists are normalized away
+def test_fingerprint():
+    assert fingerprint("SELECT users.id FROM users\n  WHERE users.id IN (?, ?, ?) AND users.city = 'Utrecht' LIMIT ? OFFSET 10") == (
+        "SELECT users.id FROM users WHERE users.id IN (...) AND users.city = ? LIMIT ? OFFSET ?"
+    )
+    assert fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)") == fingerprint("INSERT INTO t (a, b) VALUES (?, ?)")
+    assert fingerprint("SELECT a::text FROM t_1 WHERE a = %(a_1)s") == "SELECT a::text FROM t_1 WHERE a = ?"
+
+# Test that only the shape of the parameters is kept
+def test_redact():
+    assert redact(("secret", 42)) == ["str", "int"]
+    assert redact({"email": "user@example.com"}) == {"email": "str"}
+    assert redact([("a", 1), ("b", 2)]) == {"rows": 2, "first": ["str", "int"]}
+
+# Test that statements are aggregated by fingerprint and slow ones sampled
+def test_query_profiler_report(db):
+    profiler = QueryProfiler(slow_ms=0, explain=True)
+    profiler.install(db.get_bind())
+
+    token = current_route.set("GET /users/ids")
+    try:
+        get_many(db, User, [1, 2])
+        db.expunge_all()
+        get_many(db, User, [1, 2, 3])
+    finally:
+        current_route.reset(token)
+
+    report = profiler.report()
+    assert report["fingerprints"] == 1
+    statement = report["statements"][0]
+    assert (statement["calls"], statement["slow"]) == (2, 2)
+    assert "IN (...)" in statement["fingerprint"]
+
+    sample = report["slow_samples"][0]
+    assert sample["route"] == "GET /users/ids"
+    assert sample["parameters"] == ["int", "int", "int"]
+    assert any("users" in line for line in sample["plan"])
+
+    profiler.reset()
+    assert profiler.report()["statements"] == []
+
+# Test that statements below the threshold are counted but not sampled
+def test_query_profiler_threshold(db):
+    profiler = QueryProfiler(slow_ms=60_000)
+    profiler.install(db.get_bind())
+    get_many(db, User, [1])
+    report = profiler.report()
+    assert report["statements"][0]["slow"] == 0
+    assert report["slow_samples"] == []
+
+# Test that the middleware tags the request on the worker thread of a sync route
+def test_query_route_middleware():
+    tagged = FastAPI()
+    tagged.add_middleware(QueryRouteMiddleware)
+
+    @tagged.get("/tagged/{item_id}")
+    def read_tagged(item_id: int):
+        return current_route.get()
+
+    assert TestClient(tagged).get("/tagged/7").json() == "GET /tagged/7"
+    assert current_route.get() is None
+
+
+# --- Debug Routes Tests ---
+# Test for retrieving the query report
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.debug.query_profiler.report", return_value={"slow_ms": 100.0, "statements": [], "fingerprints": 0, "slow_samples": []})
+def test_read_query_report_route(report):
+    response = client.get("/debug/queries?limit=5&sort=max_ms", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["message"] == "Query report retrieved successfully"
+    assert report.call_args.kwargs == {"limit": 5, "sort": "max_ms"}
+
+# Test for retrieving the query report with an unknown sort
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+def test_read_query_report_route_unknown_sort():
+    response = client.get("/debug/queries?sort=rows", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 422
+
+# Test that the query report and its reset need the admin token
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.debug.query_profiler.reset")
+def test_query_report_routes_need_token(reset):
+    assert client.get("/debug/queries").status_code == 403
+    assert client.delete("/debug/queries", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    reset.assert_not_called()
@@ -0,0 +1,92 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from main import app
+from services.rate_limit import MemoryBucketStore, RateLimit, parse_limits
+
+client = TestClient(app)
+
+LIMIT = RateLimit(rate=2.0, burst=3)
+
+
+# --- Rate Limit Tests ---
+# Test that a bucket allows its burst and then refills at its rate
+def test_memory_bucket_store():
+    store = MemoryBucketStore()
+    assert [store.take("a", LIMIT, now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take("a", LIMIT, now=0.0) == 0.5
+    assert store.take("a", LIMIT, now=0.25) == 0.25
+    assert store.take("a", LIMIT, now=0.5) == 0.0
+    # other keys have their own bucket
+    assert store.take("b", LIMIT, now=0.5) == 0.0
+
+# Test that the least recently used bucket is evicted
+def test_memory_bucket_store_eviction():
+    store = MemoryBucketStore(max_keys=2)
+    for _ in range(3):
+        store.take("a", LIMIT, now=0.0)
+        store.take("b", LIMIT, now=0.0)
+    store.take("a", LIMIT, now=0.0)
+    store.take("c", LIMIT, now=0.0)
+    assert len(store) == 2
+    # both were emptied, "a" was used after "b", so "b" was evicted and comes back full
+    assert store.take("a", LIMIT, now=0.0) > 0
+    assert store.take("b", LIMIT, now=0.0) == 0.0
+
+# Test parsing the RATE_LIMITS setting
+def test_parse_limits():
+    assert parse_limits("login=0.05:3, notifications=2:20,") == {
+        "login": RateLimit(rate=0.05, burst=3),
+        "notifications": RateLimit(rate=2.0, burst=20),
+    }
+
+
+# --- Rate Limit Routes Tests ---
+# Test that a polling user is limited with a Retry-After
+@patch("services.rate_limit.bucket_store", MemoryBucketStore())
+@patch.dict("services.rate_limit.LIMITS", {"notifications": RateLimit(rate=0.5, burst=2)})
+@patch("routers.users.get_new_notifications", return_value=[])
+def test_rate_limit_route(get_new_notifications):
+    assert [client.get("/users/1/new-notifications").status_code for _ in range(3)] == [200, 200, 429]
+    response = client.get("/users/1/new-notifications")
+    assert response.json()["detail"] == "Too many requests"
+    assert response.headers["Retry-After"] == "2"
+    assert client.get("/users/2/new-notifications").status_code == 200
+# Test that the home screen shares the notifications bucket, so it cannot be polled around the limit
+@patch("services.rate_limit.bucket_store", MemoryBucketStore())
+@patch.dict("services.rate_limit.LIMITS", {"notifications": RateLimit(rate=0.5, burst=2)})
+@patch("routers.users.get_new_notifications", return_value=[])
+@patch("routers.home.mark_home_notifications_retrieved")
+@patch("routers.home.load_home_sections", return_value={})
+@patch("routers.home.get_or_404")
+def test_rate_limit_home_route(get_or_404, load_home_sections, mark_home_notifications_retrieved, get_new_notifications):
+    get_or_404.return_value = MagicMock(id=1, first_name="Test", last_name="User", username="test_user", email="test@example.com", birthdate="2000-01-01T00:00:00", city="Test City", current_points=0, total_points=0, role="user", created_at="2021-01-01T00:00:00")
+    assert client.get("/users/1/new-notifications").status_code == 200
+    assert client.get("/home/1").status_code == 200
+    assert client.get("/home/1").status_code == 429
+    assert client.get("/users/1/new-notifications").status_code == 429
+
+
+# Test that one address is limited across users
+@patch("services.rate_limit.bucket_store", MemoryBucketStore())
+@patch("services.rate_limit.RATE_LIMIT_IP_FACTOR", 1.5)
+@patch.dict("services.rate_limit.LIMITS", {"friends_posts": RateLimit(rate=0.5, burst=2)})
+@patch("routers.posts.get_friends_posts", return_value=[])
+@patch("routers.posts.get_or_404")
+def test_rate_limit_route_per_address(get_or_404, get_friends_posts):
+    statuses = [client.get(f"/posts/friends/{user_id}").status_code for user_id in (1, 2, 3, 4)]
+    assert statuses == [200, 200, 200, 429]
+
+# Test that limits can be switched off
+@patch("services.rate_limit.RATE_LIMIT_ENABLED", False)
+@patch("services.rate_limit.bucket_store", MemoryBucketStore())
+@patch.dict("services.rate_limit.LIMITS", {"login": RateLimit(rate=0.1, burst=1)})
+@patch("routers.users.get_user_by_email_and_password", side_effect=Exception("Invalid password"))
+def test_rate_limit_route_disabled(get_user_by_email_and_password):
+    statuses = [client.get("/users/email/user_1@example.com?password=wrong").status_code for _ in range(3)]
+    assert statuses == [500, 500, 500]
@@ -0,0 +1,140 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from models.eligibility import DonorEligibility
+from models.location_info import LocationInfo
+from models.notification import Notification
+from models.user import User
+from schemas.recall import RecallRequest, RecallResult
+from services.recall import DonorIndex, donor_index, select_recall_donors, send_recall
+
+client = TestClient(app)
+
+ADMIN_HEADERS = {"X-Admin-Token": "secret"}
+RECALL = {"blood_types": ["O-"], "title": "O- needed", "content": "Please book an appointment"}
+
+
+@pytest.fixture(autouse=True)
+def reset_donor_index():
+    donor_index.invalidate()
+    yield
+    donor_index.invalidate()
+
+
+def seed_donors(db):
+    """Users 1-3 from the fixture plus 4-6, with blood types, cities and donation history."""
+    now = datetime.now()
+    for user_id in (4, 5, 6):
+        db.add(User(
+            id=user_id, first_name="Test", last_name=f"User {user_id}", username=f"user_{user_id}", email=f"user_{user_id}@example.com",
+            password="secure_password", birthdate=datetime(2000, 1, 1), city="Utrecht",
+        ))
+    db.flush()
+    for user_id, blood_type in ((1, "O-"), (2, "o-"), (3, "A+"), (4, "O-"), (5, "O-"), (6, None)):
+        db.get(User, user_id).blood_type = blood_type
+    # user 2 is waiting after a recent donation, users 4 and 5 donated earlier and are eligible again
+    db.add(DonorEligibility(user_id=2, donation_type="blood", last_donation_at=now - timedelta(days=10), next_eligible_at=now + timedelta(days=46)))
+    db.add(DonorEligibility(user_id=4, donation_type="blood", last_donation_at=now - timedelta(days=100), next_eligible_at=now - timedelta(days=44)))
+    db.add(DonorEligibility(user_id=5, donation_type="blood", last_donation_at=now - timedelta(days=400), next_eligible_at=now - timedelta(days=344)))
+    db.add(LocationInfo(id=1, name="Utrecht", address="Plesmanlaan 125, Utrecht", opening_hours="9:00 AM - 5:00 PM", latitude="52.0907", longitude="5.1214"))
+    db.add(LocationInfo(id=2, name="Test City", address="Main Street 1, Test City", opening_hours="9:00 AM - 5:00 PM", latitude="52.3676", longitude="4.9041"))
+    db.commit()
+
+
+def recall(**kwargs) -> RecallRequest:
+    return RecallRequest(**{"blood_types": ["O-"], "title": "O- needed", "content": "Please book an appointment", **kwargs})
+
+def matched_ids(db, request: RecallRequest) -> list[int]:
+    index, mask = select_recall_donors(db, request)
+    return list(index.user_ids_of(mask))
+
+
+# --- Donor Index Tests ---
+# Test that bitmaps map back to the right user IDs
+def test_donor_index_bitmaps(db):
+    seed_donors(db)
+    index = DonorIndex(db)
+    assert list(index.user_ids_of(index.blood_types["O-"])) == [1, 2, 4, 5]
+    assert list(index.user_ids_of(index.cities["UTRECHT"])) == [4, 5, 6]
+    assert list(index.user_ids_of(index.donated_since(datetime.now() - timedelta(days=200)))) == [2, 4]
+
+# Test that blood type, eligibility, city and recency filters combine
+def test_select_recall_donors(db):
+    seed_donors(db)
+    assert matched_ids(db, recall()) == [1, 4, 5]
+    assert matched_ids(db, recall(city="utrecht")) == [4, 5]
+    assert matched_ids(db, recall(donated_within_days=200)) == [4]
+    assert matched_ids(db, recall(blood_types=["O-", "A+"], city="Test City")) == [1, 3]
+    # Test City is about 40 km from the Utrecht location
+    assert matched_ids(db, recall(location_id=1, radius_km=10)) == [4, 5]
+    assert matched_ids(db, recall(location_id=1, radius_km=50)) == [1, 4, 5]
+
+# Test that a recall streams notifications to the matched donors only
+def test_send_recall(db):
+    seed_donors(db)
+    assert send_recall(db, recall(dry_run=True)).notified == 0
+    assert db.query(Notification).count() == 0
+
+    result = send_recall(db, recall(limit=2))
+    assert (result.matched, result.notified) == (3, 2)
+    assert [notification.user_id for notification in db.query(Notification).order_by(Notification.user_id)] == [1, 4]
+
+# Test that a user update is visible to the next recall
+def test_donor_index_invalidated_by_user_update(db):
+    from schemas.user import UserUpdate
+    from services.user import update_user
+
+    seed_donors(db)
+    assert matched_ids(db, recall(city="Utrecht")) == [4, 5]
+    update_user(db, 1, UserUpdate(city="Utrecht"))
+    assert matched_ids(db, recall(city="Utrecht")) == [1, 4, 5]
+
+
+# Test that an index that was being built when a write invalidated it is not kept
+def test_donor_index_invalidated_during_build(db):
+    seed_donors(db)
+
+    def build_during_write(db):
+        index = DonorIndex(db)
+        donor_index.invalidate()
+        return index
+
+    with patch("services.recall.DonorIndex", side_effect=build_during_write):
+        first = donor_index.get(db)
+    assert donor_index.get(db) is not first
+    assert donor_index.get(db) is donor_index.get(db)
+
+
+# --- Recall Routes Tests ---
+# Test for sending a recall
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.recall.send_recall", return_value=RecallResult(matched=3, notified=3, selection_ms=0.1))
+def test_send_recall_route(send_recall):
+    response = client.post("/recall/", json=RECALL, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["data"]["notified"] == 3
+    assert response.json()["message"] == "Recall sent successfully"
+
+# Test for sending a recall service error
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.recall.send_recall", side_effect=Exception("Test Exception"))
+def test_send_recall_route_service_error(send_recall):
+    response = client.post("/recall/", json=RECALL, headers=ADMIN_HEADERS)
+    assert response.status_code == 500
+    assert "An error occurred while sending the recall" in response.json()["detail"]
+
+# Test that recalls need the admin token
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.recall.send_recall")
+def test_send_recall_route_needs_token(send_recall):
+    assert client.post("/recall/", json=RECALL).status_code == 403
+    assert client.post("/recall/", json=RECALL, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    send_recall.assert_not_called()
@@ -0,0 +1,32 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from fastapi import HTTPException
+from models.user import User
+from services.repository import get_or_404, get_many
+
+
+# Test that a second lookup of the same row is served from the identity map
+def test_get_or_404_reuses_loaded_row(db):
+    first = get_or_404(db, User, 1)
+    second = get_or_404(db, User, 1)
+    assert first is second
+    assert len(db.statements) == 1
+
+# Test that an unknown ID raises a 404 with the model name in the message
+def test_get_or_404_not_found(db):
+    with pytest.raises(HTTPException) as exc:
+        get_or_404(db, User, 999)
+    assert exc.value.status_code == 404
+    assert exc.value.detail == "User not found with ID 999"
+
+# Test that get_many keeps request order, skips unknown IDs and only loads missing rows
+def test_get_many_single_query(db):
+    get_or_404(db, User, 2)
+    users = get_many(db, User, [3, 999, 2, 1, 3])
+    assert [user.id for user in users] == [3, 2, 1]
+    assert len(db.statements) == 2
+    assert " IN " in db.statements[1]
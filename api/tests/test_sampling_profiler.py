@@ -0,0 +1,119 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import time
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from main import app
+from services.sampling_profiler import SamplingProfiler
+
+client = TestClient(app)
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+def spin(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=spin, args=(stop,))
+    thread.start()
+    return stop, thread
+
+
+# --- Sampling Profiler Tests ---
+# Test that a capture collects the collapsed stacks of threads inside the roots
+def test_sampling_profiler_capture():
+    profiler = SamplingProfiler(interval=0.001, roots=(TESTS_DIR,))
+    stop, thread = busy_thread()
+    try:
+        profile = profiler.capture(0.2)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert profile.samples > 10
+    # trimmed to start at the outermost frame under the roots
+    stack, count = next((stack, count) for stack, count in profile.stacks.most_common() if stack.startswith("test_sampling_profiler:spin"))
+    assert count > 10
+    assert f"{stack} {count}\n" in profile.collapsed()
+    assert not any("threading:_bootstrap" in stack for stack in profile.stacks)
+
+# Test that threads outside the roots are not sampled
+def test_sampling_profiler_ignores_other_threads():
+    profiler = SamplingProfiler(interval=0.001, roots=("/nonexistent/",))
+    stop, thread = busy_thread()
+    try:
+        profile = profiler.capture(0.05)
+    finally:
+        stop.set()
+        thread.join()
+    assert profile.samples > 0
+    assert not profile.stacks
+
+# Test that a capture ended while a sample is being taken is not changed by that sample
+def test_sampling_profiler_end_freezes_profile():
+    class SlowProfiler(SamplingProfiler):
+        def sample(self):
+            time.sleep(0.02)
+            return ["route"]
+
+    profiler = SlowProfiler(interval=0.001)
+    other = profiler.begin()
+    try:
+        capture = profiler.begin()
+        time.sleep(0.05)
+        profile = profiler.end(capture)
+        samples = profile.samples
+        time.sleep(0.05)
+        assert profile.samples == samples == profile.stacks["route"]
+    finally:
+        profiler.end(other)
+
+# Test that continuous profiling keeps a bounded buffer of closed windows
+def test_sampling_profiler_ring_buffer():
+    profiler = SamplingProfiler(interval=0.001, window=0.02, history=3, roots=(TESTS_DIR,))
+    profiler.start()
+    try:
+        time.sleep(0.3)
+    finally:
+        profiler.stop()
+    recent = profiler.recent()
+    assert len(recent) == 3
+    assert recent[0].started_at >= recent[-1].started_at
+    assert all(profile.seconds >= 0.02 for profile in recent)
+
+
+# --- Sampling Profiler Routes Tests ---
+# Test that the profile endpoints are off without an admin token
+def test_read_profile_route_disabled():
+    response = client.get("/debug/profile?seconds=0.01")
+    assert response.status_code == 404
+
+# Test that the profile endpoints need the admin token
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+def test_read_profile_route_forbidden():
+    response = client.get("/debug/profile?seconds=0.01", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+
+# Test for capturing a profile
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+def test_read_profile_route():
+    response = client.get("/debug/profile?seconds=0.05", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert int(response.headers["X-Profile-Samples"]) > 0
+
+# Test for listing the recent profiles
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+def test_read_recent_profiles_route():
+    response = client.get("/debug/profile/recent", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["data"] == {"running": False, "profiles": []}
+    assert client.get("/debug/profile/recent/0", headers={"X-Admin-Token": "secret"}).status_code == 404
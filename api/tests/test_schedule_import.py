@@ -0,0 +1,106 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+from datetime import date, datetime
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from main import app
+from models.location_info import LocationInfo, Timeslot
+from models.stats import StatsDirtyDay
+from schemas.donation import ScheduleImportResult
+from services.schedule_import import import_schedule
+
+client = TestClient(app)
+
+CSV_HEADER = "name,address,opening_hours,latitude,longitude,start_time,end_time,total_capacity,remaining_capacity\n"
+
+
+def csv_row(name, start, total=10, remaining="", end=None):
+    end = end or start.replace(hour=start.hour + 1)
+    return f"{name},{name} 1,9:00 AM - 5:00 PM,52.0,5.0,{start.isoformat()},{end.isoformat()},{total},{remaining}\n"
+
+def schedule_csv(*rows) -> list[str]:
+    return (CSV_HEADER + "".join(rows)).splitlines(keepends=True)
+
+
+# --- Schedule Import Tests ---
+# Test that a CSV schedule creates locations and timeslots in chunks
+def test_import_csv_schedule(db):
+    rows = [csv_row(name, datetime(2024, 3, day, hour)) for name in ("Utrecht", "Leiden") for day in (1, 2) for hour in (9, 10, 11)]
+    result = import_schedule(db, schedule_csv(*rows), "csv", chunk_size=4)
+
+    assert (result.locations, result.timeslots, result.rejected) == (2, 12, 0)
+    assert db.query(LocationInfo).count() == 2
+    assert db.query(Timeslot).count() == 12
+    assert {row.day for row in db.query(StatsDirtyDay)} == {date(2024, 3, 1), date(2024, 3, 2)}
+
+# Test that a re-import updates existing slots and keeps their bookings
+def test_import_schedule_upserts(db):
+    start = datetime(2024, 3, 1, 9)
+    import_schedule(db, schedule_csv(csv_row("Utrecht", start)), "csv")
+    timeslot = db.query(Timeslot).one()
+    timeslot.remaining_capacity = 7
+    db.commit()
+
+    result = import_schedule(db, schedule_csv(csv_row("Utrecht", start, total=20), csv_row("Utrecht", start.replace(hour=10))), "csv")
+    assert result.timeslots == 2
+    db.expire_all()
+    assert db.query(LocationInfo).count() == 1
+    updated = db.query(Timeslot).filter(Timeslot.start_time == start).one()
+    assert (updated.id, updated.total_capacity, updated.remaining_capacity) == (timeslot.id, 20, 17)
+
+# Test that invalid records are reported with their line and skipped
+def test_import_schedule_rejects_invalid_records(db):
+    rows = [
+        csv_row("Utrecht", datetime(2024, 3, 1, 9)),
+        csv_row("Utrecht", datetime(2024, 3, 1, 10), end=datetime(2024, 3, 1, 9)),
+        csv_row("Utrecht", datetime(2024, 3, 1, 11), total=5, remaining=6),
+        ",no name,9:00 AM - 5:00 PM,52.0,5.0,,,,\n",
+        "Utrecht,Utrecht 1,9:00 AM - 5:00 PM,52.0,5.0,tomorrow,,1,\n",
+    ]
+    result = import_schedule(db, schedule_csv(*rows), "csv")
+    assert (result.timeslots, result.rejected) == (1, 4)
+    assert [(error.line, error.message) for error in result.errors[:3]] == [
+        (3, "Timeslot must end after it starts"),
+        (4, "Remaining capacity must be between 0 and total capacity"),
+        (5, "Missing name"),
+    ]
+
+# Test a JSON Lines schedule in the shape of the location create body
+def test_import_jsonl_schedule(db):
+    location = {"name": "Leiden", "address": "Leiden 1", "opening_hours": "9:00 AM - 5:00 PM", "latitude": 52.16, "longitude": 4.49}
+    lines = [
+        json.dumps({**location, "timeslots": [
+            {"start_time": "2024-03-01T09:00:00", "end_time": "2024-03-01T10:00:00", "total_capacity": 10, "remaining_capacity": 10},
+            {"start_time": "2024-03-01T10:00:00", "end_time": "2024-03-01T11:00:00", "total_capacity": 10},
+        ]}) + "\n",
+        "\n",
+        json.dumps({**location, "name": "Delft"}) + "\n",
+        "{not json\n",
+    ]
+    result = import_schedule(db, lines, "jsonl")
+    assert (result.locations, result.timeslots, result.rejected) == (2, 2, 1)
+    assert result.errors[0].line == 4
+    assert db.query(LocationInfo).filter(LocationInfo.name == "Leiden").one().latitude == "52.16"
+
+
+# --- Schedule Import Routes Tests ---
+# Test for importing a schedule file
+@patch("routers.donations.import_schedule", return_value=ScheduleImportResult(locations=1, timeslots=2, rejected=0, errors=[], seconds=0.01, timeslots_per_second=200.0))
+def test_import_schedule_route(import_schedule):
+    response = client.post("/donations/location/import", files={"file": ("schedule.csv", CSV_HEADER.encode(), "text/csv")})
+    assert response.status_code == 200
+    assert response.json()["data"]["timeslots"] == 2
+    assert response.json()["message"] == "Schedule imported successfully"
+    assert import_schedule.call_args.args[2] == "csv"
+
+# Test for importing a schedule service error
+@patch("routers.donations.import_schedule", side_effect=Exception("Test Exception"))
+def test_import_schedule_route_service_error(import_schedule):
+    response = client.post("/donations/location/import?format=jsonl", files={"file": ("schedule.txt", b"{}", "text/plain")})
+    assert response.status_code == 500
+    assert "An error occurred while importing the schedule" in response.json()["detail"]
@@ -0,0 +1,60 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from main import app
+from services.startup import StartupTimings, prefill_pool, warm_up
+
+client = TestClient(app)
+
+
+# --- Startup Tests ---
+# Test that phases are timed in order and repeated phases add up
+def test_startup_timings():
+    timings = StartupTimings()
+    with timings.phase("first"):
+        pass
+    timings.import_module("json")
+    with timings.phase("first"):
+        pass
+    report = timings.as_dict()
+    assert list(report["phases_ms"]) == ["first", "import json"]
+    assert report["total_ms"] >= 0
+
+# Test that the pool is filled up to its size and left idle
+def test_prefill_pool():
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=3)
+    assert prefill_pool(engine, connections=10) == 3
+    assert (engine.pool.checkedin(), engine.pool.checkedout()) == (3, 0)
+    engine.dispose()
+
+# Test that pools without a fixed size are left alone
+def test_prefill_pool_other_pool():
+    engine = create_engine("sqlite://")
+    assert prefill_pool(engine, connections=3) == 0
+    engine.dispose()
+
+# Test that the warm-up records every phase
+def test_warm_up(db):
+    timings = StartupTimings()
+    warm_up(app, db.get_bind(), timings)
+    assert list(timings.phases) == ["configure mappers", "build openapi", "prefill pool"]
+
+
+# --- Startup Routes Tests ---
+# Test for retrieving the startup timings
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+def test_read_startup_timings_route():
+    response = client.get("/debug/startup", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert "import routers.users" in response.json()["data"]["phases_ms"]
+
+# Test that the startup timings are off without an admin token
+def test_read_startup_timings_route_disabled():
+    assert client.get("/debug/startup").status_code == 404
@@ -0,0 +1,193 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from main import app
+from models.challenge import Challenge
+from models.donation import DonationDailyStats
+from models.enums import DonationStatus, DonationType
+from models.location_info import LocationInfo
+from models.stats import ChallengeStats, StatsDirtyDay
+from schemas.donation import DonationCreate, Timeslot
+from services.challenge import add_user_to_challenge
+from services.donation import create_donation, create_timeslots, delete_donation
+from services.stats import (
+    mark_stats_dirty,
+    refresh_stats,
+    refresh_stale_stats,
+    rebuild_stats,
+    donations_per_location_per_day,
+    timeslot_fill_rates,
+    cancellation_rates,
+    challenge_goal_attainment,
+)
+
+client = TestClient(app)
+
+ADMIN_HEADERS = {"X-Admin-Token": "secret"}
+
+DAY = datetime(2024, 3, 1, 10, 0)
+
+
+def seed(db):
+    db.add(LocationInfo(id=1, name="Utrecht", address="Plesmanlaan 125, Utrecht", opening_hours="9:00 AM - 5:00 PM", latitude="52.0907", longitude="5.1214"))
+    db.add(Challenge(id=1, title="March", description="Donate in March", location="Utrecht", goal=1000.0, start=DAY, end=DAY + timedelta(days=30)))
+    db.commit()
+
+def donate(db, appointment, status=DonationStatus.COMPLETED, amount=500.0, user_id=1):
+    return create_donation(db, DonationCreate(
+        amount=amount, user_id=user_id, location_id=1, donation_type=DonationType.BLOOD,
+        appointment=appointment, status=status, enable_joining=False,
+    ))
+
+
+# --- Rollup Tests ---
+# Test that writes queue their days and a refresh only recomputes those
+def test_refresh_stats_dirty_days(db):
+    seed(db)
+    donate(db, DAY)
+    donate(db, DAY + timedelta(days=1), status=DonationStatus.CANCELLED, amount=0.0)
+    assert {row.day for row in db.query(StatsDirtyDay)} == {DAY.date(), DAY.date() + timedelta(days=1)}
+
+    assert refresh_stats(db) == {"days": 2, "challenges": 1}
+    assert db.query(StatsDirtyDay).count() == 0
+    assert db.query(DonationDailyStats).count() == 2
+    assert refresh_stats(db) == {"days": 0, "challenges": 0}
+
+    donation = donate(db, DAY, amount=250.0)
+    delete_donation(db, donation.id)
+    assert refresh_stats(db)["days"] == 1
+    assert db.query(DonationDailyStats).filter(DonationDailyStats.day == DAY.date()).one().donations == 1
+
+# Test that a day queued again while a refresh recomputes it stays queued for the next refresh
+def test_refresh_stats_keeps_day_queued_during_refresh(db):
+    import services.stats
+
+    seed(db)
+    donate(db, DAY)
+    write_donation_stats = services.stats.write_donation_stats
+
+    def concurrent_write(db, since, until):
+        rows = write_donation_stats(db, since, until)
+        mark_stats_dirty(db, [DAY])
+        return rows
+
+    with patch("services.stats.write_donation_stats", side_effect=concurrent_write):
+        assert refresh_stats(db)["days"] == 1
+    assert [row.day for row in db.query(StatsDirtyDay)] == [DAY.date()]
+
+# Test that reads of fresh rollups do not refresh
+def test_refresh_stale_stats(db):
+    seed(db)
+    donate(db, DAY)
+    assert refresh_stale_stats(db) == {"days": 1, "challenges": 1}
+    db.statements.clear()
+    assert refresh_stale_stats(db) is None
+    assert not any(statement.lstrip().upper().startswith(("DELETE", "INSERT")) for statement in db.statements)
+
+# Test that queueing a day another transaction already queued is not a key violation
+def test_mark_stats_dirty_queued_day(db):
+    db.add(StatsDirtyDay(day=DAY.date()))
+    db.commit()
+    db.statements.clear()
+    mark_stats_dirty(db, [DAY, DAY + timedelta(days=1)])
+    db.commit()
+    assert len(db.statements) == 1 and "DO NOTHING" in db.statements[0]
+    assert {row.day for row in db.query(StatsDirtyDay)} == {DAY.date(), DAY.date() + timedelta(days=1)}
+
+# Test the vectorized donation and timeslot reports
+def test_donation_and_timeslot_reports(db):
+    seed(db)
+    donate(db, DAY)
+    donate(db, DAY, status=DonationStatus.PENDING, user_id=2)
+    donate(db, DAY + timedelta(days=1), status=DonationStatus.CANCELLED, amount=0.0)
+    create_timeslots(db, 1, [
+        Timeslot(start_time=DAY, end_time=DAY + timedelta(hours=1), total_capacity=10, remaining_capacity=4),
+        Timeslot(start_time=DAY + timedelta(days=1), end_time=DAY + timedelta(days=1, hours=1), total_capacity=10, remaining_capacity=10),
+    ])
+    refresh_stats(db)
+
+    assert donations_per_location_per_day(db) == [
+        {"day": DAY.date(), "location_id": 1, "donations": 2, "completed": 1, "amount": 500.0},
+        {"day": DAY.date() + timedelta(days=1), "location_id": 1, "donations": 1, "completed": 0, "amount": 0.0},
+    ]
+    assert len(donations_per_location_per_day(db, since=DAY.date() + timedelta(days=1))) == 1
+    assert timeslot_fill_rates(db) == [{"location_id": 1, "timeslots": 2, "capacity": 20, "booked": 6, "fill_rate": 0.3}]
+
+    rates = cancellation_rates(db)
+    assert rates["total"] == 3
+    assert rates["by_status"]["cancelled"] == {"count": 1, "rate": 0.3333}
+    assert rates["by_status"]["completed"]["count"] == 1
+
+# Test that challenge contributions follow participants and the challenge window
+def test_challenge_goal_attainment(db):
+    seed(db)
+    donate(db, DAY + timedelta(days=2))
+    donate(db, DAY - timedelta(days=2))
+    donate(db, DAY + timedelta(days=3), user_id=2)
+    refresh_stats(db)
+    assert challenge_goal_attainment(db)[0]["contributed"] == 0.0
+
+    add_user_to_challenge(db, 1, 1)
+    assert db.query(ChallengeStats).count() == 0
+    refresh_stats(db)
+    assert challenge_goal_attainment(db) == [
+        {"challenge_id": 1, "title": "March", "goal": 1000.0, "contributed": 500.0, "attainment": 0.5, "reached": False},
+    ]
+
+    donate(db, DAY + timedelta(days=4))
+    refresh_stats(db)
+    assert challenge_goal_attainment(db)[0]["reached"] is True
+
+# Test that a full rebuild matches the incremental rollups
+def test_rebuild_stats(db):
+    seed(db)
+    donate(db, DAY)
+    refresh_stats(db)
+    incremental = donations_per_location_per_day(db)
+
+    assert rebuild_stats(db) == {"donation_rows": 1, "timeslot_rows": 0, "challenges": 1}
+    assert donations_per_location_per_day(db) == incremental
+
+
+# --- Stats Routes Tests ---
+# Test for retrieving daily donation statistics
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.stats.refresh_stale_stats")
+@patch("routers.stats.donations_per_location_per_day", return_value=[{"day": "2024-03-01", "location_id": 1, "donations": 2, "completed": 1, "amount": 500.0}])
+def test_read_donations_per_day(donations_per_location_per_day, refresh_stale_stats):
+    response = client.get("/stats/donations/daily?since=2024-03-01&location_id=1", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["data"][0]["donations"] == 2
+    assert response.json()["message"] == "Donation statistics retrieved successfully"
+    refresh_stale_stats.assert_called_once()
+    assert donations_per_location_per_day.call_args.kwargs["location_id"] == 1
+
+# Test for retrieving challenge goal attainment
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.stats.refresh_stale_stats")
+@patch("routers.stats.challenge_goal_attainment", return_value=[])
+def test_read_challenge_goal_attainment(challenge_goal_attainment, refresh_stale_stats):
+    response = client.get("/stats/challenges/goal-attainment", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["message"] == "Challenge goal attainment retrieved successfully"
+
+# Test for retrieving timeslot fill rates service error
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.stats.refresh_stale_stats", side_effect=Exception("Test Exception"))
+def test_read_timeslot_fill_rates_service_error(refresh_stale_stats):
+    response = client.get("/stats/timeslots/fill-rate", headers=ADMIN_HEADERS)
+    assert response.status_code == 500
+    assert "An error occurred while retrieving timeslot fill rates" in response.json()["detail"]
+
+# Test that the statistics need the admin token
+@patch("services.admin_auth.ADMIN_TOKEN", "secret")
+@patch("routers.stats.refresh_stale_stats")
+def test_read_stats_needs_token(refresh_stale_stats):
+    assert client.get("/stats/donations/cancellation-rate").status_code == 403
+    refresh_stale_stats.assert_not_called()
@@ -0,0 +1,138 @@
+import os
+import sys
+
+# Adjust the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date, datetime, time
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from main import app
+from models.location_info import LocationInfo, Timeslot, TimeslotTemplate
+from schemas.donation import ScheduledTimeslot, TimeslotTemplateCreate
+from services.timeslot_template import (
+    parse_opening_hours,
+    expand_templates,
+    create_timeslot_templates,
+    get_scheduled_timeslots,
+    book_timeslot,
+    templates_from_opening_hours,
+)
+
+client = TestClient(app)
+
+# 2024-03-04 is a Monday
+MONDAY = datetime(2024, 3, 4)
+
+
+def seed_location(db):
+    db.add(LocationInfo(id=1, name="Utrecht", address="Plesmanlaan 125, Utrecht", opening_hours="9:00 AM - 5:00 PM", latitude="52.0907", longitude="5.1214"))
+    db.commit()
+
+def template(**kwargs) -> TimeslotTemplateCreate:
+    return TimeslotTemplateCreate(**{"weekday": 0, "start_time": time(9), "end_time": time(11), "slot_minutes": 30, "capacity": 4, **kwargs})
+
+
+# --- Timeslot Template Tests ---
+# Test parsing the free text opening hours
+def test_parse_opening_hours():
+    assert parse_opening_hours("9:00 AM - 5:00 PM") == (time(9), time(17))
+    assert parse_opening_hours("08:30-12:00") == (time(8, 30), time(12))
+    assert parse_opening_hours("12:00 PM - 1:30 PM") == (time(12), time(13, 30))
+    assert parse_opening_hours("By appointment") is None
+
+# Test that templates expand only on their weekday and validity range
+def test_expand_templates():
+    templates = [
+        TimeslotTemplate(id=1, weekday=0, start_time=time(9), end_time=time(10, 45), slot_minutes=30, capacity=4),
+        TimeslotTemplate(id=2, weekday=2, start_time=time(14), end_time=time(15), slot_minutes=60, capacity=2, valid_from=date(2024, 3, 13)),
+    ]
+    slots = list(expand_templates(templates, MONDAY, datetime(2024, 3, 14)))
+    assert [(slot.start_time, slot.template_id) for slot in slots] == [
+        (datetime(2024, 3, 4, 9), 1),
+        (datetime(2024, 3, 4, 9, 30), 1),
+        (datetime(2024, 3, 4, 10), 1),
+        (datetime(2024, 3, 11, 9), 1),
+        (datetime(2024, 3, 11, 9, 30), 1),
+        (datetime(2024, 3, 11, 10), 1),
+        (datetime(2024, 3, 13, 14), 2),
+    ]
+
+# Test that a window lists template slots and stored slots together
+def test_get_scheduled_timeslots(db):
+    seed_location(db)
+    results = create_timeslot_templates(db, 1, [template(), template(end_time=time(8))])
+    assert [result.status for result in results] == [200, 400]
+    db.add(Timeslot(location_id=1, start_time=datetime(2024, 3, 5, 12), end_time=datetime(2024, 3, 5, 13), total_capacity=6, remaining_capacity=6))
+    db.commit()
+
+    slots = get_scheduled_timeslots(db, 1, MONDAY, datetime(2024, 3, 6))
+    assert [(slot.start_time.hour, slot.id is None) for slot in slots] == [(9, True), (9, True), (10, True), (10, True), (12, False)]
+
+    with pytest.raises(HTTPException) as error:
+        get_scheduled_timeslots(db, 1, MONDAY, datetime(2024, 12, 1))
+    assert error.value.status_code == 400
+
+# Test that booking stores a template slot once and then takes its capacity
+def test_book_timeslot(db):
+    seed_location(db)
+    create_timeslot_templates(db, 1, [template(capacity=2)])
+    start = MONDAY.replace(hour=9, minute=30)
+
+    assert book_timeslot(db, 1, start).remaining_capacity == 1
+    assert book_timeslot(db, 1, start).remaining_capacity == 0
+    assert db.query(Timeslot).count() == 1
+    with pytest.raises(HTTPException) as error:
+        book_timeslot(db, 1, start)
+    assert error.value.status_code == 409
+
+    slot = next(slot for slot in get_scheduled_timeslots(db, 1, MONDAY, MONDAY.replace(hour=23)) if slot.start_time == start)
+    assert (slot.remaining_capacity, slot.template_id) == (0, 1)
+
+    with pytest.raises(HTTPException) as error:
+        book_timeslot(db, 1, MONDAY.replace(hour=9, minute=15))
+    assert error.value.status_code == 404
+
+# Test creating templates from opening hours for locations without any
+def test_templates_from_opening_hours(db):
+    seed_location(db)
+    assert templates_from_opening_hours(db, slot_minutes=60, capacity=5) == 5
+    assert templates_from_opening_hours(db, slot_minutes=60, capacity=5) == 0
+    assert len(get_scheduled_timeslots(db, 1, MONDAY, datetime(2024, 3, 11))) == 5 * 8
+
+
+# --- Timeslot Template Routes Tests ---
+# Test for listing the timeslots in a window
+@patch("routers.donations.get_scheduled_timeslots", return_value=[
+    ScheduledTimeslot(start_time=datetime(2024, 3, 4, 9), end_time=datetime(2024, 3, 4, 10), total_capacity=4, remaining_capacity=4, template_id=1),
+])
+def test_get_timeslots_window_route(get_scheduled_timeslots):
+    response = client.get("/donations/location/1/timeslots?since=2024-03-04T00:00:00&until=2024-03-11T00:00:00")
+    assert response.status_code == 200
+    assert response.json()["data"][0]["template_id"] == 1
+    assert response.json()["data"][0]["id"] is None
+
+# Test for booking a timeslot
+@patch("routers.donations.book_timeslot", return_value=Timeslot(id=3, location_id=1, start_time=datetime(2024, 3, 4, 9), end_time=datetime(2024, 3, 4, 10), total_capacity=4, remaining_capacity=3))
+def test_book_timeslot_route(book_timeslot):
+    response = client.post("/donations/location/1/timeslots/book?start_time=2024-03-04T09:00:00")
+    assert response.status_code == 200
+    assert response.json()["data"]["remaining_capacity"] == 3
+    assert response.json()["message"] == "Timeslot booked successfully"
+
+# Test for booking a timeslot service error
+@patch("routers.donations.book_timeslot", side_effect=Exception("Test Exception"))
+def test_book_timeslot_route_service_error(book_timeslot):
+    response = client.post("/donations/location/1/timeslots/book?start_time=2024-03-04T09:00:00")
+    assert response.status_code == 500
+    assert "An error occurred while booking the timeslot" in response.json()["detail"]
+
+# Test for creating timeslot templates
+@patch("routers.donations.create_timeslot_templates", return_value=[])
+def test_create_timeslot_templates_route(create_timeslot_templates):
+    response = client.post("/donations/location/1/templates", json=[{"weekday": 0, "start_time": "09:00", "end_time": "11:00", "slot_minutes": 30, "capacity": 4}])
+    assert response.status_code == 200
+    assert response.json()["message"] == "Timeslot templates processed successfully"
+    assert create_timeslot_templates.call_args.args[2][0].start_time == time(9)
@@ -124,6 +124,48 @@ def test_get_user_by_id_route_not_found(check_user_exists):
     assert response.status_code == 500
     assert "An error occurred while retrieving the user" in response.json()["detail"]
     
+# Test for getting users by a list of IDs
+@patch("routers.users.get_users_by_ids", return_value=[sample_user, sample_friend])
+def test_get_users_by_ids_route(get_users_by_ids):
+    response = client.get("/users/", params={"ids": [1, 2]})
+    assert response.status_code == 200
+    assert response.json()["message"] == "Users retrieved successfully"
+    assert [user["id"] for user in response.json()["data"]] == [1, 2]
+    assert get_users_by_ids.call_args.args[1] == [1, 2]
+
+# Test for getting users by a list of IDs service error
+@patch("routers.users.get_users_by_ids", side_effect=Exception("Test Exception"))
+def test_get_users_by_ids_route_service_error(get_users_by_ids):
+    response = client.get("/users/", params={"ids": [1, 2]})
+    assert response.status_code == 500
+    assert "An error occurred while retrieving users" in response.json()["detail"]
+
+# Test for getting a user with a sparse fieldset
+@patch("routers.users.get_user_by_id", return_value=MagicMock(**sample_user))
+def test_get_user_by_id_route_fields(get_user_by_id):
+    response = client.get("/users/id/1", params={"fields": "id,username"})
+    assert response.status_code == 200
+    assert response.json()["data"] == {"id": 1, "username": "test_user"}
+    assert get_user_by_id.call_args.kwargs["options"]
+
+# Test for requesting a field that is not part of the response
+def test_get_user_by_id_route_unknown_field():
+    response = client.get("/users/id/1", params={"fields": "id,password"})
+    assert response.status_code == 400
+    assert "Unknown field(s) password" in response.json()["detail"]
+
+# Test that a sparse fieldset only selects the requested columns
+def test_get_users_by_ids_sparse_columns(db):
+    from services.fieldsets import Fieldset
+    from services.user import get_users_by_ids
+    from schemas.user import UserResponse
+
+    fieldset = Fieldset(User, UserResponse, "username")
+    users = get_users_by_ids(db, [1, 2], options=fieldset.options())
+    assert [fieldset.serialize(user) for user in users] == [{"username": "user_1"}, {"username": "user_2"}]
+    assert len(db.statements) == 1
+    assert "email" not in db.statements[0]
+
 # Test for getting a user by email and password
 @patch("routers.users.get_user_by_email_and_password", return_value=MagicMock(**sample_user))
 def test_get_user_by_email_and_password_route(get_user_by_email_and_password):
@@ -165,6 +207,14 @@ def test_update_user_route(check_user_exists, update_user):
     assert response.json()["message"] == "User updated successfully"
     assert "Updated City" in response.json()["data"][6]
 
+# Test that an update cannot change points outside the ledger
+def test_update_user_ignores_points(db):
+    from schemas.user import UserUpdate
+    from services.user import update_user
+
+    user = update_user(db, 1, UserUpdate(city="Updated City", current_points=999, total_points=999))
+    assert (user.city, user.current_points, user.total_points) == ("Updated City", 200, 200)
+
 # Test for updating a user when user does not exist
 @patch("services.user.check_user_exists", return_value=False)
 def test_update_user_route_not_found(check_user_exists): 
@@ -228,6 +278,37 @@ def test_get_friends_route(check_user_exists, get_friends):
     assert response.json()["message"] == "Friends retrieved successfully"
     assert response.json()["data"][0]["username"] == sample_friend["username"]
 
+# Test for getting friends page by page
+def test_get_friends_page(db):
+    from models.friend import Friend
+    from services.user import get_friends_page
+
+    db.add_all([
+        Friend(sender_id=1, receiver_id=2, status=FriendshipStatus.ACCEPTED),
+        Friend(sender_id=3, receiver_id=1, status=FriendshipStatus.ACCEPTED),
+    ])
+    db.commit()
+    friends, cursor = get_friends_page(db, 1, limit=1)
+    assert [friend.id for friend in friends] == [2]
+    friends, cursor = get_friends_page(db, 1, limit=1, cursor=cursor)
+    assert ([friend.id for friend in friends], cursor) == ([3], None)
+
+# Test that friends come from a single query, however many there are
+def test_get_friends_single_query(db):
+    from models.friend import Friend
+    from services.user import get_friends
+
+    db.add_all([
+        Friend(sender_id=1, receiver_id=2, status=FriendshipStatus.ACCEPTED),
+        Friend(sender_id=3, receiver_id=1, status=FriendshipStatus.ACCEPTED),
+        Friend(sender_id=2, receiver_id=3, status=FriendshipStatus.PENDING),
+    ])
+    db.commit()
+    db.statements.clear()
+    assert [friend.id for friend in get_friends(db, 1)] == [2, 3]
+    assert [friend.id for friend in get_friends(db, 3)] == [1]
+    assert len(db.statements) == 2
+
 # Test for getting friends when user does not exist
 @patch("services.user.check_user_exists", return_value=False)
 def test_get_friends_route_user_not_found(check_user_exists):
@@ -305,6 +386,14 @@ def test_get_notifications_route(check_user_exists, get_notifications):
     assert response.json()["message"] == "Notifications retrieved successfully"
     assert response.json()["data"][0]["title"] == sample_notification["title"]
 
+# Test for getting a page of notifications
+@patch("routers.users.get_notifications_page", return_value=([sample_notification], "next"))
+def test_get_notifications_route_paginated(get_notifications_page):
+    response = client.get("/users/1/notifications", params={"limit": 1})
+    assert response.status_code == 200
+    assert response.json()["data"]["items"][0]["title"] == sample_notification["title"]
+    assert (response.json()["data"]["limit"], response.json()["data"]["next_cursor"]) == (1, "next")
+
 # Test for getting notifications when user does not exist
 @patch("services.user.check_user_exists", return_value=False)
 def test_get_notifications_route_user_not_found(check_user_exists):
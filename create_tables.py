@@ -1,12 +1,15 @@
 from api.database import engine, Base
 from api.models.user import User
-from api.models.donation import Donation
+from api.models.donation import Donation, DonationArchive, DonationDailyStats
 from api.models.friend import Friend
-from api.models.location_info import LocationInfo, Timeslot
+from api.models.location_info import LocationInfo, Timeslot, TimeslotTemplate
 from api.models.challenge import Challenge
 from api.models.challenge_user import ChallengeUser
 from api.models.post import Post
 from api.models.kudos import Kudos
+from api.models.points import PointsTransaction
+from api.models.eligibility import DonorEligibility
+from api.models.stats import TimeslotDailyStats, ChallengeStats, StatsDirtyDay
 
 # Create all tables in the database
 Base.metadata.create_all(bind=engine)